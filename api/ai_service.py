@@ -5,33 +5,300 @@ os.environ.pop("GOOGLE_APPLICATION_CREDENTIALS", None)
 from dotenv import load_dotenv
 load_dotenv()
 
-import google.generativeai as genai
+import asyncio
+import functools
 import json
 import re
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from article_cache import article_cache_from_env, article_key
+from metrics import metrics
 
 # Configure Gemini
 api_key = os.getenv("GEMINI_API_KEY")
 if not api_key or api_key == "YOUR_GEMINI_API_KEY_HERE":
     print("WARNING: Gemini API Key not set correctly in .env")
-genai.configure(api_key=api_key)
+_genai = None
+
+
+def gemini():
+    """google.generativeai, imported and configured on first use (it dominates cold-start time)."""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        _genai = genai
+    return _genai
+
+MODEL_NAME = 'gemini-2.5-flash'
+# Max Gemini calls in flight per process, and the per-call timeout in seconds
+MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "90"))
+MODES = ('note', 'xhs')
+# Multi-mode requests: "concurrent" (one call per mode), "combined" (one structured call)
+# or "auto" (combined once it saves at least GEMINI_COMBINE_MIN_SAVING prompt tokens)
+MULTI_MODE_STRATEGY = os.getenv("GEMINI_MULTI_MODE", "auto")
+COMBINE_MIN_SAVING = int(os.getenv("GEMINI_COMBINE_MIN_SAVING", "300"))
+
+# Only used for models without an async API
+_llm_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="gemini")
+_shared_models = {}
+# Shared by every AIService instance; only successful generations are stored
+article_cache = article_cache_from_env()
+
+
+def get_model(name: str = MODEL_NAME):
+    """One GenerativeModel per model name, reused across requests."""
+    model = _shared_models.get(name)
+    if model is None:
+        model = gemini().GenerativeModel(name)
+        _shared_models[name] = model
+    return model
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Gemini token count: about one per CJK character, one per 4 other characters."""
+    wide = sum(1 for c in text if ord(c) > 0x2e7f)
+    return wide + (len(text) - wide + 3) // 4
+
+
+FENCE_OPEN = "```html"
+FENCE = "```"
+
+
+def clean_article_html(text: str) -> str:
+    """Strip the markdown code fence Gemini tends to wrap the HTML in."""
+    if text.startswith(FENCE_OPEN):
+        text = text.replace(FENCE_OPEN, "", 1)
+    if FENCE in text:
+        text = text.split(FENCE)[0]
+    return text.strip()
+
+
+class FenceStripper:
+    """
+    Incremental clean_article_html: feed() the streamed text piece by piece and get back
+    the HTML that is safe to show so far; finish() returns the rest. The concatenated
+    output equals clean_article_html() of the full text, wherever the chunks split.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pending_space = ""  # whitespace that is only emitted if more content follows
+        self._opened = False  # leading fence handled
+        self._started = False  # first non-whitespace emitted
+        self._done = False  # closing fence seen, ignore the rest
+
+    def feed(self, text: str) -> str:
+        if self._done:
+            return ""
+        self._buffer += text
+        if not self._opened:
+            if len(self._buffer) < len(FENCE_OPEN) and FENCE_OPEN.startswith(self._buffer):
+                return ""  # might still become the opening fence
+            if self._buffer.startswith(FENCE_OPEN):
+                self._buffer = self._buffer[len(FENCE_OPEN):]
+            self._opened = True
+        end = self._buffer.find(FENCE)
+        if end != -1:
+            self._done = True
+            ready, self._buffer = self._buffer[:end], ""
+            return self._emit(ready, final=True)
+        # Hold back trailing backticks that may be the start of a fence
+        held = min(len(self._buffer) - len(self._buffer.rstrip("`")), len(FENCE) - 1)
+        cut = len(self._buffer) - held
+        ready, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return self._emit(ready)
+
+    def finish(self) -> str:
+        if self._done:
+            return ""
+        self._opened = True
+        html = self.feed("")
+        self._done = True
+        rest, self._buffer = self._buffer, ""
+        return html + self._emit(rest, final=True)
+
+    def _emit(self, text: str, final: bool = False) -> str:
+        text = self._pending_space + text
+        self._pending_space = ""
+        if not self._started:
+            text = text.lstrip()
+        if final:
+            return text.rstrip()
+        visible = text.rstrip()
+        self._pending_space = text[len(visible):]
+        if visible:
+            self._started = True
+        return visible
+
+
+_JSON_FENCE_RE = re.compile(r"^```(?:json)?\s*(.*?)\s*```\s*$", re.DOTALL)
+
+
+def _json_answer(text: str) -> dict:
+    """The JSON object in a structured-output answer, tolerating a ```json fence; {} if malformed."""
+    text = text.strip()
+    match = _JSON_FENCE_RE.match(text)
+    if match:
+        text = match.group(1)
+    try:
+        answer = json.loads(text)
+    except ValueError:
+        return {}
+    return answer if isinstance(answer, dict) else {}
+
+
+def _article_result(data: dict, content_html: str) -> dict:
+    return {
+        "title": data.get('title', 'Generated Article'),
+        "content_html": content_html
+    }
+
+
+def _missing_key_result(data: dict) -> dict:
+    return {
+        "title": "API Key Missing",
+        "content_html": f"<h3>[API Key Missing]</h3><p>Please set GEMINI_API_KEY in .env</p><pre>{json.dumps(data, indent=2)}</pre>"
+    }
+
+
+GENERATION_FAILED = "<p>Oops! AI Generation failed: "
+
+
+def _error_result(data: dict, error: Exception) -> dict:
+    return {
+        "title": data.get('title', 'Error'),
+        "content_html": f"{GENERATION_FAILED}{str(error)}</p>"
+    }
+
+
+def is_generated(result: dict) -> bool:
+    """Whether an article result came from the model, not an error or the missing-key placeholder."""
+    html = result.get("content_html") or ""
+    return bool(html) and not html.startswith((GENERATION_FAILED, "<h3>[API Key Missing]</h3>"))
+
 
 class AIService:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, model=None, max_concurrency: int = None, timeout: float = None,
+                 model_name: str = MODEL_NAME, cache="env"):
+        """
+        model: a GenerativeModel-like object; defaults to the shared model for model_name.
+        cache: ArticleCache for generated articles; None disables caching.
+        """
         self.api_key = api_key
+        self._model = model
+        self.model_name = model_name
+        self.cache = article_cache if cache == "env" else cache
+        self.max_concurrency = max_concurrency or MAX_CONCURRENCY
+        self.timeout = timeout or TIMEOUT
+        self._semaphores = weakref.WeakKeyDictionary()
+        # Single-mode model calls so far, to estimate what a combined call saves
+        self.single_calls = {"calls": 0, "seconds": 0.0}
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = get_model(self.model_name)
+        return self._model
+
+    async def _load_model(self):
+        """The model, with the first (slow) Gemini SDK import done off the event loop."""
+        if self._model is None:
+            loop = asyncio.get_running_loop()
+            self._model = await loop.run_in_executor(_llm_executor, get_model, self.model_name)
+        return self._model
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Semaphores are tied to the loop they first block on, so keep one per loop
+        loop = asyncio.get_running_loop()
+        sem = self._semaphores.get(loop)
+        if sem is None:
+            sem = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = sem
+        return sem
 
-    async def generate_wechat_article(self, data: dict, mode='note') -> dict:
+    def _record_usage(self, response, span: dict):
+        # usage_metadata is on the (last) response when the API reports it
+        usage = getattr(response, "usage_metadata", None)
+        for kind, field in (("prompt", "prompt_token_count"), ("output", "candidates_token_count")):
+            count = getattr(usage, field, None)
+            if count:
+                metrics.inc("llm_tokens", count, kind=kind, model=self.model_name)
+                span[f"{kind}_tokens"] = count
+
+    async def _generate(self, prompt: str, **kwargs):
         """
-        Generates a persuasive listing article using Gemini.
-        Supported modes:
-        - 'note': Professional style, Simplified Chinese, no emojis.
-        - 'xhs': Xiaohongshu style, Simplified Chinese, high emoji count, catchy titles.
+        Run one generation without blocking the event loop, capped and timed out.
+        A blocking call that times out can't stop its thread, so its slot stays taken
+        until the call really finishes: the cap counts calls still in flight.
         """
-        if not self.api_key:
-             return {
-                "title": "API Key Missing",
-                "content_html": f"<h3>[API Key Missing]</h3><p>Please set GEMINI_API_KEY in .env</p><pre>{json.dumps(data, indent=2)}</pre>"
-            }
+        model = await self._load_model()
+        semaphore = self._semaphore()
+        await semaphore.acquire()
+        release_here = True
+        try:
+            generate_async = getattr(model, "generate_content_async", None)
+            if generate_async is not None:
+                call = generate_async(prompt, **kwargs)
+            else:
+                loop = asyncio.get_running_loop()
+                future = _llm_executor.submit(functools.partial(model.generate_content, prompt, **kwargs))
 
+                def release(_):
+                    try:
+                        loop.call_soon_threadsafe(semaphore.release)
+                    except RuntimeError:
+                        pass  # the loop is gone, and its semaphore with it
+
+                future.add_done_callback(release)
+                release_here = False
+                call = asyncio.wrap_future(future, loop=loop)
+            with metrics.span("llm", model=self.model_name, call="generate") as span:
+                try:
+                    response = await asyncio.wait_for(call, self.timeout)
+                except asyncio.TimeoutError:
+                    span["outcome"] = "timeout"
+                    raise TimeoutError(f"Gemini call timed out after {self.timeout:g}s")
+                self._record_usage(response, span)
+                return response
+        finally:
+            if release_here:
+                semaphore.release()
+
+    async def _generate_stream(self, prompt: str):
+        """Yield the text of each streamed response chunk, under the same cap and timeout."""
+        model = await self._load_model()
+        generate_async = getattr(model, "generate_content_async", None)
+        if generate_async is None:
+            # No async streaming API: deliver the whole answer as a single chunk
+            response = await self._generate(prompt)
+            yield response.text
+            return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        async with self._semaphore():
+            with metrics.span("llm", model=self.model_name, call="stream") as span:
+                try:
+                    response = await asyncio.wait_for(generate_async(prompt, stream=True), self.timeout)
+                    chunks = response.__aiter__()
+                    last = response
+                    while True:
+                        try:
+                            last = await asyncio.wait_for(chunks.__anext__(), deadline - loop.time())
+                        except StopAsyncIteration:
+                            self._record_usage(last, span)
+                            return
+                        yield last.text
+                except asyncio.TimeoutError:
+                    span["outcome"] = "timeout"
+                    raise TimeoutError(f"Gemini call timed out after {self.timeout:g}s")
+
+    @staticmethod
+    def style_instruction(mode='note') -> str:
         if mode == 'xhs':
             style_instruction = """
             - 风格：小红书（Xiaohongshu）爆款风格。
@@ -48,6 +315,12 @@ class AIService:
             - 内容：突出房产的核心价值、地段优势、投资回报率。
             - 语气：自信、诚恳、专业顾问视角。
             """
+        return style_instruction
+
+    @staticmethod
+    def build_prompt(data: dict, mode='note') -> str:
+        """The Gemini prompt for a listing in the given mode ('note' or 'xhs')."""
+        style_instruction = AIService.style_instruction(mode)
 
         prompt = f"""
         你是一位顶级房地产投资顾问。请根据以下 PropertyGuru 房产提取的数据，写一篇极其诱人的房产介绍。
@@ -69,26 +342,227 @@ class AIService:
         4. 如果是小红书模式，标题要放在第一行。
         5. 确保内容是简体中文。
         """
+        return prompt
+
+    def _key(self, prompt: str):
+        return None if self.cache is None else article_key(prompt, self.model_name)
+
+    def _cached(self, prompt: str, force: bool):
+        """(cache key, cached article or None); a forced regeneration skips the lookup."""
+        key = self._key(prompt)
+        if key is None or force:
+            return key, None
+        return key, self.cache.get(key)
+
+    def _remember(self, key, result: dict):
+        # Only real articles: error and API-key-missing HTML never get here
+        if key is not None and result["content_html"]:
+            self.cache.set(key, result)
+
+    @staticmethod
+    def build_combined_prompt(data: dict, modes) -> str:
+        """One prompt asking for an article per mode, the listing data included only once."""
+        sections = "\n".join(
+            f"""
+        【{mode}】{AIService.style_instruction(mode)}"""
+            for mode in modes
+        )
+        keys = ", ".join(f'"{mode}"' for mode in modes)
+
+        prompt = f"""
+        你是一位顶级房地产投资顾问。请根据以下 PropertyGuru 房产提取的数据，按下面每种风格各写一篇极其诱人的房产介绍。
+
+        {sections}
+
+        目标读者：希望在新加坡置业的高端客户或投资者。
+
+        房产数据：
+        标题: {data.get('title')}
+        价格: {data.get('price')}
+        地址: {data.get('address')}
+        描述: {data.get('description')[:2000]}
+
+        要求：
+        1. 输出一个 JSON 对象，键为 {keys}，值为对应风格的文章正文 HTML（仅限正文部分，可以使用 <h1>, <h2>, <p>, <ul>, <li>, <strong>）。
+        2. 结构整齐。
+        3. 不要包含 <html> 或 <body> 标签，也不要包含文章标题（因为前端会单独处理）。
+        4. 小红书（xhs）风格的标题要放在正文第一行。
+        5. 确保内容是简体中文。
+        """
+        return prompt
+
+    async def _generate_combined(self, data: dict, modes) -> dict:
+        """Articles for several modes from one structured-output call ({} for any mode it missed)."""
+        response = await self._generate(
+            self.build_combined_prompt(data, modes),
+            generation_config={"response_mime_type": "application/json"},
+        )
+        answer = _json_answer(response.text)
+        articles = {}
+        for mode in modes:
+            html = answer.get(mode)
+            if isinstance(html, str) and clean_article_html(html):
+                articles[mode] = _article_result(data, clean_article_html(html))
+        return articles
+
+    def _average_single_call(self):
+        calls = self.single_calls["calls"]
+        return self.single_calls["seconds"] / calls if calls else None
+
+    async def _timed_article(self, data: dict, mode: str):
+        start = time.perf_counter()
+        # The cache was already consulted for this mode
+        article = await self.generate_wechat_article(data, mode, force=True)
+        return article, time.perf_counter() - start
+
+    async def generate_wechat_articles(self, data: dict, modes=MODES, force: bool = False, strategy: str = None) -> dict:
+        """
+        Articles for several modes of one listing:
+        {"articles": {mode: {title, content_html}}, "stats": {...}}.
+
+        Cached modes are answered from the cache; the rest run either as concurrent
+        per-mode calls or as one combined structured-output call (see MULTI_MODE_STRATEGY).
+        The stats compare the prompt tokens and wall time against one call per mode in turn.
+        For modes a combined call wrote, that time is estimated from this service's
+        average single-mode call; before one was measured it is unknown (None).
+        """
+        start = time.perf_counter()
+        modes = list(dict.fromkeys(modes))
+        articles = {}
+        pending = []
+        for mode in modes:
+            cached = None
+            if self.api_key:
+                _, cached = self._cached(self.build_prompt(data, mode), force)
+            if cached is not None:
+                articles[mode] = cached
+            else:
+                pending.append(mode)
+
+        cached_modes = [mode for mode in modes if mode in articles]
+
+        strategy = strategy or MULTI_MODE_STRATEGY
+        sequential_tokens = sum(estimate_tokens(self.build_prompt(data, mode)) for mode in pending)
+        combined_tokens = estimate_tokens(self.build_combined_prompt(data, pending)) if len(pending) > 1 else sequential_tokens
+        if strategy == "auto":
+            strategy = "combined" if sequential_tokens - combined_tokens >= COMBINE_MIN_SAVING else "concurrent"
+        if len(pending) < 2 or not self.api_key:
+            strategy = "concurrent"
+
+        prompt_tokens = 0
+        sequential_seconds = 0.0
+        if strategy == "combined":
+            prompt_tokens += combined_tokens
+            try:
+                combined = await self._generate_combined(data, pending)
+            except Exception as e:
+                print(f"Gemini Error: {e}")
+                articles.update((mode, _error_result(data, e)) for mode in pending)
+                combined, pending = {}, []
+            if combined:
+                average = self._average_single_call()
+                sequential_seconds = None if average is None else sequential_seconds + average * len(combined)
+            for mode, article in combined.items():
+                self._remember(self._key(self.build_prompt(data, mode)), article)
+                articles[mode] = article
+            # Whatever a malformed combined answer lacked is generated per mode
+            pending = [mode for mode in pending if mode not in combined]
+
+        timed = await asyncio.gather(*(self._timed_article(data, mode) for mode in pending))
+        for mode, (article, seconds) in zip(pending, timed):
+            articles[mode] = article
+            if sequential_seconds is not None:
+                sequential_seconds += seconds
+            prompt_tokens += estimate_tokens(self.build_prompt(data, mode))
+
+        wall_seconds = time.perf_counter() - start
+        return {
+            "articles": {mode: articles[mode] for mode in modes},
+            "stats": {
+                "strategy": strategy,
+                "cached_modes": cached_modes,
+                "prompt_tokens": prompt_tokens,
+                "sequential_prompt_tokens": sequential_tokens,
+                "tokens_saved": sequential_tokens - prompt_tokens,
+                "wall_seconds": round(wall_seconds, 3),
+                "sequential_seconds": None if sequential_seconds is None else round(sequential_seconds, 3),
+                "seconds_saved": None if sequential_seconds is None else round(max(0.0, sequential_seconds - wall_seconds), 3),
+            },
+        }
+
+    async def generate_wechat_article(self, data: dict, mode='note', force: bool = False) -> dict:
+        """
+        Generates a persuasive listing article using Gemini.
+        Supported modes:
+        - 'note': Professional style, Simplified Chinese, no emojis.
+        - 'xhs': Xiaohongshu style, Simplified Chinese, high emoji count, catchy titles.
+        Identical prompts are answered from the article cache unless `force` is set.
+        """
+        if not self.api_key:
+            return _missing_key_result(data)
+
+        prompt = self.build_prompt(data, mode)
+        key, cached = self._cached(prompt, force)
+        if cached is not None:
+            return cached
 
         try:
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            response = model.generate_content(prompt)
-            
-            # Cleanup: Strip markdown code blocks if the AI included them
-            content_html = response.text
-            if content_html.startswith("```html"):
-                content_html = content_html.replace("```html", "", 1)
-            if "```" in content_html:
-                content_html = content_html.split("```")[0]
-            content_html = content_html.strip()
-
-            return {
-                "title": data.get('title', 'Generated Article'),
-                "content_html": content_html
-            }
+            start = time.perf_counter()
+            response = await self._generate(prompt)
+            self.single_calls["calls"] += 1
+            self.single_calls["seconds"] += time.perf_counter() - start
+            result = _article_result(data, clean_article_html(response.text))
         except Exception as e:
             print(f"Gemini Error: {e}")
-            return {
-                "title": data.get('title', 'Error'),
-                "content_html": f"<p>Oops! AI Generation failed: {str(e)}</p>"
-            }
+            return _error_result(data, e)
+        self._remember(key, result)
+        return result
+
+    async def generate_wechat_article_stream(self, data: dict, mode='note', force: bool = False):
+        """
+        Streaming variant of generate_wechat_article. Yields (event, payload) pairs:
+        ("chunk", {"html": ...}) as cleaned HTML arrives, then one ("complete", result)
+        with the same title/content_html shape generate_wechat_article returns.
+        A cached article is sent as a single chunk.
+        """
+        if not self.api_key:
+            yield "complete", _missing_key_result(data)
+            return
+
+        prompt = self.build_prompt(data, mode)
+        key, cached = self._cached(prompt, force)
+        if cached is not None:
+            if cached["content_html"]:
+                yield "chunk", {"html": cached["content_html"]}
+            yield "complete", cached
+            return
+
+        cleaner = FenceStripper()
+        parts = []
+        try:
+            async for text in self._generate_stream(prompt):
+                html = cleaner.feed(text)
+                if html:
+                    parts.append(html)
+                    yield "chunk", {"html": html}
+            html = cleaner.finish()
+            if html:
+                parts.append(html)
+                yield "chunk", {"html": html}
+        except Exception as e:
+            print(f"Gemini Error: {e}")
+            yield "complete", _error_result(data, e)
+            return
+        result = _article_result(data, "".join(parts))
+        self._remember(key, result)
+        yield "complete", result
+
+_shared_service = None
+
+
+def get_ai_service() -> AIService:
+    """Process-wide AIService, shared across requests."""
+    global _shared_service
+    if _shared_service is None:
+        _shared_service = AIService(api_key)
+    return _shared_service
@@ -0,0 +1,76 @@
+import copy
+import hashlib
+import os
+
+from cache import LRUCache, SQLiteCache
+from metrics import metrics
+
+
+def article_key(prompt: str, model_name: str) -> str:
+    """
+    Content address of a generated article: the rendered prompt (style instruction plus
+    the listing fields it quotes) and the model that answers it.
+    """
+    return hashlib.sha256(f"{model_name}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+class ArticleCache:
+    """
+    Generated article cache keyed by article_key().
+
+    - memory LRU, plus an optional SQLite file that survives restarts
+    - only successful generations are stored; the caller decides what counts as one
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = None, db_path: str = None):
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.disk = SQLiteCache(db_path, table="articles", ttl=ttl) if db_path else None
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+    def get(self, key: str):
+        """The cached article for `key`, or None."""
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.set(key, entry[0], stored_at=entry[1])
+                self.counters["disk_hits"] += 1
+        if entry is None:
+            self.counters["misses"] += 1
+            metrics.inc("cache_lookups", cache="article", result="miss")
+            return None
+        self.counters["hits"] += 1
+        metrics.inc("cache_lookups", cache="article", result="hit")
+        return copy.deepcopy(entry[0])
+
+    def set(self, key: str, article: dict):
+        article = copy.deepcopy(article)
+        self.memory.set(key, article)
+        if self.disk is not None:
+            self.disk.set(key, article)
+        self.counters["stores"] += 1
+
+    def invalidate(self, key: str):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return dict(
+            self.counters,
+            entries=len(self.memory),
+            hit_rate=round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+        )
+
+
+def article_cache_from_env():
+    """Process-wide cache config; PG_ARTICLE_CACHE=0 disables it."""
+    if os.getenv("PG_ARTICLE_CACHE", "1") == "0":
+        return None
+    ttl = float(os.getenv("PG_ARTICLE_CACHE_TTL", "0"))
+    return ArticleCache(
+        maxsize=int(os.getenv("PG_ARTICLE_CACHE_SIZE", "256")),
+        ttl=ttl or None,
+        db_path=os.getenv("PG_ARTICLE_CACHE_DB") or None,
+    )
@@ -0,0 +1,263 @@
+import asyncio
+import os
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process profile locking
+    fcntl = None
+
+# launch_options that belong to the context, not the browser, when there is no profile
+CONTEXT_OPTIONS = ("user_agent", "viewport", "device_scale_factor", "java_script_enabled")
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36"
+
+
+class BrowserPool:
+    """
+    Long-lived Chromium context with a fixed number of warm pages.
+
+    Pages are handed out one scrape at a time and recycled (about:blank) afterwards.
+    A page is replaced after it crashes or errors, and the whole context is
+    relaunched after `max_uses` scrapes or when the browser goes away.
+
+    With a user_data_dir the context is persistent. Chromium only lets one process
+    own a profile directory, so the pool takes an exclusive lock on it and falls
+    back to a per-process copy of the directory when another worker holds it.
+
+    If a (re)launch fails, callers waiting for a page get the error instead of
+    waiting forever; the next page() tries to launch again.
+    """
+
+    def __init__(self, size: int = 2, max_uses: int = 50, user_data_dir: str = None,
+                 stealth: bool = True, launch_options: dict = None):
+        self.size = size
+        self.max_uses = max_uses
+        self.user_data_dir = user_data_dir
+        self.stealth = stealth
+        self.launch_options = launch_options or {}
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._pages = None
+        self._generation = 0
+        self._crashed = set()
+        self._in_use = 0
+        self._uses = 0
+        self._lock = None
+        self._lock_file = None
+        self._profile_copy = None
+        self.restarts = 0
+
+    def _watch(self, page):
+        page.on("crash", lambda p: self._crashed.add(id(p)))
+
+    async def _prepare(self, page):
+        self._watch(page)
+        if self.stealth:
+            from playwright_stealth import Stealth
+            await Stealth().apply_stealth_async(page)
+        return page
+
+    async def _new_page(self):
+        return await self._prepare(await self._context.new_page())
+
+    def _claim_user_data_dir(self):
+        path = self.user_data_dir
+        if fcntl is None:
+            return path
+        self._lock_file = open(path + ".lock", "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            self._lock_file = None
+            path = self._profile_copy = self._copy_profile(path, f"{path}-{os.getpid()}")
+        return path
+
+    @staticmethod
+    def _copy_profile(source, target):
+        # Keeps the cookies and clearance tokens; Chromium's singleton locks stay behind
+        print(f"Browser profile in use by another process, using a copy in {target}")
+        if os.path.isdir(source):
+            try:
+                shutil.copytree(source, target, dirs_exist_ok=True,
+                                ignore=shutil.ignore_patterns("Singleton*", "lockfile", "*.lock"))
+            except (shutil.Error, OSError) as e:
+                # Files the other browser rewrote mid-copy; the rest is still usable
+                print(f"Browser profile copy incomplete: {e}")
+        return target
+
+    def _release_user_data_dir(self):
+        if self._lock_file:
+            self._lock_file.close()  # closing drops the flock
+            self._lock_file = None
+
+    async def _launch(self):
+        if self._playwright is None:
+            from playwright.async_api import async_playwright
+
+            self._playwright = await async_playwright().start()
+        if self.user_data_dir:
+            context = await self._playwright.chromium.launch_persistent_context(
+                self._claim_user_data_dir(), **self.launch_options
+            )
+        else:
+            options = dict(self.launch_options)
+            context_options = {k: options.pop(k) for k in CONTEXT_OPTIONS if k in options}
+            self._browser = await self._playwright.chromium.launch(**options)
+            context = await self._browser.new_context(**context_options)
+        context.on("close", lambda c: self._on_context_closed(c))
+        self._context = context
+        self._generation += 1
+        self._uses = 0
+        self._crashed.clear()
+
+        # Pages from the previous context are dead; waiters get the fresh ones
+        while not self._pages.empty():
+            self._pages.get_nowait()
+        # A persistent context opens with one blank page already
+        pages = list(context.pages)[:self.size]
+        pages = [await self._prepare(page) for page in pages]
+        while len(pages) < self.size:
+            pages.append(await self._new_page())
+        for page in pages:
+            self._pages.put_nowait((self._generation, page))
+
+    def _on_context_closed(self, context):
+        if context is self._context:
+            self._context = None
+
+    async def _shutdown(self):
+        context, browser = self._context, self._browser
+        self._context = self._browser = None
+        for target in (context, browser):
+            if target is not None:
+                try:
+                    await target.close()
+                except Exception:
+                    pass
+        self._release_user_data_dir()
+
+    def _retire_pages(self):
+        # Before closing a context: queued pages are dropped and ones handed out are
+        # not put back, so no waiter takes a page while the context closes under it
+        self._generation += 1
+        while not self._pages.empty():
+            self._pages.get_nowait()
+
+    async def _launch_or_fail(self):
+        """_launch; on failure the half-started context is closed and page() waiters get the error."""
+        try:
+            await self._launch()
+        except Exception as e:
+            await self._shutdown()
+            self._retire_pages()  # pages handed out before are stale either way
+            self._pages.put_nowait((None, e))
+            raise
+
+    async def _ensure_started(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+            self._pages = asyncio.Queue()
+        async with self._lock:
+            if self._context is None:
+                if self._generation:
+                    print("Browser context gone, relaunching")
+                    self.restarts += 1
+                    self._retire_pages()
+                    await self._shutdown()
+                await self._launch_or_fail()
+
+    async def _relaunch(self, generation):
+        async with self._lock:
+            if generation == self._generation:  # not already relaunched by someone else
+                self.restarts += 1
+                self._retire_pages()
+                await self._shutdown()
+                try:
+                    await self._launch_or_fail()
+                except Exception as e:
+                    # The scrape that got here is done; the next page() retries the launch
+                    print(f"Browser relaunch failed: {e}")
+
+    def _healthy(self, page) -> bool:
+        return not page.is_closed() and id(page) not in self._crashed
+
+    @asynccontextmanager
+    async def page(self):
+        """Check out a warm page for one scrape."""
+        await self._ensure_started()
+        while True:
+            generation, page = await self._pages.get()
+            if generation is None:
+                # A launch failed while we waited: pass it on to the next waiter too
+                self._pages.put_nowait((None, page))
+                raise RuntimeError(f"Browser launch failed: {page}") from page
+            if generation == self._generation:
+                break
+        self._in_use += 1
+        ok = False
+        try:
+            if not self._healthy(page):
+                self._crashed.discard(id(page))
+                page = await self._new_page()
+            yield page
+            ok = True
+        finally:
+            self._in_use -= 1
+            self._uses += 1
+            await self._recycle(generation, page, ok)
+
+    async def _recycle(self, generation, page, ok):
+        if generation != self._generation:
+            # Context was relaunched while this page was out
+            return
+        if self._uses >= self.max_uses and self._in_use == 0:
+            # Not put back: the relaunch hands out fresh pages
+            await self._relaunch(generation)
+            return
+        try:
+            if ok and self._healthy(page):
+                await page.goto("about:blank")
+            else:
+                self._crashed.discard(id(page))
+                if not page.is_closed():
+                    await page.close()
+                page = await self._new_page()
+            self._pages.put_nowait((generation, page))
+        except Exception as e:
+            print(f"Browser page recycle failed, relaunching: {e}")
+            await self._relaunch(generation)
+
+    async def close(self):
+        await self._shutdown()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        if self._profile_copy is not None:
+            shutil.rmtree(self._profile_copy, ignore_errors=True)
+            self._profile_copy = None
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "running": self._context is not None,
+            "in_use": self._in_use,
+            "uses_since_restart": self._uses,
+            "restarts": self.restarts,
+        }
+
+
+browser_pool = BrowserPool(
+    size=int(os.getenv("PG_BROWSER_POOL_SIZE", "2")),
+    max_uses=int(os.getenv("PG_BROWSER_MAX_USES", "50")),
+    user_data_dir=os.path.join(tempfile.gettempdir(), "pg_scraper_user_data_v2"),
+    launch_options={
+        "headless": True,  # Try headless first with stealth
+        "args": ['--disable-blink-features=AutomationControlled', '--no-sandbox'],
+        "user_agent": DEFAULT_USER_AGENT,
+    },
+)
@@ -0,0 +1,298 @@
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote, urlsplit
+
+from scraper import module_available, run_blocking
+from session_pool import session_pool
+
+# Only listing photos are proxied: anything else would make this an open proxy
+IMAGE_HOSTS = tuple(h.strip() for h in os.getenv("PG_IMAGE_HOSTS", "pgimgs.com").split(",") if h.strip())
+MAX_IMAGE_BYTES = int(os.getenv("PG_IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+FETCH_TIMEOUT = float(os.getenv("PG_IMAGE_FETCH_TIMEOUT", "15"))
+# WeChat-friendly variant: at most this wide, re-encoded as WebP
+WEBP_MAX_WIDTH = int(os.getenv("PG_IMAGE_WEBP_MAX_WIDTH", "1080"))
+WEBP_QUALITY = int(os.getenv("PG_IMAGE_WEBP_QUALITY", "80"))
+
+IMAGE_HEADERS = {
+    'Accept': 'image/avif,image/webp,image/apng,image/*,*/*;q=0.8',
+    'Referer': 'https://www.propertyguru.com.sg/',
+}
+EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp", "image/gif": "gif", "image/avif": "avif"}
+CONTENT_TYPES = {ext: content_type for content_type, ext in EXTENSIONS.items()}
+VARIANTS = ("webp",)
+
+
+class ImageError(Exception):
+    """An image could not be fetched or converted."""
+
+
+def image_key(url: str, variant: str = None) -> str:
+    return hashlib.sha256(f"{url}|{variant or ''}".encode("utf-8")).hexdigest()[:40]
+
+
+def proxy_url(url: str, variant: str = None) -> str:
+    """Path of the local proxy endpoint serving `url`."""
+    path = f"/api/image?url={quote(url, safe='')}"
+    return f"{path}&format={variant}" if variant else path
+
+
+def proxied_images(urls) -> list:
+    """`urls` as proxy endpoint paths, for clients that can't load the image hosts directly."""
+    return [proxy_url(url) for url in urls or ()]
+
+
+class CachedImage:
+    def __init__(self, path: str, content_type: str, key: str):
+        self.path = path
+        self.content_type = content_type
+        self.etag = f'"{key}"'
+
+
+class DiskImageCache:
+    """
+    Directory of image files bounded to `max_bytes`, evicting the least recently used.
+    Recency is tracked in memory; after a restart it starts from the file mtimes.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 512 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (file name, size)
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        files = []
+        for entry in os.scandir(self.root):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".tmp"):  # interrupted write
+                os.remove(entry.path)
+                continue
+            stat = entry.stat()
+            files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name.rsplit(".", 1)[0]] = (name, size)
+            self.total_bytes += size
+        self._evict()
+
+    def _evict(self, keep: str = None):
+        while self.total_bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            if key == keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(key)
+                continue
+            name, size = self._entries.pop(key)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+
+    def get(self, key: str):
+        """CachedImage for `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        name = entry[0]
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path):  # removed behind our back
+            with self._lock:
+                if self._entries.pop(key, None):
+                    self.total_bytes -= entry[1]
+            return None
+        return CachedImage(path, CONTENT_TYPES.get(name.rsplit(".", 1)[1], "application/octet-stream"), key)
+
+    def put(self, key: str, data: bytes, content_type: str) -> CachedImage:
+        name = f"{key}.{EXTENSIONS.get(content_type, 'bin')}"
+        path = os.path.join(self.root, name)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)  # readers never see a half-written file
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self.total_bytes -= old[1]
+            self._entries[key] = (name, len(data))
+            self.total_bytes += len(data)
+            self._evict(keep=key)
+        return CachedImage(path, content_type, key)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _image_session(profile):
+    import requests
+    return requests.Session()
+
+
+session_pool.register("images", _image_session)
+
+
+def download(url: str):
+    """(bytes, content type) of an image URL (blocking), refusing anything over MAX_IMAGE_BYTES."""
+    with session_pool.session("images", "default") as session:
+        with session.get(url, headers=IMAGE_HEADERS, timeout=FETCH_TIMEOUT, stream=True) as response:
+            if response.status_code != 200:
+                raise ImageError(f"Image fetch failed (status {response.status_code}): {url}")
+            content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if not content_type.startswith("image/"):
+                raise ImageError(f"Not an image ({content_type or 'no content type'}): {url}")
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > MAX_IMAGE_BYTES:
+                    raise ImageError(f"Image over {MAX_IMAGE_BYTES} bytes: {url}")
+                chunks.append(chunk)
+    return b"".join(chunks), content_type
+
+
+def webp_available() -> bool:
+    return module_available("PIL")
+
+
+def to_webp(data: bytes, max_width: int = WEBP_MAX_WIDTH, quality: int = WEBP_QUALITY) -> bytes:
+    """Downscale to `max_width` and re-encode as WebP (needs Pillow)."""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    if image.width > max_width:
+        image = image.resize((max_width, max(1, round(image.height * max_width / image.width))), Image.LANCZOS)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if image.mode in ("LA", "P") else "RGB")
+    out = io.BytesIO()
+    image.save(out, "WEBP", quality=quality)
+    return out.getvalue()
+
+
+class ImageService:
+    """
+    Listing photos through a local disk cache: concurrent pre-fetch after a scrape,
+    single-flight downloads, and an optional WebP variant per image.
+    """
+
+    def __init__(self, cache: DiskImageCache, allowed_hosts=IMAGE_HOSTS):
+        self.cache = cache
+        self.allowed_hosts = tuple(allowed_hosts)
+        self._inflight = {}
+        self._background = set()
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "fetched_bytes": 0, "converted": 0}
+
+    def allowed(self, url: str) -> bool:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        return parts.scheme in ("http", "https") and any(
+            host == allowed or host.endswith("." + allowed) for allowed in self.allowed_hosts
+        )
+
+    async def get(self, url: str, variant: str = None) -> CachedImage:
+        """The cached image (fetching it first on a miss); raises ImageError."""
+        if not self.allowed(url):
+            raise ImageError(f"Host not allowed: {url}")
+        if variant is not None and variant not in VARIANTS:
+            raise ImageError(f"Unknown image variant: {variant}")
+        if variant == "webp" and not webp_available():
+            variant = None  # serve the original rather than fail
+        key = image_key(url, variant)
+        image = self.cache.get(key)
+        if image is not None:
+            self.counters["hits"] += 1
+            return image
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.counters["misses"] += 1
+            task = asyncio.create_task(self._load(key, url, variant))
+            self._inflight[key] = task
+        else:
+            self.counters["coalesced"] += 1
+        # shield: a client giving up must not cancel a download others wait on
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, url: str, variant: str):
+        loop = asyncio.get_running_loop()
+        try:
+            if variant is None:
+                data, content_type = await run_blocking("images", download, url)
+                self.counters["fetched_bytes"] += len(data)
+            else:
+                original = await self.get(url)
+                data = await loop.run_in_executor(None, _convert, original.path, variant)
+                content_type = "image/webp"
+                self.counters["converted"] += 1
+            return await loop.run_in_executor(None, self.cache.put, key, data, content_type)
+        except ImageError:
+            self.counters["errors"] += 1
+            raise
+        except Exception as e:
+            self.counters["errors"] += 1
+            raise ImageError(f"Image fetch failed: {url}: {e}")
+        finally:
+            self._inflight.pop(key, None)
+
+    async def prefetch(self, urls, variant: str = None) -> dict:
+        """Fetch the images concurrently (at most PG_IMAGE_FETCH_CONCURRENCY at a time)."""
+        start = time.perf_counter()
+        urls = [url for url in dict.fromkeys(urls) if self.allowed(url)]
+        results = await asyncio.gather(*(self.get(url, variant) for url in urls), return_exceptions=True)
+        failed = [url for url, result in zip(urls, results) if isinstance(result, Exception)]
+        return {"images": len(urls), "failed": failed, "seconds": round(time.perf_counter() - start, 3)}
+
+    def prefetch_in_background(self, urls, variant: str = None):
+        """Start prefetch() without waiting for it."""
+        task = asyncio.create_task(self.prefetch(urls, variant))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    def stats(self) -> dict:
+        return dict(self.counters, entries=len(self.cache), bytes=self.cache.total_bytes,
+                    evictions=self.cache.evictions, inflight=len(self._inflight))
+
+
+def _convert(path: str, variant: str) -> bytes:
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        return to_webp(data)
+    except Exception as e:
+        raise ImageError(f"Could not convert image to {variant}: {e}")
+
+
+PREFETCH = os.getenv("PG_IMAGE_PREFETCH", "1") != "0"
+
+_shared_service = None
+
+
+def get_image_service() -> ImageService:
+    """Process-wide image service, shared across requests."""
+    global _shared_service
+    if _shared_service is None:
+        _shared_service = ImageService(DiskImageCache(
+            os.getenv("PG_IMAGE_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "pg_image_cache"),
+            max_bytes=int(os.getenv("PG_IMAGE_CACHE_BYTES", str(512 * 1024 * 1024))),
+        ))
+    return _shared_service
+
+
+def prefetch_listing_images(data: dict):
+    """Warm the image cache with a freshly scraped listing's photos (PG_IMAGE_PREFETCH=0 disables)."""
+    if PREFETCH and data.get("images"):
+        get_image_service().prefetch_in_background(data["images"])
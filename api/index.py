@@ -1,11 +1,351 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+
+# Vercel loads this file directly; make the sibling modules importable
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ai_service
+from ai_service import MODES, get_ai_service
+from images import VARIANTS, ImageError, get_image_service, proxied_images
+import images
+import jobs
+import listing_store
+import poster
+from jobs import FINISHED, get_job_manager, public_job
+from metrics import metrics
+from listing_store import get_listing_store
+from pipeline import ScrapeFailed, generate_from_url, generate_modes_from_url, recheck_listings, scrape_for_generation
+from poster import MAX_BODY_BYTES as MAX_POSTER_BYTES, body_hasher, get_poster_renderer
+from scraper import get_scraper, listing_cache, module_available, shared_parse_pool
+from session_pool import session_pool
+
+MAX_BATCH_URLS = int(os.getenv("PG_MAX_BATCH_URLS", "50"))
+# Longest a GET /api/jobs/{id}?wait=... long-poll is held open
+MAX_JOB_WAIT = 25
+
+
+async def warm_parse_pool():
+    """Start the parse workers in a thread, so the first pages don't wait for them to spawn."""
+    try:
+        seconds = await run_in_threadpool(shared_parse_pool.warm)
+        print(f"Parse pool ready: {shared_parse_pool.workers} worker(s) in {seconds:.2f}s")
+    except Exception as e:
+        print(f"Parse pool warm-up failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Not awaited: the app takes requests while the workers start
+    warming = asyncio.create_task(warm_parse_pool()) if shared_parse_pool is not None else None
+    yield
+    if warming is not None:
+        await warming
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Snapshots of the caches and pools, read when /api/metrics is scraped. Services
+# that have not been created yet report nothing rather than being started here.
+metrics.register_collector("listing_cache", lambda: listing_cache.stats() if listing_cache else {})
+metrics.register_collector("article_cache", lambda: ai_service.article_cache.stats() if ai_service.article_cache else {})
+metrics.register_collector("session_pool", session_pool.stats)
+metrics.register_collector("image_cache", lambda: images._shared_service.stats() if images._shared_service else {})
+metrics.register_collector("poster", lambda: poster._shared_renderer.stats() if poster._shared_renderer else {})
+metrics.register_collector("jobs", lambda: jobs._shared_manager.stats() if jobs._shared_manager else {})
+metrics.register_collector("parse_pool", lambda: shared_parse_pool.stats() if shared_parse_pool else {})
+metrics.register_collector("listing_store", lambda: listing_store._shared_store.stats() if listing_store._shared_store else {})
+
+
+class BatchScrapeRequest(BaseModel):
+    urls: List[str]
+
+
+class RecheckRequest(BaseModel):
+    urls: List[str]
+    mode: str = "note"
+
+
+class GenerateRequest(BaseModel):
+    url: str
+    mode: str = "note"
+    modes: Optional[List[str]] = None  # several modes from one scrape, e.g. ["note", "xhs"]
+    force: bool = False  # regenerate even if the article is cached
+    background: bool = False  # queue it and return a job to poll instead of the article
+    priority: int = 0  # queued jobs: higher runs first
+
+
+def scrape_error(status: str, data: dict) -> HTTPException:
+    if status == "blocked":
+        return HTTPException(status_code=502, detail="PropertyGuru blocked the request, please try again later")
+    return HTTPException(status_code=502, detail=f"Could not read the listing: {data.get('title')}")
+
+
+async def scrape_listing(url: str) -> dict:
+    """Scrape one listing for generation, turning a failed scrape into an HTTP error."""
+    if not url:
+        raise HTTPException(status_code=400, detail="No URL provided")
+    try:
+        return await scrape_for_generation(url)
+    except ScrapeFailed as e:
+        raise scrape_error(e.status, e.data)
+
+
+def sse_event(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
 
-app = FastAPI()
 
 @app.get("/api/health")
 def health():
-    return {"status": "ok", "msg": "Minimal build"}
+    # Checks what is installed without importing it: health checks hit cold instances
+    return {
+        "status": "ok",
+        "gemini_key": bool(ai_service.api_key),
+        "optional": {name: module_available(name) for name in ("curl_cffi", "playwright", "PIL")},
+    }
+
+@app.get("/api/metrics")
+def metrics_endpoint():
+    """Prometheus text format: per-stage latency histograms, token and cache counters, pool gauges."""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/scrape-status")
+def scrape_state():
+    """Per-strategy success rates, per-host rate limits and circuit breaker states."""
+    scraper = get_scraper()
+    return {
+        "strategies": scraper.stats.snapshot(),
+        "rate_limiter": scraper.rate_limiter.snapshot() if scraper.rate_limiter else None,
+        "breaker": scraper.breaker.snapshot() if scraper.breaker else None,
+    }
+
+@app.post("/api/generate")
+async def generate_article(req: GenerateRequest):
+    """
+    One article for `mode` ({title, content_html, images, proxied_images, timings}),
+    generation overlapping the scrape; or with `modes` one per mode from a single scrape:
+    {"title", "images", "proxied_images", "articles": {mode: {title, content_html}}, "stats"}.
+    proxied_images are the listing photos as /api/image paths.
+    With `background` the request is queued instead: 202 with a job to poll
+    (/api/jobs/{id}) or follow (/api/jobs/{id}/events) for that same result.
+    """
+    if not req.url:
+        raise HTTPException(status_code=400, detail="No URL provided")
+    if req.modes is not None:
+        unknown = [mode for mode in req.modes if mode not in MODES]
+        if not req.modes or unknown:
+            raise HTTPException(status_code=400, detail=f"modes must be a list of {', '.join(MODES)}")
+
+    if req.background:
+        payload = {"url": req.url, "mode": req.mode, "modes": req.modes, "force": req.force}
+        job = get_job_manager().submit(payload, priority=req.priority)
+        return JSONResponse(status_code=202, content={
+            "job_id": job["id"],
+            "status": job["status"],
+            "status_url": f"/api/jobs/{job['id']}",
+            "events_url": f"/api/jobs/{job['id']}/events",
+        })
+
+    try:
+        if req.modes is None:
+            return await generate_from_url(req.url, req.mode, force=req.force)
+        return await generate_modes_from_url(req.url, req.modes, force=req.force)
+    except ScrapeFailed as e:
+        raise scrape_error(e.status, e.data)
+
+@app.get("/api/jobs")
+def job_stats():
+    """Queue depth, job counts and wait/run time percentiles."""
+    return get_job_manager().stats()
+
+@app.get("/api/jobs/{job_id}")
+async def job_status(job_id: str, wait: float = 0):
+    """A queued generation; `wait` holds the request up to that many seconds for it to finish."""
+    manager = get_job_manager()
+    if wait > 0:
+        job = await manager.wait(job_id, timeout=min(wait, MAX_JOB_WAIT))
+    else:
+        job = manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return public_job(job)
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    A queued generation as server-sent events: "status" whenever it changes state,
+    then "complete" with the result or "error".
+    """
+    manager = get_job_manager()
+    if manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+
+    async def events():
+        last = None
+        idle = 0.0
+        while True:
+            job = manager.get(job_id)
+            if job is None:
+                yield sse_event("error", {"detail": "Job expired"})
+                return
+            if (job["status"], job["attempts"]) != last:
+                last = (job["status"], job["attempts"])
+                yield sse_event("status", {"status": job["status"], "attempts": job["attempts"], "error": job["error"]})
+                idle = 0.0
+            if job["status"] in FINISHED:
+                if job["status"] == "done":
+                    yield sse_event("complete", job["result"])
+                else:
+                    yield sse_event("error", {"detail": job["error"]})
+                return
+            start = time.monotonic()
+            await manager.changed(timeout=15)
+            idle += time.monotonic() - start
+            if idle >= 15:
+                yield ": keep-alive\n\n"  # proxies drop idle streams
+                idle = 0.0
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/api/generate-stream")
+async def generate_article_stream(req: GenerateRequest):
+    """
+    Same as /api/generate, streamed as server-sent events: a "listing" event with the
+    scraped data, "chunk" events with HTML as Gemini writes it, then a final "complete"
+    event carrying the same title/content_html as /api/generate.
+    """
+    if req.mode not in MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(MODES)}")
+    data = await scrape_listing(req.url)
+
+    async def events():
+        yield sse_event("listing", dict(data, proxied_images=proxied_images(data.get("images"))))
+        async for event, payload in get_ai_service().generate_wechat_article_stream(data, req.mode, force=req.force):
+            yield sse_event(event, payload)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/api/generate-poster")
+async def generate_poster(request: Request):
+    """
+    Render {"html", "title"} to a PNG poster. The body is read as a stream and hashed
+    as it arrives; a poster rendered before is returned without parsing the body.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_POSTER_BYTES:
+        raise HTTPException(status_code=413, detail=f"Poster request over {MAX_POSTER_BYTES} bytes")
+    body = bytearray()
+    hasher = body_hasher()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_POSTER_BYTES:
+            raise HTTPException(status_code=413, detail=f"Poster request over {MAX_POSTER_BYTES} bytes")
+        hasher.update(chunk)
+    key = hasher.hexdigest()
+    etag = f'"{key}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    renderer = get_poster_renderer()
+    png = renderer.cached(key)
+    cache_status = "hit"
+    if png is None:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be JSON")
+        del body  # the parsed copy is all that is needed from here on
+        html = payload.get("html") if isinstance(payload, dict) else None
+        if not isinstance(html, str) or not html.strip():
+            raise HTTPException(status_code=400, detail="No HTML provided")
+        title = payload.get("title")
+        try:
+            png = await renderer.render(key, html, title if isinstance(title, str) else "")
+        except Exception as e:
+            print(f"Poster render error: {e}")
+            raise HTTPException(status_code=503, detail="Poster rendering failed, please try again later")
+        cache_status = "miss"
+    return Response(
+        content=png,
+        media_type="image/png",
+        headers={"ETag": etag, "X-Poster-Cache": cache_status, "Cache-Control": "private, max-age=86400"},
+    )
+
+@app.get("/api/image")
+async def image_proxy(request: Request, url: str, variant: Optional[str] = Query(None, alias="format")):
+    """
+    A listing photo from the local image cache (fetched on a miss). format=webp serves
+    a downscaled WebP copy for WeChat's size limits. Range requests are supported.
+    """
+    service = get_image_service()
+    if not service.allowed(url):
+        raise HTTPException(status_code=403, detail="Only listing images can be proxied")
+    if variant is not None and variant not in VARIANTS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(VARIANTS)}")
+    try:
+        image = await service.get(url, variant)
+    except ImageError as e:
+        print(f"Image proxy error: {e}")
+        raise HTTPException(status_code=502, detail="Could not fetch the image")
+    if request.headers.get("if-none-match") == image.etag:
+        return Response(status_code=304, headers={"ETag": image.etag})
+    # Cache entries never change content: the key covers the URL and the variant
+    return FileResponse(
+        image.path,
+        media_type=image.content_type,
+        headers={"ETag": image.etag, "Cache-Control": "public, max-age=604800, immutable"},
+    )
+
+@app.post("/api/scrape-batch")
+async def scrape_batch(req: BatchScrapeRequest):
+    """Scrape many listings, streaming one NDJSON line per listing as each finishes."""
+    if not req.urls:
+        raise HTTPException(status_code=400, detail="No URLs provided")
+    if len(req.urls) > MAX_BATCH_URLS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_URLS} URLs per batch")
+
+    async def results():
+        async for result in get_scraper().scrape_many(req.urls):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.post("/api/recheck")
+async def recheck(req: RecheckRequest):
+    """
+    Re-check listings seen before with conditional requests, writing articles only for
+    the ones whose title, price, address or description changed:
+    {"listings": [{url, status, changed, price, bytes, llm_called, article?}], "report"}.
+    """
+    if not req.urls:
+        raise HTTPException(status_code=400, detail="No URLs provided")
+    if len(req.urls) > MAX_BATCH_URLS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_URLS} URLs per batch")
+    if req.mode not in MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(MODES)}")
+    return await recheck_listings(req.urls, req.mode)
 
-@app.get("/api/generate")
-def generate():
-    return {"status": "error", "msg": "Placeholder for dependency check"}
+@app.get("/api/price-history")
+def price_history(url: str, limit: Optional[int] = None):
+    """Price seen on each re-check of a listing, oldest first."""
+    record = get_listing_store().get(url)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Listing has not been checked yet")
+    return {"url": record["url"], "price": record["fields"]["price"], "history": get_listing_store().price_history(url, limit)}
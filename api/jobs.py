@@ -0,0 +1,374 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+
+class JobFailed(Exception):
+    """A job error that retrying will not fix."""
+
+
+def new_job(payload: dict, priority: int = 0, max_attempts: int = 3, now: float = None) -> dict:
+    now = time.time() if now is None else now
+    return {
+        "id": uuid.uuid4().hex,
+        "payload": payload,
+        "priority": priority,  # higher runs first
+        "status": QUEUED,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "created_at": now,
+        "available_at": now,  # pushed back while a retry waits out its backoff
+        "started_at": None,
+        "finished_at": None,
+        "result": None,
+        "error": None,
+    }
+
+
+class MemoryJobQueue:
+    """
+    Jobs in process memory: highest priority first, then oldest.
+    Lost on restart, and only visible to the process that queued them.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._heap = []  # (-priority, seq, job id) of queued jobs
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def put(self, job: dict):
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+            if job["status"] == QUEUED:
+                heapq.heappush(self._heap, (-job["priority"], next(self._seq), job["id"]))
+
+    def claim(self, now: float):
+        """The next runnable job, marked running, or None."""
+        with self._lock:
+            waiting = []
+            job = None
+            while self._heap:
+                entry = heapq.heappop(self._heap)
+                candidate = self._jobs.get(entry[2])
+                if candidate is None or candidate["status"] != QUEUED:
+                    continue  # stale entry
+                if candidate["available_at"] > now:
+                    waiting.append(entry)
+                    continue
+                job = candidate
+                break
+            for entry in waiting:
+                heapq.heappush(self._heap, entry)
+            if job is None:
+                return None
+            job.update(status=RUNNING, started_at=now, attempts=job["attempts"] + 1)
+            return dict(job)
+
+    def save(self, job: dict):
+        self.put(job)
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def counts(self) -> dict:
+        with self._lock:
+            counts = dict.fromkeys((QUEUED, RUNNING, DONE, FAILED), 0)
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+            return counts
+
+    def recover(self, started_before: float) -> int:
+        """
+        Requeue jobs left running by workers that no longer exist. Only this process
+        runs these jobs, so when its workers restart every running job is stuck.
+        """
+        stuck = [job for job in list(self._jobs.values()) if job["status"] == RUNNING]
+        for job in stuck:
+            self.put(dict(job, status=QUEUED))
+        return len(stuck)
+
+    def prune(self, before: float):
+        """Forget finished jobs that finished before `before`."""
+        with self._lock:
+            for job_id in [i for i, job in self._jobs.items() if job["status"] in FINISHED and job["finished_at"] < before]:
+                del self._jobs[job_id]
+
+
+class SQLiteJobQueue:
+    """
+    Jobs in a SQLite file: they survive a restart and can be shared by the worker
+    processes of one machine. Same interface as MemoryJobQueue.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, priority INTEGER NOT NULL, "
+            "available_at REAL NOT NULL, created_at REAL NOT NULL, finished_at REAL, data TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at)")
+
+    def put(self, job: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, status, priority, available_at, created_at, finished_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job["id"], job["status"], job["priority"], job["available_at"], job["created_at"],
+                 job["finished_at"], json.dumps(job, ensure_ascii=False)),
+            )
+
+    def claim(self, now: float):
+        with self._lock:
+            # IMMEDIATE: another process must not claim the same row in between
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT data FROM jobs WHERE status = ? AND available_at <= ? "
+                    "ORDER BY priority DESC, created_at LIMIT 1",
+                    (QUEUED, now),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                job = json.loads(row[0])
+                job.update(status=RUNNING, started_at=now, attempts=job["attempts"] + 1)
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, data = ? WHERE id = ?",
+                    (RUNNING, json.dumps(job, ensure_ascii=False), job["id"]),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job
+
+    def save(self, job: dict):
+        self.put(job)
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def counts(self) -> dict:
+        counts = dict.fromkeys((QUEUED, RUNNING, DONE, FAILED), 0)
+        with self._lock:
+            for status, count in self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+                counts[status] = count
+        return counts
+
+    def recover(self, started_before: float) -> int:
+        """Requeue running jobs started before `started_before`: other processes may still be running newer ones."""
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+        stuck = [job for job in map(json.loads, (row[0] for row in rows)) if job["started_at"] < started_before]
+        for job in stuck:
+            self.put(dict(job, status=QUEUED))
+        return len(stuck)
+
+    def prune(self, before: float):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (DONE, FAILED, before))
+
+    def close(self):
+        self._conn.close()
+
+
+class JobManager:
+    """
+    Runs queued jobs through `handler(payload) -> result dict` on a pool of asyncio
+    workers. Failed attempts are retried with exponential backoff unless the handler
+    raises JobFailed. Workers start on the first submit (or get) in a running loop.
+    """
+
+    def __init__(self, queue, handler, workers: int = 2, max_attempts: int = 3, retry_delay: float = 2.0,
+                 result_ttl: float = 3600, stale_after: float = 600, poll_interval: float = 0.5, clock=time.time):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.result_ttl = result_ttl
+        self.stale_after = stale_after  # a running job older than this has lost its worker
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self._loop = None
+        self._tasks = []
+        self._wakeup = None
+        self._changed = None
+        self._last_prune = 0.0
+        self.wait_seconds = deque(maxlen=1000)  # queued -> first started, recent jobs
+        self.run_seconds = deque(maxlen=1000)
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "retries": 0, "recovered": 0}
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # First use, or the previous loop is gone along with its workers
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._changed = asyncio.Event()
+        self.counters["recovered"] += self.queue.recover(started_before=self.clock() - self.stale_after)
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _notify(self):
+        # Wake everyone waiting for a change, then start a new round
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def submit(self, payload: dict, priority: int = 0) -> dict:
+        """Queue a job; returns it (with its "id")."""
+        self._ensure_workers()
+        job = new_job(payload, priority, self.max_attempts, now=self.clock())
+        self.queue.put(job)
+        self.counters["submitted"] += 1
+        self._wakeup.set()
+        return job
+
+    def get(self, job_id: str):
+        self._ensure_workers()
+        return self.queue.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float = None):
+        """The job once it has finished, or as it is after `timeout` seconds."""
+        self._ensure_workers()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.queue.get(job_id)
+            if job is None or job["status"] in FINISHED:
+                return job
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return job
+            await self.changed(remaining)
+
+    async def changed(self, timeout: float = None):
+        """Return when any job changes state, or after `timeout` seconds."""
+        self._ensure_workers()
+        # Other processes sharing a SQLite queue do not notify us: poll as well
+        timeout = self.poll_interval if timeout is None else min(timeout, self.poll_interval)
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _worker(self):
+        while True:
+            job = self.queue.claim(self.clock())
+            if job is None:
+                self._maybe_prune()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._wakeup.set()  # there may be more work for the other workers
+            await self._run(job)
+
+    async def _run(self, job: dict):
+        if job["attempts"] == 1:
+            self.wait_seconds.append(job["started_at"] - job["created_at"])
+        self._notify()
+        start = time.perf_counter()
+        try:
+            result = await self.handler(job["payload"])
+        except asyncio.CancelledError:
+            self.queue.save(dict(job, status=QUEUED))
+            raise
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            if isinstance(e, JobFailed) or job["attempts"] >= job["max_attempts"]:
+                job.update(status=FAILED, error=error, finished_at=self.clock())
+                self.counters["failed"] += 1
+                print(f"Job {job['id']} failed after {job['attempts']} attempt(s): {error}")
+            else:
+                delay = self.retry_delay * 2 ** (job["attempts"] - 1)
+                job.update(status=QUEUED, error=error, available_at=self.clock() + delay)
+                self.counters["retries"] += 1
+                print(f"Job {job['id']} attempt {job['attempts']} failed, retrying in {delay:.1f}s: {error}")
+        else:
+            job.update(status=DONE, result=result, error=None, finished_at=self.clock())
+            self.counters["completed"] += 1
+        self.run_seconds.append(time.perf_counter() - start)
+        self.queue.save(job)
+        self._notify()
+
+    def _maybe_prune(self):
+        now = self.clock()
+        if now - self._last_prune > 60:
+            self._last_prune = now
+            self.queue.prune(now - self.result_ttl)
+
+    def stats(self) -> dict:
+        counts = self.queue.counts()
+        return dict(
+            self.counters,
+            depth=counts[QUEUED],
+            running=counts[RUNNING],
+            jobs=counts,
+            workers=self.workers,
+            wait_seconds=_summary(self.wait_seconds),
+            run_seconds=_summary(self.run_seconds),
+        )
+
+
+def _summary(samples) -> dict:
+    if not samples:
+        return {"count": 0, "p50": None, "p95": None, "max": None}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 3)
+
+    return {"count": len(ordered), "p50": pick(0.5), "p95": pick(0.95), "max": round(ordered[-1], 3)}
+
+
+def job_queue_from_env():
+    """PG_JOB_DB=<path> keeps jobs in SQLite, otherwise they live in memory."""
+    path = os.getenv("PG_JOB_DB")
+    return SQLiteJobQueue(path) if path else MemoryJobQueue()
+
+
+_shared_manager = None
+
+
+def get_job_manager() -> JobManager:
+    """Process-wide manager for queued /api/generate requests."""
+    global _shared_manager
+    if _shared_manager is None:
+        from pipeline import run_generate_job  # pipeline raises JobFailed from this module
+
+        _shared_manager = JobManager(
+            job_queue_from_env(),
+            run_generate_job,
+            workers=int(os.getenv("PG_JOB_WORKERS", "2")),
+            max_attempts=int(os.getenv("PG_JOB_MAX_ATTEMPTS", "3")),
+            retry_delay=float(os.getenv("PG_JOB_RETRY_DELAY", "2")),
+            result_ttl=float(os.getenv("PG_JOB_RESULT_TTL", "3600")),
+        )
+    return _shared_manager
+
+
+def public_job(job: dict) -> dict:
+    """What clients see of a job."""
+    return {key: job[key] for key in ("id", "status", "priority", "attempts", "created_at", "started_at",
+                                      "finished_at", "result", "error")}
@@ -0,0 +1,143 @@
+import asyncio
+import copy
+import os
+import re
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from cache import LRUCache, SQLiteCache
+from metrics import metrics
+
+# Query params that never change the listing content
+TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "ref", "source", "share", "_gl", "igshid", "mc_cid", "mc_eid"}
+TRACKING_PREFIXES = ("utm_",)
+
+# /listing/for-sale-viva-vista-500010094 or /listing/500010094 -> 500010094
+LISTING_ID_RE = re.compile(r"/[\w-]*listing/(?:[^/]*-)?(\d{5,})$")
+
+
+def normalize_listing_url(url: str) -> str:
+    """
+    Cache key for a listing URL: host + listing ID for a /listing/<slug>-<id> or
+    /listing/<id> path, otherwise host + path + non-tracking query params.
+    The host stays in: the same ID on propertyguru.com.sg and .com.my are different listings.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/")
+    match = LISTING_ID_RE.search(path)
+    if match:
+        return f"{host}/listing/{match.group(1)}"
+
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    )
+    return f"{host}{path}" + (f"?{urlencode(query)}" if query else "")
+
+
+class ListingCache:
+    """
+    Scrape result cache in front of PropertyGuruScraper.
+
+    - fresh for `fresh_ttl` seconds, then served stale while a background refresh runs,
+      until `stale_ttl` when the entry is dropped
+    - memory LRU, plus an optional SQLite file that survives restarts
+    - concurrent requests for the same listing share one in-flight fetch
+    """
+
+    def __init__(self, fresh_ttl: float = 3600, stale_ttl: float = 86400, maxsize: int = 512,
+                 db_path: str = None, cacheable=lambda data: True, clock=time.time):
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.memory = LRUCache(maxsize=maxsize, ttl=stale_ttl, clock=clock)
+        self.disk = SQLiteCache(db_path, table="listings", ttl=stale_ttl, clock=clock) if db_path else None
+        self.cacheable = cacheable
+        self._inflight = {}
+        self._background = set()
+        self.counters = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "refreshes": 0, "stores": 0}
+
+    def _lookup(self, key):
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.set(key, entry[0], stored_at=entry[1])
+        return entry
+
+    def _store(self, key, data):
+        data = copy.deepcopy(data)
+        data.pop("scrape_meta", None)
+        self.memory.set(key, data)
+        if self.disk is not None:
+            self.disk.set(key, data)
+        self.counters["stores"] += 1
+
+    async def _fetch(self, key, url, fetch):
+        try:
+            data = await fetch(url)
+            if self.cacheable(data):
+                self._store(key, data)
+            return data
+        finally:
+            self._inflight.pop(key, None)
+
+    def _single_flight(self, key, url, fetch):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, url, fetch))
+            self._inflight[key] = task
+        else:
+            self.counters["coalesced"] += 1
+        return task
+
+    async def get_or_fetch(self, url: str, fetch):
+        """Return cached data for the listing, calling `await fetch(url)` on a miss."""
+        key = normalize_listing_url(url)
+        entry = self._lookup(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = self.memory.clock() - stored_at
+            if age >= self.fresh_ttl:
+                self.counters["stale_hits"] += 1
+                if key not in self._inflight:
+                    self.counters["refreshes"] += 1
+                    task = self._single_flight(key, url, fetch)
+                    self._background.add(task)
+                    task.add_done_callback(self._background.discard)
+            else:
+                self.counters["hits"] += 1
+            metrics.inc("cache_lookups", cache="listing", result="stale_hit" if age >= self.fresh_ttl else "hit")
+            data = copy.deepcopy(value)
+            data["scrape_meta"] = {"strategy": "cache", "stale": age >= self.fresh_ttl, "age_seconds": round(age, 1)}
+            return data
+
+        self.counters["misses"] += 1
+        metrics.inc("cache_lookups", cache="listing", result="miss")
+        # shield: one caller giving up must not cancel the fetch other callers share
+        data = await asyncio.shield(self._single_flight(key, url, fetch))
+        return copy.deepcopy(data)
+
+    def invalidate(self, url: str):
+        key = normalize_listing_url(url)
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def stats(self) -> dict:
+        return dict(self.counters, entries=len(self.memory), inflight=len(self._inflight))
+
+
+def listing_cache_from_env(cacheable=lambda data: True):
+    """Process-wide cache config; PG_LISTING_CACHE=0 disables it."""
+    if os.getenv("PG_LISTING_CACHE", "1") == "0":
+        return None
+    return ListingCache(
+        fresh_ttl=float(os.getenv("PG_LISTING_CACHE_TTL", "3600")),
+        stale_ttl=float(os.getenv("PG_LISTING_CACHE_STALE_TTL", "86400")),
+        maxsize=int(os.getenv("PG_LISTING_CACHE_SIZE", "512")),
+        db_path=os.getenv("PG_LISTING_CACHE_DB") or None,
+        cacheable=cacheable,
+    )
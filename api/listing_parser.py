@@ -0,0 +1,321 @@
+import json
+import re
+from html.parser import HTMLParser
+
+from matchers import has_block_keyword, listing_images, title_is_blocked
+
+# Pages with less visible text than this are checked for block keywords in the body
+BLOCK_PAGE_TEXT_LIMIT = 2000
+# Below this much (approximate) text the fast path hands over to the tree parser,
+# so the short-page block check always runs on exactly the text BeautifulSoup sees
+FAST_PATH_MIN_TEXT = 2 * BLOCK_PAGE_TEXT_LIMIT
+# Pages smaller than this parse quickly enough as a tree
+FAST_PATH_MIN_BYTES = 64 * 1024
+
+
+def new_listing() -> dict:
+    return {
+        "title": "No Title",
+        "price": "Price on ask",
+        "address": "",
+        "description": "",
+        "images": []
+    }
+
+
+def blocked_listing(reason: str = "Bot Protection Detected") -> dict:
+    data = new_listing()
+    data["title"] = f"[BLOCKED] {reason}"
+    return data
+
+
+def apply_json_ld(data: dict, script_texts):
+    """Fill data from the JSON-LD <script> bodies (None for an empty script)."""
+    for text in script_texts:
+        try:
+            ld_data = json.loads(text)
+            items = ld_data if isinstance(ld_data, list) else [ld_data]
+            for item in items:
+                if item.get("@type") in ["RealEstateListing", "Product", "Accommodation"]:
+                    data["title"] = item.get("name") or data["title"]
+                    data["description"] = item.get("description") or data["description"]
+                    if "offers" in item and isinstance(item["offers"], dict):
+                        data["price"] = f"{item['offers'].get('priceCurrency', 'SGD')} {item['offers'].get('price', '')}"
+                    if "spatialCoverage" in item and isinstance(item["spatialCoverage"], dict):
+                        data["address"] = item["spatialCoverage"].get("address", {}).get("streetAddress", data["address"])
+
+                    # Extract images from JSON-LD
+                    if "image" in item:
+                        imgs = item["image"]
+                        if isinstance(imgs, str):
+                            data["images"].append(imgs)
+                        elif isinstance(imgs, list):
+                            data["images"].extend(imgs)
+        except: continue
+
+
+def needs_css_fallback(data: dict) -> bool:
+    return (data["title"] == "No Title" or data["price"] == "Price on ask"
+            or not data["address"] or not data["description"])
+
+
+def apply_css_fallbacks(data: dict, soup):
+    # 2. Fallback to CSS Selectors (Refined with reference agent logic)
+    if data["title"] == "No Title":
+        title_tag = soup.select_one('h1[da-id="property-title"], h1.title, h1')
+        if title_tag: data["title"] = title_tag.get_text(strip=True)
+
+    if data["price"] == "Price on ask":
+        # Reference agent used data-automation-id='overview-price-txt' or class 'amount'
+        price_tag = soup.select_one('[data-automation-id="overview-price-txt"], .amount, h2[da-id="price-amount"]')
+        if price_tag: data["price"] = price_tag.get_text(strip=True)
+
+    if not data["address"]:
+        # Reference agent used class 'full-address__address'
+        addr_tag = soup.select_one('.full-address__address, p[da-id="property-address"], .address')
+        if addr_tag: data["address"] = addr_tag.get_text(strip=True)
+
+    if not data["description"]:
+        desc_tag = soup.select_one('.listing-description, .description, [da-id="description-widget"]')
+        if desc_tag: data["description"] = desc_tag.get_text(separator="\n", strip=True)
+
+
+def collect_images(data: dict, srcs):
+    # 3. Image Extraction with V800 Transformation
+    # Reference agent suggested V800 suffix for high res
+    data["images"] = listing_images(data["images"], srcs)
+
+
+def emit_core(on_core, data: dict):
+    """Hand a copy of the core fields (everything but the page images) to on_core."""
+    if on_core is not None:
+        on_core(dict(data, images=list(data["images"])))
+
+
+def parse_soup(soup, on_core=None) -> dict:
+    """
+    Extract listing fields from a BeautifulSoup tree (reference implementation).
+    on_core, if given, is called with the text fields before the images are collected.
+    """
+    data = new_listing()
+
+    # Check for block (Strict)
+    page_text = soup.get_text()
+
+    # Check title first
+    title_tag = soup.find("title")
+    if title_tag:
+        if title_is_blocked(title_tag.get_text()):
+             return blocked_listing()
+
+    # Check strict keywords in body only if title is missing or suspicious
+    if len(page_text) < BLOCK_PAGE_TEXT_LIMIT and has_block_keyword(page_text):
+         # Assume it's a block page if it's short and contains keywords
+         return blocked_listing()
+
+    # 1. Try JSON-LD or NEXT_DATA first (Internal Logic)
+    apply_json_ld(data, [script.string for script in soup.find_all('script', type='application/ld+json')])
+    apply_css_fallbacks(data, soup)
+    emit_core(on_core, data)
+    collect_images(data, [img.get('src') or img.get('data-src') or img.get('data-lazy') for img in soup.select('img')])
+    return data
+
+
+# Mirrors the html.parser tree builder so the scan sees the same strings BeautifulSoup would
+_VOID_TAGS = frozenset([
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr', 'image',
+    'img', 'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid', 'param', 'source',
+    'spacer', 'track', 'wbr',
+])
+# Strings inside these are not part of get_text()
+_STRING_CONTAINERS = frozenset(['rt', 'rp', 'style', 'script', 'template'])
+_PRESERVE_WHITESPACE = frozenset(['pre', 'textarea'])
+_ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+
+class _ListingScan(HTMLParser):
+    """
+    Single streaming pass over the page that collects what the parser needs without
+    building a tree: the first <title> text, JSON-LD script bodies, <img> sources
+    and the amount of visible text.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.stack = []
+        self.open_counts = {}
+        self.closed_voids = {}
+        self.container_depth = 0
+        self.preserve_depth = 0
+        self.title_level = None  # stack depth of the first <title> while it is open
+        self.title_seen = False
+        self.title_parts = []
+        self.ld_level = None
+        self.ld_scripts = []
+        self.img_srcs = []
+        self.text_len = 0
+        self._data = []
+
+    def _end_data(self, cdata=False):
+        if not self._data:
+            return
+        text = "".join(self._data)
+        self._data = []
+        if not self.preserve_depth and not text.strip(_ASCII_SPACES):
+            text = "\n" if "\n" in text else " "
+        if self.ld_level is not None and self.ld_level == len(self.stack):
+            self.ld_scripts.append(text)
+        # CDATA sections stay CData (visible text) even inside string containers
+        if self.container_depth and not cdata:
+            return
+        self.text_len += len(text)
+        if self.title_level is not None:
+            self.title_parts.append(text)
+
+    def _push(self, tag, attrs):
+        self.stack.append(tag)
+        self.open_counts[tag] = self.open_counts.get(tag, 0) + 1
+        if tag in _STRING_CONTAINERS:
+            self.container_depth += 1
+        if tag in _PRESERVE_WHITESPACE:
+            self.preserve_depth += 1
+        if tag == 'title' and not self.title_seen:
+            self.title_seen = True
+            self.title_level = len(self.stack)
+        if tag == 'script' and dict(attrs).get('type') == 'application/ld+json':
+            self.ld_level = len(self.stack)
+
+    def _pop(self):
+        tag = self.stack.pop()
+        self.open_counts[tag] -= 1
+        if tag in _STRING_CONTAINERS:
+            self.container_depth -= 1
+        if tag in _PRESERVE_WHITESPACE:
+            self.preserve_depth -= 1
+        if self.title_level is not None and len(self.stack) < self.title_level:
+            self.title_level = None
+        if self.ld_level is not None and len(self.stack) < self.ld_level:
+            self.ld_level = None
+        return tag
+
+    def _pop_to(self, tag):
+        if not self.open_counts.get(tag):
+            return
+        while self._pop() != tag:
+            pass
+
+    def _image(self, attrs):
+        found = {}
+        for key, value in attrs:
+            if key in ('src', 'data-src', 'data-lazy'):
+                found[key] = value or ""
+        self.img_srcs.append(found.get('src') or found.get('data-src') or found.get('data-lazy'))
+
+    def handle_starttag(self, tag, attrs):
+        self._end_data()
+        if tag == 'img':
+            self._image(attrs)
+        if tag in _VOID_TAGS:
+            # Opened and closed at once; an explicit </tag> later is ignored
+            self.closed_voids[tag] = self.closed_voids.get(tag, 0) + 1
+            return
+        self._push(tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        self._end_data()
+        if tag == 'img':
+            self._image(attrs)
+        if tag == 'title':
+            self.title_seen = True  # an empty <title/> still counts as the first title
+
+    def handle_endtag(self, tag):
+        if self.closed_voids.get(tag):
+            # Redundant end tag of a void element: ignored, text runs on across it
+            self.closed_voids[tag] -= 1
+            return
+        self._end_data()
+        self._pop_to(tag)
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_comment(self, data):
+        self._end_data()
+
+    def handle_decl(self, decl):
+        self._end_data()
+
+    def handle_pi(self, data):
+        self._end_data()
+
+    def unknown_decl(self, data):
+        self._end_data()
+        if data.upper().startswith("CDATA["):
+            self._data.append(data[len("CDATA["):])
+            self._end_data(cdata=True)
+
+    def close(self):
+        super().close()
+        self._end_data()
+
+
+# Cheap look-ahead at the JSON-LD, only used to pick the cheaper path (never for output)
+_LD_JSON_RE = re.compile(r'<script[^>]*application/ld\+json[^>]*>(.*?)</script', re.IGNORECASE | re.DOTALL)
+
+
+def _soup(html: str):
+    # bs4 is imported on first use: it is a noticeable part of a cold start
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, 'html.parser')
+
+
+def _tree_parse(html: str, on_core=None) -> dict:
+    return parse_soup(_soup(html), on_core)
+
+
+def json_ld_core(html: str):
+    """
+    The core fields from the page's JSON-LD alone, without parsing the HTML; None
+    when the JSON-LD lacks some of them (only a full parse would find those).
+    """
+    data = new_listing()
+    apply_json_ld(data, _LD_JSON_RE.findall(html))
+    return None if needs_css_fallback(data) else data
+
+
+def parse_html(html: str, on_core=None) -> dict:
+    """
+    Fast path equivalent to parse_soup(BeautifulSoup(html, 'html.parser')).
+
+    One streaming pass finds the block markers, JSON-LD and image sources; a tree is
+    only built when a CSS fallback is needed. Small pages, and pages whose JSON-LD
+    clearly lacks fields, go straight to the tree parser since the scan would not pay off.
+
+    on_core, if given, is called once with the core fields as soon as they are known.
+    On large pages that is straight from the JSON-LD look-ahead, before the block check,
+    so the returned data stays authoritative.
+    """
+    if len(html) < FAST_PATH_MIN_BYTES:
+        return _tree_parse(html, on_core)
+    predicted = new_listing()
+    apply_json_ld(predicted, _LD_JSON_RE.findall(html))
+    if needs_css_fallback(predicted):
+        return _tree_parse(html, on_core)
+    emit_core(on_core, predicted)
+
+    scan = _ListingScan()
+    scan.feed(html)
+    scan.close()
+
+    if scan.text_len < FAST_PATH_MIN_TEXT:
+        return _tree_parse(html)
+
+    if scan.title_seen and title_is_blocked("".join(scan.title_parts)):
+        return blocked_listing()
+
+    data = new_listing()
+    apply_json_ld(data, scan.ld_scripts)
+    if needs_css_fallback(data):
+        apply_css_fallbacks(data, _soup(html))
+    collect_images(data, scan.img_srcs)
+    return data
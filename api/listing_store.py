@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from listing_cache import normalize_listing_url
+
+# The fields the article is written from (see AIService.build_prompt)
+CONTENT_FIELDS = ("title", "price", "address", "description")
+
+NEW, CHANGED, UNCHANGED, NOT_MODIFIED = "new", "changed", "unchanged", "not_modified"
+
+
+def _normalize(value) -> str:
+    return " ".join(str(value or "").split())
+
+
+def content_hash(data: dict) -> str:
+    """Hash of the article fields, whitespace-normalised so re-rendered markup doesn't count as a change."""
+    text = "\n".join(_normalize(data.get(field)) for field in CONTENT_FIELDS)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ListingStore:
+    """
+    SQLite record of listings that get re-checked: the validators the site sent
+    (ETag / Last-Modified), a content hash of CONTENT_FIELDS, the fields themselves,
+    the articles written from them (per mode) and one price-history row per check.
+
+    Unlike ListingCache this never expires: it answers "did anything change since
+    the last check?", not "can this scrape be skipped?".
+    """
+
+    def __init__(self, path: str, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS listings (key TEXT PRIMARY KEY, url TEXT NOT NULL, etag TEXT, "
+            "last_modified TEXT, content_hash TEXT NOT NULL, fields TEXT NOT NULL, page_bytes INTEGER, "
+            "articles TEXT NOT NULL, checked_at REAL NOT NULL, changed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS price_history (key TEXT NOT NULL, checked_at REAL NOT NULL, "
+            "price TEXT, status TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS price_history_key ON price_history (key, checked_at)")
+        self.counters = {"checks": 0, NEW: 0, CHANGED: 0, UNCHANGED: 0, NOT_MODIFIED: 0}
+
+    def _select(self, key: str):
+        # Called with the lock held
+        row = self._conn.execute(
+            "SELECT url, etag, last_modified, content_hash, fields, page_bytes, articles, checked_at, changed_at "
+            "FROM listings WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "url": row[0],
+            "etag": row[1],
+            "last_modified": row[2],
+            "content_hash": row[3],
+            "fields": json.loads(row[4]),
+            "page_bytes": row[5],
+            "articles": json.loads(row[6]),
+            "checked_at": row[7],
+            "changed_at": row[8],
+        }
+
+    def get(self, url: str):
+        """The stored record for a listing, or None."""
+        with self._lock:
+            return self._select(normalize_listing_url(url))
+
+    def observe(self, url: str, data: dict, etag: str = None, last_modified: str = None, page_bytes: int = None):
+        """
+        Record a freshly fetched listing: (status, changed field names), status being
+        NEW, CHANGED or UNCHANGED by content hash. Articles written from the old
+        fields are dropped when they changed.
+        """
+        key = normalize_listing_url(url)
+        fields = {field: data.get(field) or "" for field in CONTENT_FIELDS}
+        digest = content_hash(fields)
+        now = self.clock()
+        with self._lock:
+            # Compared and written in one transaction: the same URL twice in a batch is NEW once
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                previous = self._select(key)
+                if previous is None:
+                    status, changed = NEW, list(CONTENT_FIELDS)
+                elif previous["content_hash"] == digest:
+                    status, changed = UNCHANGED, []
+                else:
+                    status = CHANGED
+                    changed = [
+                        f for f in CONTENT_FIELDS if _normalize(previous["fields"].get(f)) != _normalize(fields[f])
+                    ]
+                articles = previous["articles"] if status == UNCHANGED else {}
+                changed_at = previous["changed_at"] if status == UNCHANGED else now
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO listings (key, url, etag, last_modified, content_hash, fields, page_bytes, "
+                    "articles, checked_at, changed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, url, etag, last_modified, digest, json.dumps(fields, ensure_ascii=False), page_bytes,
+                     json.dumps(articles, ensure_ascii=False), now, changed_at),
+                )
+                self._history(key, now, fields["price"], status)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.counters["checks"] += 1
+        self.counters[status] += 1
+        return status, changed
+
+    def not_modified(self, url: str, etag: str = None, last_modified: str = None):
+        """Record a 304 answer; newer validators from the response replace the stored ones."""
+        key = normalize_listing_url(url)
+        now = self.clock()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "UPDATE listings SET checked_at = ?, etag = COALESCE(?, etag), "
+                    "last_modified = COALESCE(?, last_modified) WHERE key = ?",
+                    (now, etag, last_modified, key),
+                )
+                row = self._conn.execute("SELECT fields FROM listings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._history(key, now, json.loads(row[0]).get("price"), NOT_MODIFIED)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.counters["checks"] += 1
+        self.counters[NOT_MODIFIED] += 1
+
+    def _history(self, key, now, price, status):
+        # Called with the lock held, inside a transaction
+        self._conn.execute(
+            "INSERT INTO price_history (key, checked_at, price, status) VALUES (?, ?, ?, ?)", (key, now, price, status)
+        )
+
+    def save_article(self, url: str, mode: str, article: dict):
+        """Keep the article written from the stored fields, to reuse while they stay unchanged."""
+        key = normalize_listing_url(url)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                row = self._conn.execute("SELECT articles FROM listings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    articles = dict(json.loads(row[0]), **{mode: article})
+                    self._conn.execute(
+                        "UPDATE listings SET articles = ? WHERE key = ?", (json.dumps(articles, ensure_ascii=False), key)
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def price_history(self, url: str, limit: int = None) -> list:
+        """[{checked_at, price, status}], oldest first; `limit` keeps the newest entries."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT checked_at, price, status FROM price_history WHERE key = ? ORDER BY checked_at DESC LIMIT ?",
+                (normalize_listing_url(url), -1 if limit is None else limit),
+            ).fetchall()
+        return [{"checked_at": t, "price": price, "status": status} for t, price, status in reversed(rows)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            listings = self._conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+        return dict(self.counters, listings=listings)
+
+    def close(self):
+        self._conn.close()
+
+
+_shared_store = None
+
+
+def get_listing_store() -> ListingStore:
+    """Process-wide store; PG_LISTING_STORE_DB sets the file (default in the temp dir)."""
+    global _shared_store
+    if _shared_store is None:
+        _shared_store = ListingStore(
+            os.getenv("PG_LISTING_STORE_DB") or os.path.join(tempfile.gettempdir(), "pg_listing_store.db")
+        )
+    return _shared_store
@@ -0,0 +1,70 @@
+import re
+
+BLOCK_KEYWORDS = [
+    "Just a moment",
+    "Access Denied",
+    "Bot Protection Detected",
+    "Checking your browser",
+    "Attention Required",
+    "Cloudflare"
+]
+
+# Exclude icons/avatars/UI elements (matched case-insensitively against the URL)
+EXCLUDED_IMAGE_PATTERNS = [
+    'APHO', 'hui-svgicon', 'logo', 'avatar', 'icon',
+    'navbar-', 'map-shortcut', 'flags', 'static'
+]
+
+MAX_IMAGES = 20
+
+
+# Plain substring checks over pre-lowered tuples: for a handful of short keywords this
+# beats a combined IGNORECASE regex alternation by several times in CPython
+_BLOCK_KEYWORDS_LOWER = tuple(k.lower() for k in BLOCK_KEYWORDS)
+_EXCLUDED_IMAGE_LOWER = tuple(p.lower() for p in EXCLUDED_IMAGE_PATTERNS)
+# Matches patterns like .V550, .R550X550 etc.
+_HIGH_RES_RE = re.compile(r'\.(V\d+|R\d+X\d+)(\.jpg|\.png)')
+
+
+def has_block_keyword(text: str) -> bool:
+    """Case-sensitive block keyword search (page body)."""
+    for keyword in BLOCK_KEYWORDS:
+        if keyword in text:
+            return True
+    return False
+
+
+def title_is_blocked(title_text: str) -> bool:
+    """Case-insensitive block keyword search (page <title>)."""
+    title_text = title_text.lower()
+    for keyword in _BLOCK_KEYWORDS_LOWER:
+        if keyword in title_text:
+            return True
+    return False
+
+
+def is_excluded_image(src: str) -> bool:
+    src = src.lower()
+    for pattern in _EXCLUDED_IMAGE_LOWER:
+        if pattern in src:
+            return True
+    return False
+
+
+def to_high_res(src: str) -> str:
+    """Rewrite a pgimgs.com thumbnail URL to the V800 size."""
+    return _HIGH_RES_RE.sub(r'.V800\2', src)
+
+
+def listing_images(existing, srcs, limit: int = MAX_IMAGES) -> list:
+    """
+    Append the listing photos among `srcs` (as V800 URLs) to `existing`,
+    de-duplicated in order and capped at `limit`.
+    """
+    images = dict.fromkeys(existing)  # insertion-ordered set
+    for src in srcs:
+        if len(images) >= limit:
+            break
+        if src and "pgimgs.com" in src and not is_excluded_image(src):
+            images.setdefault(to_high_res(src))
+    return list(images)[:limit]
@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Seconds; wide enough for a 90 s Playwright scrape
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float):
+        """Upper bound of the bucket holding the q-th observation (None when empty)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+_label_keys = {}
+
+
+def _label_key(labels: dict) -> tuple:
+    # Label sets repeat endlessly on the hot path: sort and stringify each one once
+    raw = tuple(labels.items())
+    key = _label_keys.get(raw)
+    if key is None:
+        if len(_label_keys) > 4096:  # runaway label values: don't grow without bound
+            _label_keys.clear()
+        key = _label_keys[raw] = tuple(sorted((k, str(v)) for k, v in raw if v is not None))
+    return key
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Metrics:
+    """
+    Process-wide counters and latency histograms, rendered in the Prometheus text format.
+
+    Recording is a dict lookup and a few additions under a lock, cheap enough for the
+    hot path (see bench_metrics.py). With `json_logs` every span is also printed as
+    one JSON line.
+    """
+
+    def __init__(self, prefix: str = "pg", json_logs: bool = False, clock=time.perf_counter):
+        self.prefix = prefix
+        self.json_logs = json_logs
+        self.clock = clock
+        self._counters = {}  # name -> {label key: value}
+        self._histograms = {}  # name -> {label key: Histogram}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(seconds)
+
+    def span(self, name: str, **labels):
+        """
+        Context manager timing a block into the `<name>_seconds` histogram. The dict it
+        yields can set "outcome" (a label) or other fields, which go to the JSON log only.
+        """
+        return _Span(self, name, labels)
+
+    def timing(self, name: str, seconds: float, outcome: str = "ok", fields: dict = None, **labels):
+        """Record a span measured elsewhere."""
+        self.observe(f"{name}_seconds", seconds, outcome=outcome, **labels)
+        if self.json_logs:
+            self.log(name, seconds=round(seconds, 6), outcome=outcome, **labels, **(fields or {}))
+
+    def log(self, event: str, **fields):
+        print(json.dumps({"ts": round(time.time(), 3), "event": event, **fields}, ensure_ascii=False, default=str))
+
+    def register_collector(self, name: str, collect):
+        """collect() -> {stat: number}, read at render time as `<name>{stat="..."}`."""
+        self._collectors[name] = collect
+
+    def histogram(self, name: str, **labels):
+        """The Histogram for one labelled series, or None."""
+        return self._histograms.get(name, {}).get(_label_key(labels))
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        p = self.prefix
+        lines = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {
+                name: {key: (list(h.buckets), list(h.counts), h.sum, h.count) for key, h in series.items()}
+                for name, series in self._histograms.items()
+            }
+        for name, series in sorted(counters.items()):
+            lines.append(f"# TYPE {p}_{name}_total counter")
+            for key, value in series.items():
+                lines.append(f"{p}_{name}_total{_format_labels(key)} {value:g}")
+        for name, series in sorted(histograms.items()):
+            lines.append(f"# TYPE {p}_{name} histogram")
+            for key, (buckets, counts, total, count) in series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+                    cumulative += bucket_count
+                    le = bound if bound == "+Inf" else f"{bound:g}"
+                    lines.append(f"{p}_{name}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+                lines.append(f"{p}_{name}_sum{_format_labels(key)} {total:.6f}")
+                lines.append(f"{p}_{name}_count{_format_labels(key)} {count}")
+        for name, collect in sorted(self._collectors.items()):
+            try:
+                stats = collect() or {}
+            except Exception as e:
+                print(f"Metrics collector {name} failed: {e}")
+                continue
+            lines.append(f"# TYPE {p}_{name} gauge")
+            for stat, value in stats.items():
+                if isinstance(value, (int, float)):
+                    lines.append(f'{p}_{name}{{stat="{_escape(str(stat))}"}} {float(value):g}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+class _Span:
+    # A plain class rather than @contextmanager: this runs on every parse and LLM call
+    __slots__ = ("metrics", "name", "labels", "fields", "start")
+
+    def __init__(self, metrics: Metrics, name: str, labels: dict):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.fields = {}
+
+    def __enter__(self):
+        self.start = self.metrics.clock()
+        return self.fields
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = self.metrics.clock() - self.start
+        if exc_type is not None:
+            # Cancelled, or a generator closed early, is not an error
+            self.fields.setdefault("outcome", "error" if issubclass(exc_type, Exception) else "cancelled")
+        outcome = self.fields.pop("outcome", "ok")
+        self.metrics.timing(self.name, seconds, outcome, self.fields, **self.labels)
+        return False
+
+
+metrics = Metrics(json_logs=os.getenv("PG_JSON_LOGS", "0") == "1")
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import threading
+import time
+
+from metrics import metrics
+
+# A page every worker parses once at start-up: loads bs4's tree builder and runs
+# both parser paths, so the first real page doesn't pay for it
+_WARM_PAGE = (
+    b'<html><head><title>Warm</title><script type="application/ld+json">{"name": "Warm"}</script></head>'
+    b'<body><h1>Warm</h1><img src="https://sg1-cdn.pgimgs.com/listing/1/UPHO.1.V550/warm.jpg"></body></html>'
+)
+
+
+def decode(body, encoding: str = None) -> str:
+    if isinstance(body, str):
+        return body  # already text, e.g. a browser's page content
+    return body.decode(encoding or "utf-8", errors="replace")
+
+
+def parse_bytes(body, encoding: str = None) -> dict:
+    """
+    parse_html on the raw response body, decoded with the response's charset (UTF-8
+    when unknown); a str body is parsed as it is.
+    """
+    from listing_parser import parse_html
+
+    return parse_html(decode(body, encoding))
+
+
+def _warm_worker():
+    # Runs once in each worker process
+    import bs4
+    import listing_parser  # compiles its and matchers' regexes
+
+    parse_bytes(_WARM_PAGE)
+    listing_parser.parse_soup(bs4.BeautifulSoup(decode(_WARM_PAGE), "html.parser"))
+
+
+def _ready():
+    return os.getpid()
+
+
+class ParsePool:
+    """
+    parse_html in a ProcessPoolExecutor, so parsing multi-MB pages uses every core
+    instead of holding the event loop's GIL.
+
+    - workers are spawned (not forked: the app has threads by then) with bs4 and the
+      parser's regexes already loaded; warm() starts them all up front
+    - the raw response bytes go over, decoded in the worker; only the result dict,
+      a few KB, comes back
+    - a broken pool (e.g. a worker was OOM-killed) is replaced, and that page is
+      parsed in-process meanwhile, on `fallback_executor` (the loop's default
+      executor when None), never on the event loop itself
+    """
+
+    def __init__(self, workers: int, start_method: str = "spawn", fallback_executor=None):
+        self.workers = workers
+        self.start_method = start_method
+        self.fallback_executor = fallback_executor
+        self._executor = None
+        self._lock = threading.Lock()
+        self.counters = {"parses": 0, "bytes": 0, "fallbacks": 0, "restarts": 0}
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_warm_worker,
+                )
+            return self._executor
+
+    def warm(self) -> float:
+        """Start every worker now (blocking); returns the seconds it took."""
+        start = time.perf_counter()
+        pool = self._pool()
+        # One task per worker in flight at once makes the pool start all of them
+        futures = [pool.submit(_ready) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+        return time.perf_counter() - start
+
+    async def parse(self, body, encoding: str = None) -> dict:
+        """
+        The parse_html result for a response body (bytes) or page content (str; its
+        length in characters counts as its bytes).
+        """
+        from concurrent.futures.process import BrokenProcessPool
+
+        loop = asyncio.get_running_loop()
+        with metrics.span("parse") as span:
+            span["bytes"] = len(body)
+            span["pool"] = True
+            pool = self._pool()
+            try:
+                data = await loop.run_in_executor(pool, parse_bytes, body, encoding)
+            except BrokenProcessPool as e:
+                print(f"Parse pool broke ({e}), restarting it")
+                self._restart(pool)
+                self.counters["fallbacks"] += 1
+                data = await loop.run_in_executor(self.fallback_executor, parse_bytes, body, encoding)
+            if data["title"].startswith("[BLOCKED]"):
+                span["outcome"] = "blocked"
+        self.counters["parses"] += 1
+        self.counters["bytes"] += len(body)
+        return data
+
+    def _restart(self, broken):
+        with self._lock:
+            if self._executor is not broken:
+                return  # another parse on the same pool got here first
+            self._executor = None
+            self.counters["restarts"] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        return dict(self.counters, workers=self.workers, started=self._executor is not None)
+
+
+def parse_pool_from_env(fallback_executor=None):
+    """
+    PG_PARSE_WORKERS=<n> (or "auto" for one per core) parses in worker processes.
+    Unset or 0, the default, parses in-process: serverless hosts give one core and
+    often no multiprocessing.
+    """
+    workers = os.getenv("PG_PARSE_WORKERS", "0").strip().lower()
+    count = (os.cpu_count() or 1) if workers == "auto" else int(workers or 0)
+    return ParsePool(count, fallback_executor=fallback_executor) if count > 0 else None
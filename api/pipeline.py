@@ -0,0 +1,226 @@
+import asyncio
+import time
+
+from ai_service import get_ai_service, is_generated
+from images import prefetch_listing_images, proxied_images
+from jobs import JobFailed
+from listing_store import CHANGED, NEW, NOT_MODIFIED, UNCHANGED, get_listing_store
+from scraper import BATCH_CONCURRENCY, get_scraper, scrape_status
+
+
+class ScrapeFailed(Exception):
+    """The listing could not be scraped (status is 'blocked' or 'failed')."""
+
+    def __init__(self, status: str, data: dict):
+        super().__init__(f"Scrape {status}: {data.get('title')}")
+        self.status = status
+        self.data = data
+
+
+class GenerationFailed(Exception):
+    """The model didn't write an article (its error page came back instead); worth retrying."""
+
+
+async def _timed(coro):
+    start = time.perf_counter()
+    result = await coro
+    return result, start, time.perf_counter()
+
+
+async def generate_from_url(url: str, mode='note', force: bool = False, scraper=None, ai=None) -> dict:
+    """
+    Scrape a listing and write its article, overlapping the two: the Gemini call starts
+    on the core fields as soon as the scraper reports them, while the scrape carries on
+    with the images. If the final listing would render a different prompt (e.g. the
+    early fields came from a page that turned out to be challenged) the early article
+    is dropped and generated again from the final data.
+
+    Returns the article ({title, content_html}) plus the listing images, the same
+    images through the image proxy ("proxied_images") and a "timings" dict with
+    per-stage seconds.
+    """
+    scraper = scraper or get_scraper()
+    ai = ai or get_ai_service()
+    start = time.perf_counter()
+    early = {}
+
+    def on_core(core):
+        # Only while this scrape runs; a background cache refresh may call back later
+        if early:
+            return
+        early["core"] = core
+        early["at"] = time.perf_counter()
+        early["task"] = asyncio.create_task(_timed(ai.generate_wechat_article(core, mode, force=force)))
+
+    try:
+        data = await scraper.scrape(url, on_core=on_core)
+    except BaseException:
+        if "task" in early:
+            early["task"].cancel()
+        raise
+    finally:
+        early.setdefault("closed", True)
+    scraped_at = time.perf_counter()
+
+    status = scrape_status(data)
+    task = early.get("task")
+    if status != "ok":
+        if task is not None:
+            task.cancel()
+        raise ScrapeFailed(status, data)
+    prefetch_listing_images(data)
+
+    reused = task is not None and ai.build_prompt(early["core"], mode) == ai.build_prompt(data, mode)
+    if task is not None and not reused:
+        task.cancel()
+    if not reused:
+        task = asyncio.ensure_future(_timed(ai.generate_wechat_article(data, mode, force=force)))
+    article, generate_start, generate_end = await task
+
+    end = time.perf_counter()
+    scrape_seconds = scraped_at - start
+    generate_seconds = generate_end - generate_start
+    timings = {
+        "scrape_seconds": round(scrape_seconds, 3),
+        "core_ready_seconds": round(early["at"] - start, 3) if "at" in early else None,
+        "generate_seconds": round(generate_seconds, 3),
+        # Generation time that ran while the scrape was still going
+        "overlap_seconds": round(max(0.0, min(scraped_at, generate_end) - generate_start), 3),
+        "total_seconds": round(end - start, 3),
+        "sequential_seconds": round(scrape_seconds + generate_seconds, 3),
+        "early_generation": reused,
+    }
+    timings["seconds_saved"] = round(max(0.0, timings["sequential_seconds"] - timings["total_seconds"]), 3)
+    images = data.get("images", [])
+    return dict(article, images=images, proxied_images=proxied_images(images), timings=timings)
+
+
+async def scrape_for_generation(url: str, scraper=None) -> dict:
+    """Scrape a listing to generate from; raises ScrapeFailed unless the scrape is usable."""
+    data = await (scraper or get_scraper()).scrape(url)
+    status = scrape_status(data)
+    if status != "ok":
+        raise ScrapeFailed(status, data)
+    prefetch_listing_images(data)
+    return data
+
+
+async def generate_modes_from_url(url: str, modes, force: bool = False, scraper=None, ai=None) -> dict:
+    """
+    One article per mode from a single scrape:
+    {"title", "images", "proxied_images", "articles": {mode: {title, content_html}}, "stats"}.
+    """
+    ai = ai or get_ai_service()
+    data = await scrape_for_generation(url, scraper)
+    result = await ai.generate_wechat_articles(data, modes, force=force)
+    # Running the modes one by one would also have scraped the listing once per mode
+    extra_scrapes = len(result["articles"]) - 1
+    scrape_seconds = (data.get("scrape_meta") or {}).get("total_seconds") or 0.0
+    stats = result["stats"]
+    stats["scrapes_saved"] = extra_scrapes
+    if stats["seconds_saved"] is not None:  # None: a combined call, with no single-mode timing yet
+        stats["seconds_saved"] = round(stats["seconds_saved"] + scrape_seconds * extra_scrapes, 3)
+    images = data.get("images", [])
+    return {"title": data.get("title"), "images": images, "proxied_images": proxied_images(images), **result}
+
+
+async def _in_thread(fn, *args):
+    # Listing store calls are SQLite work: off the event loop
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+async def recheck_listing(url: str, mode='note', store=None, scraper=None, ai=None) -> dict:
+    """
+    Re-check a listing against the listing store and write a new article only if the
+    article fields changed (or no article for `mode` is stored yet):
+    {"url", "status": new|changed|unchanged|not_modified|blocked|failed, "changed",
+     "price", "bytes", "llm_called", "article" (only when written)}.
+    A 304 or an unchanged content hash stops there and reuses the stored article.
+    """
+    store = store or get_listing_store()
+    scraper = scraper or get_scraper()
+    ai = ai or get_ai_service()
+    record = await _in_thread(store.get, url)
+    fetched = await scraper.recheck(url, *((record["etag"], record["last_modified"]) if record else ()))
+    result = {"url": url, "changed": [], "bytes": fetched["bytes"], "llm_called": False}
+
+    if fetched["not_modified"] and record is not None:
+        await _in_thread(store.not_modified, url, fetched["etag"], fetched["last_modified"])
+        status, fields = NOT_MODIFIED, record["fields"]
+    else:
+        data = fetched["data"]
+        scraped = scrape_status(data) if data else "failed"
+        if scraped != "ok":
+            return dict(result, status=scraped, price=None)
+        status, result["changed"] = await _in_thread(
+            store.observe, url, data, fetched["etag"], fetched["last_modified"], fetched["bytes"]
+        )
+        fields = data
+        record = await _in_thread(store.get, url)
+    result.update(status=status, price=fields.get("price"))
+
+    if status in (NEW, CHANGED) or mode not in record["articles"]:
+        article = await ai.generate_wechat_article(fields, mode)
+        result["llm_called"] = True
+        result["article"] = article
+        if is_generated(article):
+            await _in_thread(store.save_article, url, mode, article)
+    return result
+
+
+async def recheck_listings(urls, mode='note', concurrency: int = None, store=None, scraper=None, ai=None) -> dict:
+    """
+    Re-check many listings: {"listings": [per-listing results, input order], "report"}.
+    The report counts each status, the bytes downloaded against the full pages a
+    plain re-scrape would have downloaded, and the LLM calls the store avoided.
+    """
+    semaphore = asyncio.Semaphore(concurrency or BATCH_CONCURRENCY)
+    store = store or get_listing_store()
+
+    async def one(url):
+        async with semaphore:
+            try:
+                return await recheck_listing(url, mode, store=store, scraper=scraper, ai=ai)
+            except Exception as e:
+                print(f"Re-check error for {url}: {e}")
+                return {"url": url, "status": "error", "error": str(e)}
+
+    # Sizes of the pages as last downloaded in full, read before this run replaces them
+    full_sizes = await _in_thread(lambda: [(store.get(url) or {}).get("page_bytes") for url in urls])
+    results = await asyncio.gather(*(one(url) for url in urls))
+
+    report = {"listings": len(results), "bytes_fetched": 0, "bytes_full_pages": 0, "bytes_unknown": 0}
+    for result, full_size in zip(results, full_sizes):
+        report[result["status"]] = report.get(result["status"], 0) + 1
+        if result.get("bytes") is None:
+            report["bytes_unknown"] += "bytes" in result  # fell back to a full scrape
+            continue
+        report["bytes_fetched"] += result["bytes"]
+        # A listing seen for the first time was downloaded in full anyway
+        report["bytes_full_pages"] += full_size or result["bytes"]
+    report["bytes_saved"] = max(0, report["bytes_full_pages"] - report["bytes_fetched"])
+    report["llm_calls"] = sum(1 for r in results if r.get("llm_called"))
+    report["llm_calls_avoided"] = sum(
+        1 for r in results if r["status"] in (UNCHANGED, NOT_MODIFIED) and not r["llm_called"]
+    )
+    return {"listings": results, "report": report}
+
+
+async def run_generate_job(payload: dict) -> dict:
+    """Job handler for a queued /api/generate request: {url, mode or modes, force}."""
+    try:
+        if payload.get("modes"):
+            result = await generate_modes_from_url(payload["url"], payload["modes"], force=payload.get("force", False))
+            articles = result["articles"]
+        else:
+            result = await generate_from_url(payload["url"], payload.get("mode", "note"), force=payload.get("force", False))
+            articles = {payload.get("mode", "note"): result}
+    except ScrapeFailed as e:
+        if e.status == "blocked":
+            raise  # worth another attempt after the backoff
+        raise JobFailed(f"Could not read the listing: {e.data.get('title')}")
+    failed = [mode for mode, article in articles.items() if not is_generated(article)]
+    if failed:
+        # The generation errors come back as article HTML; a job is retried after the backoff
+        raise GenerationFailed(f"Generation failed for {', '.join(failed)}")
+    return result
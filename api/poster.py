@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import html as html_lib
+import os
+
+from browser_pool import BrowserPool
+from cache import LRUCache
+from images import ImageService, get_image_service
+
+# Bump when the poster template changes, so cached PNGs of the old layout are not served
+TEMPLATE_VERSION = 1
+POSTER_WIDTH = int(os.getenv("PG_POSTER_WIDTH", "750"))
+# Largest accepted /api/generate-poster body (inline base64 images make these big)
+MAX_BODY_BYTES = int(os.getenv("PG_POSTER_MAX_BYTES", str(16 * 1024 * 1024)))
+RENDER_TIMEOUT_MS = 30000
+# How long a render waits on the image cache for a listing photo before loading it directly
+IMAGE_TIMEOUT = 10
+
+POSTER_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<style>
+  html, body {{ margin: 0; padding: 0; background: #f8fafc; }}
+  .poster {{
+    width: {width}px; box-sizing: border-box; padding: 48px 40px; background: #ffffff;
+    font-family: "PingFang SC", "Noto Sans CJK SC", "Microsoft YaHei", sans-serif;
+    color: #334155; font-size: 17px; line-height: 1.8;
+  }}
+  .poster-title {{ font-size: 30px; line-height: 1.4; font-weight: 700; color: #0f172a; margin: 0 0 24px; }}
+  .poster-body h1, .poster-body h2 {{ color: #0f172a; line-height: 1.4; }}
+  .poster-body img {{ max-width: 100%; height: auto; border-radius: 12px; }}
+  .poster-footer {{ margin-top: 32px; padding-top: 16px; border-top: 1px solid #e2e8f0; font-size: 13px; color: #94a3b8; }}
+</style>
+</head>
+<body>
+<div class="poster">
+  <h1 class="poster-title">{title}</h1>
+  <div class="poster-body">{html}</div>
+  <div class="poster-footer">PG to WeChat Note</div>
+</div>
+</body>
+</html>"""
+
+
+def poster_document(html: str, title: str) -> str:
+    """The full page a poster is rendered from: the article HTML in the poster template."""
+    return POSTER_TEMPLATE.format(width=POSTER_WIDTH, title=html_lib.escape(title or ""), html=html)
+
+
+def body_hasher():
+    """
+    sha256 to feed the raw request body into while it streams in: the poster cache key,
+    so a repeated poster is found without parsing the body at all.
+    """
+    return hashlib.sha256(f"poster-v{TEMPLATE_VERSION}:{POSTER_WIDTH}\n".encode("utf-8"))
+
+
+class PosterRenderer:
+    """
+    Article HTML -> PNG on warm pages from a BrowserPool, with an LRU of rendered PNGs
+    keyed by content hash. Concurrent requests for the same poster share one render.
+    With an ImageService, listing photos in the article load from its disk cache.
+    """
+
+    def __init__(self, pool: BrowserPool, cache_size: int = 32, images: ImageService = None):
+        self.pool = pool
+        self.cache = LRUCache(maxsize=cache_size)
+        self.images = images
+        self._inflight = {}
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "renders": 0, "cached_images": 0,
+                         "blocked_requests": 0}
+
+    def cached(self, key: str):
+        """The cached PNG for `key`, or None."""
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        self.counters["hits"] += 1
+        return entry[0]
+
+    async def _serve_image(self, route):
+        try:
+            image = await asyncio.wait_for(self.images.get(route.request.url), IMAGE_TIMEOUT)
+        except Exception:
+            await route.continue_()  # let the page load it from the origin
+            return
+        self.counters["cached_images"] += 1
+        await route.fulfill(path=image.path, content_type=image.content_type)
+
+    async def _route(self, route):
+        """
+        Every request the poster page makes. The article HTML comes from the client, so
+        only inline images and listing photos load; anything else (other hosts, this app,
+        cloud metadata addresses) is aborted.
+        """
+        url = route.request.url
+        if self.images is not None and self.images.allowed(url):
+            await self._serve_image(route)
+        elif url.startswith(("data:", "blob:")):
+            await route.continue_()
+        else:
+            self.counters["blocked_requests"] += 1
+            await route.abort()
+
+    async def _render(self, key: str, html: str, title: str) -> bytes:
+        try:
+            async with self.pool.page() as page:
+                await page.route("**/*", self._route)
+                try:
+                    await page.set_content(poster_document(html, title), wait_until="load", timeout=RENDER_TIMEOUT_MS)
+                    png = await page.locator(".poster").screenshot(type="png", timeout=RENDER_TIMEOUT_MS)
+                finally:
+                    # Pages go back to the pool
+                    await page.unroute("**/*", self._route)
+            self.counters["renders"] += 1
+            self.cache.set(key, png)
+            return png
+        finally:
+            self._inflight.pop(key, None)
+
+    async def render(self, key: str, html: str, title: str) -> bytes:
+        """Render (or join the in-flight render of) the poster for `key`."""
+        task = self._inflight.get(key)
+        if task is None:
+            self.counters["misses"] += 1
+            task = asyncio.create_task(self._render(key, html, title))
+            self._inflight[key] = task
+        else:
+            self.counters["coalesced"] += 1
+        # shield: one client disconnecting must not cancel a render others wait on
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return dict(self.counters, entries=len(self.cache), inflight=len(self._inflight), pool=self.pool.stats())
+
+
+# Rendering only: no profile, no stealth; 2x scale for sharp text on phones.
+# Posters are static HTML from the client: no JavaScript
+poster_pool = BrowserPool(
+    size=int(os.getenv("PG_POSTER_POOL_SIZE", "2")),
+    max_uses=int(os.getenv("PG_POSTER_MAX_USES", "200")),
+    user_data_dir=None,
+    stealth=False,
+    launch_options={
+        "headless": True,
+        "args": ['--no-sandbox'],
+        "viewport": {"width": POSTER_WIDTH, "height": 1000},
+        "device_scale_factor": 2,
+        "java_script_enabled": False,
+    },
+)
+
+_shared_renderer = None
+
+
+def get_poster_renderer() -> PosterRenderer:
+    """Process-wide renderer, shared across requests."""
+    global _shared_renderer
+    if _shared_renderer is None:
+        _shared_renderer = PosterRenderer(
+            poster_pool,
+            cache_size=int(os.getenv("PG_POSTER_CACHE_SIZE", "32")),
+            images=get_image_service(),
+        )
+    return _shared_renderer
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import time
+from urllib.parse import urlsplit
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+class TokenBucket:
+    """Token bucket: `rate` requests per second on average, bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: float, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> float:
+        """Take a token if one is available; otherwise return the seconds until one is."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class HostRateLimiter:
+    """
+    One shared TokenBucket per host. The rate adapts: each block halves the host's
+    rate (down to `min_rate`) and each success wins back a tenth of the configured one.
+    """
+
+    def __init__(self, rate: float, burst: float, clock=time.monotonic, sleep=asyncio.sleep, min_rate: float = None):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = rate / 16 if min_rate is None else min_rate
+        self.clock = clock
+        self.sleep = sleep
+        self._buckets = {}
+        self.waits = 0
+
+    def bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst, clock=self.clock)
+            self._buckets[host] = bucket
+        return bucket
+
+    async def acquire(self, url: str):
+        """Wait until the URL's host has a token to spend."""
+        bucket = self.bucket(host_of(url))
+        while True:
+            wait = bucket.try_acquire()
+            if not wait:
+                return
+            self.waits += 1
+            await self.sleep(wait)
+
+    def slow_down(self, url: str):
+        bucket = self.bucket(host_of(url))
+        bucket._refill()  # tokens earned at the old rate stay earned
+        bucket.rate = max(self.min_rate, bucket.rate / 2)
+
+    def speed_up(self, url: str):
+        bucket = self.bucket(host_of(url))
+        bucket._refill()
+        bucket.rate = min(self.rate, bucket.rate + self.rate / 10)
+
+    def snapshot(self) -> dict:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "waits": self.waits,
+            "hosts": {host: {"tokens": round(b.tokens, 2), "rate": round(b.rate, 3)} for host, b in self._buckets.items()},
+        }
+
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    """
+    Per (host, strategy) circuit breaker fed with block detections.
+
+    `threshold` blocks in a row open the circuit: the strategy is skipped for that host
+    for `cooldown` seconds, doubling each time it trips again (up to `max_cooldown`).
+    After the cool-down one probe request is let through (half-open); a success closes
+    the circuit, another block opens it again.
+    """
+
+    def __init__(self, threshold: int = 3, cooldown: float = 60, max_cooldown: float = 900, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        self._circuits = {}  # (host, strategy) -> state dict
+        self.counters = {"trips": 0, "skipped": 0, "probes": 0}
+
+    def _circuit(self, host: str, strategy: str) -> dict:
+        circuit = self._circuits.get((host, strategy))
+        if circuit is None:
+            circuit = {"state": CLOSED, "blocks": 0, "trips": 0, "opened_at": None, "cooldown": self.cooldown,
+                       "probe_started": None}
+            self._circuits[(host, strategy)] = circuit
+        return circuit
+
+    def allow(self, url: str, strategy: str) -> bool:
+        """Whether `strategy` may be tried for this URL now; may take the half-open probe slot."""
+        circuit = self._circuits.get((host_of(url), strategy))
+        if circuit is None or circuit["state"] == CLOSED:
+            return True
+        now = self.clock()
+        if circuit["state"] == OPEN and now - circuit["opened_at"] >= circuit["cooldown"]:
+            circuit["state"] = HALF_OPEN
+        # One probe at a time; a probe that never reported back frees its slot after a cool-down
+        if circuit["state"] == HALF_OPEN and (circuit["probe_started"] is None
+                                               or now - circuit["probe_started"] >= circuit["cooldown"]):
+            circuit["probe_started"] = now
+            self.counters["probes"] += 1
+            return True
+        self.counters["skipped"] += 1
+        return False
+
+    def record_success(self, url: str, strategy: str):
+        circuit = self._circuits.get((host_of(url), strategy))
+        if circuit is not None:
+            circuit.update(state=CLOSED, blocks=0, opened_at=None, cooldown=self.cooldown, probe_started=None)
+
+    def record_block(self, url: str, strategy: str):
+        circuit = self._circuit(host_of(url), strategy)
+        circuit["blocks"] += 1
+        if circuit["state"] == HALF_OPEN:
+            # The probe was blocked too: back off for longer
+            circuit["cooldown"] = min(self.max_cooldown, circuit["cooldown"] * 2)
+        elif circuit["state"] == OPEN or circuit["blocks"] < self.threshold:
+            return
+        circuit.update(state=OPEN, opened_at=self.clock(), probe_started=None)
+        circuit["trips"] += 1
+        self.counters["trips"] += 1
+        print(f"Circuit open for {strategy} on {host_of(url)}: {circuit['blocks']} blocks, "
+              f"skipping it for {circuit['cooldown']:.0f}s")
+
+    def release(self, url: str, strategy: str):
+        """An attempt ended without a verdict (e.g. cancelled): free the probe slot."""
+        circuit = self._circuits.get((host_of(url), strategy))
+        if circuit is not None:
+            circuit["probe_started"] = None
+
+    def retry_in(self, url: str, strategy: str) -> float:
+        """Seconds until the strategy may be tried again for this URL (0 if it may now)."""
+        circuit = self._circuits.get((host_of(url), strategy))
+        if circuit is None or circuit["state"] != OPEN:
+            return 0.0
+        return max(0.0, circuit["opened_at"] + circuit["cooldown"] - self.clock())
+
+    def snapshot(self) -> dict:
+        hosts = {}
+        for (host, strategy), circuit in self._circuits.items():
+            hosts.setdefault(host, {})[strategy] = {
+                "state": circuit["state"],
+                "consecutive_blocks": circuit["blocks"],
+                "trips": circuit["trips"],
+                "retry_in": round(self.retry_in(f"//{host}", strategy), 1),
+            }
+        return dict(self.counters, threshold=self.threshold, cooldown=self.cooldown, hosts=hosts)
+
+
+# Requests per second to a host: every strategy attempt takes a token, and the burst
+# lets one scrape run its whole hedged/fallback chain (up to 4 strategies) at once
+host_limiter = HostRateLimiter(
+    rate=float(os.getenv("PG_HOST_RATE", "2")),
+    burst=float(os.getenv("PG_HOST_BURST", "4")),
+)
+
+strategy_breaker = CircuitBreaker(
+    threshold=int(os.getenv("PG_BREAKER_THRESHOLD", "3")),
+    cooldown=float(os.getenv("PG_BREAKER_COOLDOWN", "60")),
+    max_cooldown=float(os.getenv("PG_BREAKER_MAX_COOLDOWN", "900")),
+)
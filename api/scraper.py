@@ -1,22 +1,232 @@
-import cloudscraper
-import requests
-from bs4 import BeautifulSoup
-import re
-import json
 import asyncio
+import functools
+import importlib.util
 import os
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from browser_pool import browser_pool
+from listing_cache import listing_cache_from_env
+from listing_parser import blocked_listing, emit_core, json_ld_core, parse_html, parse_soup
+from metrics import metrics
+from parse_pool import parse_pool_from_env
+from rate_limit import host_limiter, strategy_breaker
+from session_pool import session_pool
+
+# The HTTP clients and Playwright are imported on first use, keeping cold starts fast.
+# cloudscraper and curl_cffi are blocking clients, so their requests run on a
+# bounded thread pool instead of the event loop.
+FETCH_WORKERS = int(os.getenv("PG_FETCH_WORKERS", "16"))
+_fetch_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="pg-fetch")
+
+# Max in-flight requests per strategy (on top of the shared pool size)
+STRATEGY_CONCURRENCY = {
+    "cloudscraper": int(os.getenv("PG_CLOUDSCRAPER_CONCURRENCY", "8")),
+    "curl_cffi": int(os.getenv("PG_CURL_CFFI_CONCURRENCY", "8")),
+    "images": int(os.getenv("PG_IMAGE_FETCH_CONCURRENCY", "8")),
+}
+# Semaphores are tied to the loop they first block on, so keep one set per loop
+_strategy_semaphores = weakref.WeakKeyDictionary()
+
+
+def _strategy_semaphore(strategy: str) -> asyncio.Semaphore:
+    per_loop = _strategy_semaphores.setdefault(asyncio.get_running_loop(), {})
+    sem = per_loop.get(strategy)
+    if sem is None:
+        sem = asyncio.Semaphore(STRATEGY_CONCURRENCY.get(strategy, 4))
+        per_loop[strategy] = sem
+    return sem
+
+
+async def run_blocking(strategy: str, fn, *args, **kwargs):
+    """
+    Run a blocking fetch in the fetch pool, limited per strategy. Cancelling the caller
+    (e.g. a hedged strategy that lost) can't stop the thread, so its slot stays taken
+    until the request in the thread really finishes.
+    """
+    semaphore = _strategy_semaphore(strategy)
+    await semaphore.acquire()
+    loop = asyncio.get_running_loop()
+    try:
+        future = _fetch_executor.submit(functools.partial(fn, *args, **kwargs))
+    except BaseException:
+        semaphore.release()
+        raise
+
+    def release(_):
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            pass  # the loop is gone, and its semaphores with it
+
+    future.add_done_callback(release)
+    return await asyncio.wrap_future(future, loop=loop)
+
+
+def _cloudscraper_session(profile):
+    import cloudscraper
+    # Reference: browser={'browser': 'chrome', 'platform': 'windows', 'mobile': False}
+    return cloudscraper.create_scraper(
+        browser={
+            'browser': 'chrome',
+            'platform': profile,
+            'mobile': False
+        },
+        delay=2
+    )
+
+
+def _curl_cffi_session(profile):
+    from curl_cffi import requests as cffi_requests
+    return cffi_requests.Session(impersonate=profile)
+
+
+session_pool.register("cloudscraper", _cloudscraper_session)
+session_pool.register("curl_cffi", _curl_cffi_session)
+
+
+@functools.lru_cache(maxsize=None)
+def module_available(name: str) -> bool:
+    """Whether a module can be imported, without importing it."""
+    return importlib.util.find_spec(name) is not None
+
+
+def playwright_available() -> bool:
+    return module_available("playwright") and module_available("playwright_stealth")
+
+
+def pooled_get(strategy: str, profile: str, url: str, **kwargs):
+    """GET with a warm session from the process-wide pool (blocking)."""
+    with session_pool.session(strategy, profile) as session:
+        return session.get(url, **kwargs)
+
+
+# Responses that mean the site is refusing us, rather than a broken page
+BLOCK_STATUSES = (403, 429, 503)
+
+# Strategies that can send conditional requests, and the profile each uses by default
+CONDITIONAL_PROFILES = {"cloudscraper": "windows", "curl_cffi": "chrome120"}
+
+# Fallback chain, in the order tried when there is no success history yet
+DEFAULT_STRATEGY_ORDER = [
+    "cloudscraper",
+    "curl_cffi:safari_ios_16_5",
+    "curl_cffi:chrome120",
+    "playwright",
+]
+
+
+class StrategyStats:
+    """Process-wide success/latency record per scraping strategy."""
 
-class PropertyGuruScraper:
     def __init__(self):
-        self.cloud_scraper = cloudscraper.create_scraper(
-            browser={
-                'browser': 'chrome',
-                'browser': 'chrome',
-                'platform': 'darwin',
-                'desktop': True
-            },
-            delay=2
-        )
+        self.attempts = {}
+        self.successes = {}
+        self.total_time = {}
+
+    def record(self, name: str, ok: bool, elapsed: float):
+        self.attempts[name] = self.attempts.get(name, 0) + 1
+        self.successes[name] = self.successes.get(name, 0) + int(ok)
+        self.total_time[name] = self.total_time.get(name, 0.0) + elapsed
+
+    def success_rate(self, name: str) -> float:
+        # Laplace smoothing so untried strategies start at 0.5
+        return (self.successes.get(name, 0) + 1) / (self.attempts.get(name, 0) + 2)
+
+    def order(self, names):
+        # sorted() is stable, so ties keep the configured order
+        return sorted(names, key=lambda n: -self.success_rate(n))
+
+    def snapshot(self) -> dict:
+        return {
+            name: {
+                "attempts": self.attempts[name],
+                "successes": self.successes.get(name, 0),
+                "success_rate": round(self.success_rate(name), 3),
+                "avg_seconds": round(self.total_time[name] / self.attempts[name], 3),
+            }
+            for name in self.attempts
+        }
+
+
+strategy_stats = StrategyStats()
+
+
+def _env_budget():
+    value = os.getenv("PG_SCRAPE_HEDGE_BUDGET", "8")
+    return None if value.lower() in ("", "0", "off", "none") else float(value)
+
+
+def _once(callback):
+    called = []
+
+    def wrapper(*args):
+        if not called:
+            called.append(True)
+            callback(*args)
+    return wrapper
+
+
+def _parse(html, on_core=None) -> dict:
+    if not isinstance(html, str):
+        html = html.text  # a response: decoding (and charset sniffing) the body is part of the work
+    with metrics.span("parse") as span:
+        data = parse_html(html, on_core)
+        span["bytes"] = len(html)
+        if _is_blocked(data):
+            span["outcome"] = "blocked"
+        return data
+
+
+def _is_blocked(data) -> bool:
+    return bool(data) and data["title"].startswith("[BLOCKED]")
+
+
+def _is_usable(data) -> bool:
+    return bool(data) and data["title"] != "No Title" and not data["title"].startswith("[BLOCKED]")
+
+
+def _exhausted_listing(description: str) -> dict:
+    return {"title": "Error: Scraper strategies exhausted", "price": "", "address": "", "description": description, "images": []}
+
+
+def scrape_status(data) -> str:
+    """'ok', 'blocked' (bot protection) or 'failed' for a scrape() result."""
+    title = data.get("title", "")
+    if title.startswith("[BLOCKED]") or title == "Error: Scraper blocked":
+        return "blocked"
+    if title == "No Title" or title.startswith("Error:"):
+        return "failed"
+    return "ok"
+
+
+BATCH_CONCURRENCY = int(os.getenv("PG_BATCH_CONCURRENCY", "4"))
+
+# Shared by every scraper instance; blocked/failed scrapes are never cached
+listing_cache = listing_cache_from_env(cacheable=lambda data: _is_usable(data) and not data["title"].startswith("Error:"))
+# Worker processes for parsing, off unless PG_PARSE_WORKERS is set; started with the app.
+# A page is parsed in the fetch pool instead while a broken pool is replaced
+shared_parse_pool = parse_pool_from_env(fallback_executor=_fetch_executor)
+
+
+class PropertyGuruScraper:
+    def __init__(self, hedge_budget="env", strategy_order=None, adaptive_order=None, cache="env",
+                 rate_limiter="env", breaker="env", parse_pool="env"):
+        """
+        hedge_budget: seconds a strategy may run before the next one is started
+            alongside it; None runs strategies strictly one after another.
+        strategy_order: strategy names to try (see DEFAULT_STRATEGY_ORDER).
+        adaptive_order: reorder strategies by their success rate so far.
+        cache: ListingCache in front of scrape(); None disables caching.
+        rate_limiter: HostRateLimiter paying for every request sent to the host: each
+            strategy attempt of a live scrape or re-check takes a token, so a hedged or
+            fallback scrape spends up to one per strategy. None disables it.
+            Blocks slow the host down, successes speed it back up.
+        breaker: CircuitBreaker that takes a strategy out of rotation for a host while
+            it keeps getting blocked; None disables it.
+        parse_pool: ParsePool that parses pages in worker processes; None parses in-process.
+        """
         self.headers = {
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.9',
@@ -24,23 +234,253 @@ class PropertyGuruScraper:
             'DNT': '1',
             'Upgrade-Insecure-Requests': '1',
         }
+        self.hedge_budget = _env_budget() if hedge_budget == "env" else hedge_budget
+        if strategy_order is None:
+            env_order = os.getenv("PG_SCRAPE_ORDER")
+            strategy_order = [n.strip() for n in env_order.split(",") if n.strip()] if env_order else DEFAULT_STRATEGY_ORDER
+        self.strategy_order = list(strategy_order)
+        if adaptive_order is None:
+            adaptive_order = os.getenv("PG_SCRAPE_ADAPTIVE_ORDER", "1") != "0"
+        self.adaptive_order = adaptive_order
+        self.stats = strategy_stats
+        self.cache = listing_cache if cache == "env" else cache
+        self.rate_limiter = host_limiter if rate_limiter == "env" else rate_limiter
+        self.breaker = strategy_breaker if breaker == "env" else breaker
+        self.parse_pool = shared_parse_pool if parse_pool == "env" else parse_pool
+
+    async def scrape(self, url: str, on_core=None):
+        """
+        Scrape a listing, served from the listing cache when possible.
 
-    async def scrape(self, url: str):
+        on_core, if given, is called (at most once, on the event loop) with the core
+        fields as soon as a live scrape knows them, before images are collected.
+        They are provisional: the returned data is what counts.
+        """
+        fetch = self._scrape_live if on_core is None else functools.partial(self._scrape_live, on_core=on_core)
+        if self.cache is None:
+            return await fetch(url)
+        return await self.cache.get_or_fetch(url, fetch)
+
+    async def scrape_many(self, urls, concurrency: int = None):
+        """
+        Scrape several listings with at most `concurrency` in flight, yielding one
+        result per URL as soon as it finishes (completion order, not input order):
+        {"index", "url", "status": ok|blocked|failed|error, "data" or "error", "seconds"}.
+        """
+        semaphore = asyncio.Semaphore(concurrency or BATCH_CONCURRENCY)
+
+        async def one(index, url):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    data = await self.scrape(url)
+                    result = {"index": index, "url": url, "status": scrape_status(data), "data": data}
+                except Exception as e:
+                    print(f"Batch scrape error for {url}: {e}")
+                    result = {"index": index, "url": url, "status": "error", "error": str(e)}
+                result["seconds"] = round(time.perf_counter() - start, 3)
+                return result
+
+        tasks = [asyncio.create_task(one(i, url)) for i, url in enumerate(urls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Consumer stopped early (e.g. client disconnected)
+            for task in tasks:
+                task.cancel()
+
+    async def _scrape_live(self, url: str, on_core=None):
+        """
+        Race the strategies: the next one starts when the current one fails or runs
+        past hedge_budget, the first unblocked result wins and the rest are cancelled.
+        Strategies whose circuit is open for this host are skipped.
+        The winner and timings are reported under data["scrape_meta"].
+        """
+        if on_core is not None:
+            on_core = _once(on_core)  # racing strategies: the first to get there reports
+        names = self.stats.order(self.strategy_order) if self.adaptive_order else list(self.strategy_order)
+        start = time.perf_counter()
+        queue = list(names)
+        attempted = []
+        skipped = []
+        running = {}  # task -> (name, started_at)
+        fallback = None
+
+        def launch():
+            # Asked lazily: an allowed half-open strategy gets its one probe request
+            while queue:
+                name = queue.pop(0)
+                if self.breaker is None or self.breaker.allow(url, name):
+                    task = asyncio.create_task(self._paced_attempt(name, url, on_core))
+                    running[task] = (name, time.perf_counter())
+                    attempted.append(name)
+                    return True
+                skipped.append(name)
+            return False
+
+        if not launch():
+            if not skipped:
+                print(f"No scrape strategies configured for {url}")
+                metrics.timing("scrape", time.perf_counter() - start, "failed")
+                return _exhausted_listing("No scrape strategies configured.")
+            retry_in = min(self.breaker.retry_in(url, name) for name in skipped)
+            print(f"Every strategy is blocked for {url}, next retry in {retry_in:.0f}s")
+            metrics.timing("scrape", time.perf_counter() - start, "circuit_open")
+            data = {"title": "Error: Scraper blocked", "price": "", "address": "", "description": "", "images": []}
+            data["scrape_meta"] = {"circuit_open": True, "retry_in": round(retry_in, 1), "skipped": skipped}
+            return data
+        last_launch = time.perf_counter()
+        try:
+            while running:
+                timeout = None
+                if queue and self.hedge_budget is not None:
+                    timeout = max(0.0, last_launch + self.hedge_budget - time.perf_counter())
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    print(f"Strategy over {self.hedge_budget}s budget, hedging with {queue[0]}")
+                    if launch():
+                        last_launch = time.perf_counter()
+                    continue
+
+                for task in done:
+                    name, started_at = running.pop(task)
+                    data = task.result()
+                    elapsed = time.perf_counter() - started_at
+                    ok = _is_usable(data)
+                    self.stats.record(name, ok, elapsed)
+                    self._record_outcome(url, name, data, elapsed)
+                    if ok:
+                        metrics.timing("scrape", time.perf_counter() - start, strategy=name)
+                        data["scrape_meta"] = {
+                            "strategy": name,
+                            "strategy_seconds": round(elapsed, 3),
+                            "total_seconds": round(time.perf_counter() - start, 3),
+                            "attempted": attempted,
+                            "skipped": skipped,
+                        }
+                        return data
+                    if data and name == "playwright":
+                        fallback = data
+                    # A failed attempt hands its slot to the next strategy right away
+                    if queue and launch():
+                        last_launch = time.perf_counter()
+        finally:
+            for task, (name, _) in running.items():
+                task.cancel()
+                if self.breaker is not None:
+                    self.breaker.release(url, name)
+
+        metrics.timing("scrape", time.perf_counter() - start, "blocked" if fallback else "failed")
+        if fallback:
+            return fallback
+        if "playwright" in names and not playwright_available():
+            return _exhausted_listing("Could not scrape listing (Playwright missing).")
+        return {"title": "Error: Scraper blocked", "price": "", "address": "", "description": "", "images": []}
+
+    async def recheck(self, url: str, etag: str = None, last_modified: str = None) -> dict:
+        """
+        Fetch a listing seen before, bypassing the listing cache. The HTTP strategies
+        send the stored validators, so an unchanged page can come back as an empty 304:
+        {"not_modified", "data" (None on a 304), "etag", "last_modified", "bytes", "strategy"}.
+        Strategies are tried one after another; when none of them gets a usable page
+        this falls back to a full scrape, whose download size is not known ("bytes": None).
+        """
+        headers = dict(self.headers)
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        names = self.stats.order(self.strategy_order) if self.adaptive_order else list(self.strategy_order)
+        downloaded = 0
+        for name in names:
+            strategy, _, profile = name.partition(":")
+            if strategy not in CONDITIONAL_PROFILES or not module_available(strategy):
+                continue
+            if self.breaker is not None and not self.breaker.allow(url, name):
+                continue
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(url)
+            start = time.perf_counter()
+            try:
+                response = await run_blocking(strategy, pooled_get, strategy, profile or CONDITIONAL_PROFILES[strategy],
+                                              url, headers=headers, timeout=20)
+            except Exception as e:
+                print(f"Re-check with {name} failed: {e}")
+                self._record_outcome(url, name, None, time.perf_counter() - start)
+                continue
+            downloaded += len(response.content)
+            result = {
+                "not_modified": response.status_code == 304,
+                "data": None,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "bytes": downloaded,
+                "strategy": name,
+            }
+            if response.status_code == 304:
+                elapsed = time.perf_counter() - start
+                self.stats.record(name, True, elapsed)
+                self._record_outcome(url, name, None, elapsed, outcome="ok")
+                return result
+            if response.status_code == 200:
+                data = await self._parse_response(response)
+            elif response.status_code in BLOCK_STATUSES:
+                data = blocked_listing(f"HTTP {response.status_code}")
+            else:
+                data = None
+            elapsed = time.perf_counter() - start
+            self.stats.record(name, _is_usable(data), elapsed)
+            self._record_outcome(url, name, data, elapsed)
+            if _is_usable(data):
+                result["data"] = data
+                return result
+            print(f"Re-check with {name} got no usable page (status {response.status_code})")
+
+        data = await self._scrape_live(url)
+        return {"not_modified": False, "data": data, "etag": None, "last_modified": None, "bytes": None,
+                "strategy": (data.get("scrape_meta") or {}).get("strategy")}
+
+    def _record_outcome(self, url: str, name: str, data, elapsed: float, outcome: str = None):
+        """Feed an attempt's result to the metrics, the circuit breaker and the adaptive rate limiter."""
+        outcome = outcome or ("ok" if _is_usable(data) else "blocked" if _is_blocked(data) else "failed")
+        metrics.timing("scrape_attempt", elapsed, outcome, strategy=name)
+        if outcome == "ok":
+            if self.breaker is not None:
+                self.breaker.record_success(url, name)
+            if self.rate_limiter is not None:
+                self.rate_limiter.speed_up(url)
+        elif outcome == "blocked":
+            if self.breaker is not None:
+                self.breaker.record_block(url, name)
+            if self.rate_limiter is not None:
+                self.rate_limiter.slow_down(url)
+        elif self.breaker is not None:
+            self.breaker.release(url, name)  # a network error says nothing about blocking
+
+    async def _paced_attempt(self, name: str, url: str, on_core=None):
+        """_attempt, once the host's rate limiter has a token for its request."""
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(url)
+        return await self._attempt(name, url, on_core)
+
+    async def _attempt(self, name: str, url: str, on_core=None):
+        """Run one strategy; returns parsed data (possibly blocked) or None on failure."""
+        strategy, _, profile = name.partition(":")
+        if strategy == "cloudscraper":
+            return await self._try_cloudscraper(url, on_core)
+        if strategy == "curl_cffi":
+            return await self._try_curl_cffi(url, profile or "chrome120", on_core)
+        if strategy == "playwright":
+            return await self._try_playwright(url, on_core)
+        print(f"Unknown scrape strategy: {name}")
+        return None
+
+    async def _try_cloudscraper(self, url: str, on_core=None):
         # Strategy 0: Cloudscraper (Reference Agent Style - Primary)
         # The user's reference code uses cloudscraper with Windows/Chrome
         print(f"Attempting to scrape with Cloudscraper (Reference Config): {url}")
         try:
-            # Re-create scraper with exact reference params
-            # Reference: browser={'browser': 'chrome', 'platform': 'windows', 'mobile': False}
-            cs = cloudscraper.create_scraper(
-                browser={
-                    'browser': 'chrome',
-                    'platform': 'windows',
-                    'mobile': False
-                },
-                delay=2
-            )
-            
             # Reference Headers
             ref_headers = {
                 'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -51,215 +491,140 @@ class PropertyGuruScraper:
                 'DNT': '1',
             }
             
-            response = cs.get(url, headers=ref_headers, timeout=15)
+            response = await run_blocking(
+                "cloudscraper", pooled_get, "cloudscraper", "windows", url, headers=ref_headers, timeout=15
+            )
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                data = self._parse_soup(soup)
+                data = await self._parse_response(response, on_core)
                 
                 # Verify it's not blocked
-                if data["title"] != "No Title" and not data["title"].startswith("[BLOCKED]"):
+                if _is_usable(data):
                     print("Cloudscraper success!")
-                    return data
                 else:
                     print(f"Cloudscraper blocked. Title: {data['title']}")
+                return data
             else:
                  print(f"Cloudscraper failed (Status {response.status_code}).")
+                 if response.status_code in BLOCK_STATUSES:
+                     return blocked_listing(f"HTTP {response.status_code}")
                  
         except Exception as e:
             print(f"Cloudscraper error: {e}")
+        return None
 
+    async def _try_curl_cffi(self, url: str, imp: str, on_core=None):
         # Strategy 1: Curl CFFI (Fallback)
-        # ... (Previous Curl Logic as fallback) ...
-        impersonations = [
-            "safari_ios_16_5", 
-            "chrome120",
-        ]
-        
-        try:
-             from curl_cffi import requests as cffi_requests
-             
-             for imp in impersonations:
-                print(f"Attempting fallback with Curl Impersonate: {imp}")
-                try:
-                    await asyncio.sleep(1)
-                    response = cffi_requests.get(
-                        url, 
-                        impersonate=imp, 
-                        headers=self.headers, 
-                        timeout=20
-                    )
-                    if response.status_code == 200:
-                        soup = BeautifulSoup(response.text, 'html.parser')
-                        data = self._parse_soup(soup)
-                        if data["title"] != "No Title" and not data["title"].startswith("[BLOCKED]"):
-                            print(f"Curl CFFI success with {imp}!")
-                            return data
-                        else:
-                            print(f"Curl CFFI {imp} was blocked.")
-                    else:
-                        print(f"Curl CFFI {imp} failed status {response.status_code}")
-                    
-                    # Small delay before retry
-                    await asyncio.sleep(2)
-                except Exception as e:
-                    print(f"Curl CFFI error with {imp}: {e}")
-        except ImportError:
+        if not module_available("curl_cffi"):
              print("Curl CFFI not available, skipping Strategy 1.")
+             return None
+
+        print(f"Attempting fallback with Curl Impersonate: {imp}")
+        try:
+            response = await run_blocking(
+                "curl_cffi",
+                pooled_get,
+                "curl_cffi",
+                imp,
+                url, 
+                headers=self.headers, 
+                timeout=20
+            )
+            if response.status_code == 200:
+                data = await self._parse_response(response, on_core)
+                if _is_usable(data):
+                    print(f"Curl CFFI success with {imp}!")
+                else:
+                    print(f"Curl CFFI {imp} was blocked.")
+                return data
+            else:
+                print(f"Curl CFFI {imp} failed status {response.status_code}")
+                if response.status_code in BLOCK_STATUSES:
+                    return blocked_listing(f"HTTP {response.status_code}")
+        except Exception as e:
+            print(f"Curl CFFI error with {imp}: {e}")
+        return None
 
+    async def _try_playwright(self, url: str, on_core=None):
         # Strategy 2: Playwright (Headed + Stealth fallback)
+        if not playwright_available():
+             print("Playwright not installed, skipping Strategy 2.")
+             return None
+
         print("Falling back to Playwright...")
         try:
-            from playwright.async_api import async_playwright
-            from playwright_stealth import Stealth
-        
-            async with async_playwright() as p:
-                import tempfile
-                user_data_dir = os.path.join(tempfile.gettempdir(), "pg_scraper_user_data_v2")
-                
-                context = await p.chromium.launch_persistent_context(
-                    user_data_dir,
-                    headless=True, # Try headless first with stealth
-                    args=['--disable-blink-features=AutomationControlled', '--no-sandbox'],
-                    user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36",
-                )
-                
-                page = await context.new_page()
-                await Stealth().apply_stealth_async(page)
+            # Warm page from the shared browser pool (no Chromium startup per scrape)
+            async with browser_pool.page() as page:
+                await page.goto(url, wait_until="domcontentloaded", timeout=60000)
                 
+                # Wait for the challenge to pass (look for the title element)
+                # Cloudflare challenge usually takes 5-10s
                 try:
-                    await page.goto(url, wait_until="domcontentloaded", timeout=60000)
-                    
-                    # Wait for the challenge to pass (look for the title element)
-                    # Cloudflare challenge usually takes 5-10s
-                    try:
-                        await page.wait_for_selector('h1', timeout=30000)
-                    except:
-                        print("Timeout waiting for h1, might still be challenged.")
-
-                    # Scroll to trigger lazy loading
-                    await page.evaluate("window.scrollBy(0, 800)")
-                    await asyncio.sleep(2)
-                    
-                    # Explicit wait for images (Reference Agent Logic)
-                    try:
-                        await page.wait_for_selector('img', timeout=10000)
-                    except:
-                        print("Timeout waiting for images")
-                    
-                    content = await page.content()
-                    soup = BeautifulSoup(content, 'html.parser')
-                    data = self._parse_soup(soup)
-                    return data
-                except Exception as e:
-                    print(f"Playwright fallback error: {e}")
-                    return {"title": "Error: Scraper blocked", "price": "", "address": "", "description": "", "images": []}
-                finally:
-                    await context.close()
-        except ImportError:
-             print("Playwright not installed, skipping Strategy 2.")
-             return {"title": "Error: Scraper strategies exhausted", "price": "", "description": "Could not scrape listing (Playwright missing).", "images": []}
+                    await page.wait_for_selector('h1', timeout=30000)
+                except:
+                    print("Timeout waiting for h1, might still be challenged.")
 
-    def _parse_soup(self, soup):
-        data = {
-            "title": "No Title",
-            "price": "Price on ask",
-            "address": "",
-            "description": "",
-            "images": []
-        }
+                if on_core is not None:
+                    # The text fields are usually there by now; images still need scrolling.
+                    # Only the JSON-LD is read: the one full parse is of the final page
+                    core = json_ld_core(await page.content())
+                    if core is not None:
+                        emit_core(on_core, core)
 
-        # Check for block (Strict)
-        page_text = soup.get_text()
-        block_keywords = [
-            "Just a moment", 
-            "Access Denied", 
-            "Bot Protection Detected",
-            "Checking your browser",
-            "Attention Required",
-            "Cloudflare"
-        ]
-        
-        # Check title first
-        title_tag = soup.find("title")
-        if title_tag:
-            title_text = title_tag.get_text()
-            if any(k.lower() in title_text.lower() for k in block_keywords):
-                 data["title"] = "[BLOCKED] Bot Protection Detected"
-                 return data
-
-        # Check strict keywords in body only if title is missing or suspicious
-        if any(k in page_text for k in block_keywords) and len(page_text) < 2000:
-             # Assume it's a block page if it's short and contains keywords
-             data["title"] = "[BLOCKED] Bot Protection Detected"
-             return data
-
-        # 1. Try JSON-LD or NEXT_DATA first (Internal Logic)
-        # (Keeping the robust logic from previous step)
-        ld_scripts = soup.find_all('script', type='application/ld+json')
-        for script in ld_scripts:
-            try:
-                ld_data = json.loads(script.string)
-                items = ld_data if isinstance(ld_data, list) else [ld_data]
-                for item in items:
-                    if item.get("@type") in ["RealEstateListing", "Product", "Accommodation"]:
-                        data["title"] = item.get("name") or data["title"]
-                        data["description"] = item.get("description") or data["description"]
-                        if "offers" in item and isinstance(item["offers"], dict):
-                            data["price"] = f"{item['offers'].get('priceCurrency', 'SGD')} {item['offers'].get('price', '')}"
-                        if "spatialCoverage" in item and isinstance(item["spatialCoverage"], dict):
-                            data["address"] = item["spatialCoverage"].get("address", {}).get("streetAddress", data["address"])
-                        
-                        # Extract images from JSON-LD
-                        if "image" in item:
-                            imgs = item["image"]
-                            if isinstance(imgs, str):
-                                data["images"].append(imgs)
-                            elif isinstance(imgs, list):
-                                data["images"].extend(imgs)
-            except: continue
-
-        # 2. Fallback to CSS Selectors (Refined with reference agent logic)
-        if data["title"] == "No Title":
-            title_tag = soup.select_one('h1[da-id="property-title"], h1.title, h1')
-            if title_tag: data["title"] = title_tag.get_text(strip=True)
-            
-        if data["price"] == "Price on ask":
-            # Reference agent used data-automation-id='overview-price-txt' or class 'amount'
-            price_tag = soup.select_one('[data-automation-id="overview-price-txt"], .amount, h2[da-id="price-amount"]')
-            if price_tag: data["price"] = price_tag.get_text(strip=True)
-            
-        if not data["address"]:
-            # Reference agent used class 'full-address__address'
-            addr_tag = soup.select_one('.full-address__address, p[da-id="property-address"], .address')
-            if addr_tag: data["address"] = addr_tag.get_text(strip=True)
-            
-        if not data["description"]:
-            desc_tag = soup.select_one('.listing-description, .description, [da-id="description-widget"]')
-            if desc_tag: data["description"] = desc_tag.get_text(separator="\n", strip=True)
-
-        # 3. Image Extraction with V800 Transformation
-        # Reference agent suggested V800 suffix for high res
-        gallery_imgs = soup.select('img')
-        for img in gallery_imgs:
-            src = img.get('src') or img.get('data-src') or img.get('data-lazy')
-            if src and "pgimgs.com" in src:
-                # Exclude icons/avatars/UI elements
-                exclude_patterns = [
-                    'APHO', 'hui-svgicon', 'logo', 'avatar', 'icon', 
-                    'navbar-', 'map-shortcut', 'flags', 'static'
-                ]
-                if any(x in src.lower() for x in exclude_patterns):
-                    continue
+                # Scroll to trigger lazy loading
+                await page.evaluate("window.scrollBy(0, 800)")
+                await asyncio.sleep(2)
                 
-                # Transform to high res if possible (V800)
-                # Matches patterns like .V550, .R550X550 etc.
-                high_res_src = re.sub(r'\.(V\d+|R\d+X\d+)(\.jpg|\.png)', r'.V800\2', src)
-                if high_res_src not in data["images"]:
-                    data["images"].append(high_res_src)
-        
-        data["images"] = list(dict.fromkeys(data["images"]))[:20]
+                # Explicit wait for images (Reference Agent Logic)
+                try:
+                    await page.wait_for_selector('img', timeout=10000)
+                except:
+                    print("Timeout waiting for images")
+                
+                content = await page.content()
+            if self.parse_pool is not None:
+                return await self.parse_pool.parse(content)  # str: no extra encoded copy
+            return await self._parse_with_core(content)
+        except Exception as e:
+            print(f"Playwright fallback error: {e}")
+        return None
+
+    async def _parse_with_core(self, html, on_core=None):
+        """
+        parse_html in the fetch pool, so a multi-MB page doesn't hold up the event loop,
+        reporting the core fields to on_core as soon as they are known: the event loop
+        can act on them (e.g. start the LLM call) while images are still being collected.
+        `html` is the page text, or an HTTP response to decode there as well.
+        """
+        loop = asyncio.get_running_loop()
+        notify = None if on_core is None else (lambda core: loop.call_soon_threadsafe(on_core, core))
+        return await loop.run_in_executor(_fetch_executor, _parse, html, notify)
+
+    async def _parse_response(self, response, on_core=None):
+        """
+        Parse an HTTP response. With a parse pool the raw body goes to a worker process
+        (not decoded here) and on_core hears the core fields once the whole parse is back.
+        """
+        if self.parse_pool is None:
+            return await self._parse_with_core(response, on_core)
+        data = await self.parse_pool.parse(response.content, response.encoding)
+        if on_core is not None and _is_usable(data):
+            emit_core(on_core, data)
         return data
 
+    def _parse_soup(self, soup):
+        return parse_soup(soup)
+
+_shared_scraper = None
+
+
+def get_scraper() -> PropertyGuruScraper:
+    """Process-wide scraper instance, shared across requests."""
+    global _shared_scraper
+    if _shared_scraper is None:
+        _shared_scraper = PropertyGuruScraper()
+    return _shared_scraper
+
+
 if __name__ == "__main__":
     # Quick test
     import json
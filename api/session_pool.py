@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class SessionPool:
+    """
+    Process-wide pool of warm HTTP sessions keyed by (strategy, profile).
+
+    A session is checked out exclusively for one request and returned afterwards,
+    so its cookies (e.g. Cloudflare clearance) and keep-alive connections carry
+    over to the next request with the same key.
+    Sessions are retired after `ttl` seconds in total or `idle_timeout` seconds unused.
+    """
+
+    def __init__(self, ttl: float = 900, idle_timeout: float = 120, max_idle_per_key: int = 4, clock=time.monotonic):
+        self.ttl = ttl
+        self.idle_timeout = idle_timeout
+        self.max_idle_per_key = max_idle_per_key
+        self.clock = clock
+        self._factories = {}
+        self._idle = {}  # (strategy, profile) -> [[session, created_at, last_used], ...]
+        self._lock = threading.Lock()
+        self.counters = {"created": 0, "reused": 0, "expired": 0, "evicted_idle": 0, "discarded": 0}
+
+    def register(self, strategy: str, factory):
+        """factory(profile) -> new session for that strategy."""
+        self._factories[strategy] = factory
+
+    def _close(self, session):
+        try:
+            session.close()
+        except Exception:
+            pass
+
+    def _evict(self, now):
+        # Caller holds the lock; returns sessions to close outside of it
+        stale = []
+        for key, entries in self._idle.items():
+            keep = []
+            for entry in entries:
+                session, created_at, last_used = entry
+                if now - created_at > self.ttl:
+                    self.counters["expired"] += 1
+                    stale.append(session)
+                elif now - last_used > self.idle_timeout:
+                    self.counters["evicted_idle"] += 1
+                    stale.append(session)
+                else:
+                    keep.append(entry)
+            self._idle[key] = keep
+        return stale
+
+    def acquire(self, strategy: str, profile: str = "default"):
+        key = (strategy, profile)
+        with self._lock:
+            stale = self._evict(self.clock())
+            entries = self._idle.get(key)
+            entry = entries.pop() if entries else None
+            if entry:
+                self.counters["reused"] += 1
+        for session in stale:
+            self._close(session)
+        if entry:
+            return entry
+
+        session = self._factories[strategy](profile)
+        with self._lock:
+            self.counters["created"] += 1
+        return [session, self.clock(), None]
+
+    def release(self, strategy: str, profile: str, entry, discard: bool = False):
+        key = (strategy, profile)
+        now = self.clock()
+        with self._lock:
+            entries = self._idle.setdefault(key, [])
+            if discard:
+                self.counters["discarded"] += 1
+            elif now - entry[1] > self.ttl:
+                self.counters["expired"] += 1
+            elif len(entries) < self.max_idle_per_key:
+                entry[2] = now
+                entries.append(entry)
+                return
+        self._close(entry[0])
+
+    @contextmanager
+    def session(self, strategy: str, profile: str = "default"):
+        """Check out a session; it is dropped instead of reused if the request raised."""
+        entry = self.acquire(strategy, profile)
+        try:
+            yield entry[0]
+        except Exception:
+            self.release(strategy, profile, entry, discard=True)
+            raise
+        self.release(strategy, profile, entry)
+
+    def stats(self) -> dict:
+        with self._lock:
+            idle = {f"{s}:{p}": len(e) for (s, p), e in self._idle.items() if e}
+            return dict(self.counters, idle=idle)
+
+    def clear(self):
+        with self._lock:
+            sessions = [e[0] for entries in self._idle.values() for e in entries]
+            self._idle.clear()
+        for session in sessions:
+            self._close(session)
+
+
+session_pool = SessionPool(
+    ttl=float(os.getenv("PG_SESSION_TTL", "900")),
+    idle_timeout=float(os.getenv("PG_SESSION_IDLE_TIMEOUT", "120")),
+    max_idle_per_key=int(os.getenv("PG_SESSION_MAX_IDLE", "4")),
+)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Playwright scrape latency with a browser launched per scrape (old path)
+vs warm pages from BrowserPool, against a local static listing page.
+Usage: python bench_browser_pool.py [SCRAPES]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from local_stubs import StubServer, load_fixture
+from browser_pool import BrowserPool, DEFAULT_USER_AGENT
+
+LAUNCH_OPTIONS = {
+    "headless": True,
+    "args": ['--disable-blink-features=AutomationControlled', '--no-sandbox'],
+    "user_agent": DEFAULT_USER_AGENT,
+}
+
+
+async def _load(page, url):
+    await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+    await page.wait_for_selector('h1', timeout=30000)
+    return await page.content()
+
+
+async def cold_scrape(url, user_data_dir):
+    from playwright.async_api import async_playwright
+    from playwright_stealth import Stealth
+
+    async with async_playwright() as p:
+        context = await p.chromium.launch_persistent_context(user_data_dir, **LAUNCH_OPTIONS)
+        try:
+            page = await context.new_page()
+            await Stealth().apply_stealth_async(page)
+            return await _load(page, url)
+        finally:
+            await context.close()
+
+
+async def run(scrapes):
+    routes = {"/listing": (200, load_fixture("listing_full.html"), "text/html")}
+    with StubServer(routes) as server, tempfile.TemporaryDirectory() as tmp:
+        url = server.url("/listing")
+
+        cold = []
+        for _ in range(scrapes):
+            start = time.perf_counter()
+            await cold_scrape(url, os.path.join(tmp, "cold"))
+            cold.append(time.perf_counter() - start)
+
+        pool = BrowserPool(size=2, user_data_dir=os.path.join(tmp, "pooled"), launch_options=LAUNCH_OPTIONS)
+        start = time.perf_counter()
+        await pool._ensure_started()
+        warmup = time.perf_counter() - start
+        warm = []
+        try:
+            for _ in range(scrapes):
+                start = time.perf_counter()
+                async with pool.page() as page:
+                    await _load(page, url)
+                warm.append(time.perf_counter() - start)
+        finally:
+            await pool.close()
+
+    print(f"Scrapes per mode: {scrapes}")
+    print(f"Launch per scrape: mean {statistics.mean(cold) * 1000:.0f} ms, median {statistics.median(cold) * 1000:.0f} ms")
+    print(f"Browser pool:      mean {statistics.mean(warm) * 1000:.0f} ms, median {statistics.median(warm) * 1000:.0f} ms"
+          f" (one-off warm-up {warmup * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
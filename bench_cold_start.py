@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Cold-start import benchmark: `python -X importtime -c "import index"` in api/, the way a
+fresh serverless instance loads the app. Reports the cost of the app's own imports
+(the framework - fastapi, starlette, pydantic - is reported separately) and fails if it is
+over budget or if a heavy SDK that should load lazily got imported at startup.
+Usage: python bench_cold_start.py [ROUNDS]
+Budget: PG_COLD_START_BUDGET_MS (default 150), best of ROUNDS runs.
+"""
+import os
+import subprocess
+import sys
+
+from local_stubs import API_DIR
+
+BUDGET_MS = float(os.getenv("PG_COLD_START_BUDGET_MS", "150"))
+FRAMEWORK = ("fastapi", "starlette", "pydantic", "pydantic_core", "anyio")
+# Must only be imported on first use
+LAZY = ("google.generativeai", "curl_cffi", "playwright", "playwright_stealth", "cloudscraper", "bs4")
+
+
+def import_times():
+    """{module: (self_us, cumulative_us, depth)} for one fresh interpreter importing the app."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import index"],
+        cwd=API_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return times
+
+
+def run(rounds):
+    best = None
+    for _ in range(rounds):
+        times = import_times()
+        total = times["index"][1]
+        # Framework packages imported directly by the app (their own imports included)
+        framework = sum(cumulative for name, (_, cumulative, depth) in times.items()
+                        if depth == 1 and name.split(".")[0] in FRAMEWORK)
+        if best is None or total - framework < best[1] - best[2]:
+            best = (times, total, framework)
+    times, total, framework = best
+
+    app_ms = (total - framework) / 1000
+    print(f"import index: {total / 1000:.1f} ms total, {framework / 1000:.1f} ms framework, {app_ms:.1f} ms app")
+    print(f"{'slowest modules (self)':<48}{'self ms':>10}{'cum ms':>10}")
+    for name, (self_us, cumulative_us, _) in sorted(times.items(), key=lambda t: -t[1][0])[:10]:
+        print(f"{name:<48}{self_us / 1000:>10.1f}{cumulative_us / 1000:>10.1f}")
+
+    eager = [name for name in LAZY if name in times]
+    ok = True
+    if eager:
+        print(f"❌ FAIL: imported at startup: {', '.join(eager)}")
+        ok = False
+    if app_ms > BUDGET_MS:
+        print(f"❌ FAIL: app imports take {app_ms:.1f} ms, budget {BUDGET_MS:.0f} ms")
+        ok = False
+    if ok:
+        print(f"✅ PASS: app imports {app_ms:.1f} ms (budget {BUDGET_MS:.0f} ms), heavy SDKs deferred")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run(int(sys.argv[1]) if len(sys.argv) > 1 else 3) else 1)
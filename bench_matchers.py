@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the image filter / block detection in api/matchers.py against
+the per-<img> loop it replaced, on pages with thousands of image tags.
+Usage: python bench_matchers.py [IMAGE_COUNT ...]
+"""
+import re
+import sys
+import time
+
+from local_stubs import load_fixture, make_large_listing
+from listing_parser import parse_html
+from matchers import BLOCK_KEYWORDS, has_block_keyword, listing_images, title_is_blocked
+
+
+def legacy_images(existing, srcs):
+    # Previous _parse_soup loop: patterns rebuilt per image, uncompiled re.sub, list membership
+    images = list(existing)
+    for src in srcs:
+        if src and "pgimgs.com" in src:
+            exclude_patterns = [
+                'APHO', 'hui-svgicon', 'logo', 'avatar', 'icon',
+                'navbar-', 'map-shortcut', 'flags', 'static'
+            ]
+            if any(x in src.lower() for x in exclude_patterns):
+                continue
+            high_res_src = re.sub(r'\.(V\d+|R\d+X\d+)(\.jpg|\.png)', r'.V800\2', src)
+            if high_res_src not in images:
+                images.append(high_res_src)
+    return list(dict.fromkeys(images))[:20]
+
+
+def legacy_title_blocked(title_text):
+    return any(k.lower() in title_text.lower() for k in BLOCK_KEYWORDS)
+
+
+def image_srcs(count):
+    srcs = []
+    for i in range(count):
+        srcs.append(f"https://sg1-cdn.pgimgs.com/listing/{500000000 + i}/UPHO.{i}.R550X550/Listing-{i}.jpg")
+        if i % 3 == 0:
+            srcs.append(f"https://sg1-cdn.pgimgs.com/agent/avatar/{i}.V120.jpg")
+        if i % 5 == 0:
+            srcs.append(srcs[-1])  # duplicate
+    return srcs
+
+
+def _best(fn, *args, rounds=5):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(counts):
+    # "uncapped" filters every URL, i.e. the cost per <img> without stopping at 20 images
+    print(f"{'images':>8}{'legacy ms':>12}{'matchers ms':>14}{'uncapped ms':>14}{'speedup':>9}")
+    for count in counts:
+        srcs = image_srcs(count)
+        legacy = _best(legacy_images, [], srcs)
+        new = _best(listing_images, [], srcs)
+        uncapped = _best(listing_images, [], srcs, len(srcs))
+        assert legacy_images([], srcs) == listing_images([], srcs)
+        print(f"{count:>8}{legacy * 1000:>12.2f}{new * 1000:>14.3f}{uncapped * 1000:>14.2f}{legacy / new:>8.1f}x")
+
+    titles = [load_fixture("listing_full.html")[:200], "Just a moment...", "x" * 5000] * 1000
+    legacy = _best(lambda: [legacy_title_blocked(t) for t in titles])
+    new = _best(lambda: [title_is_blocked(t) for t in titles])
+    print(f"title block check x{len(titles)}: legacy {legacy * 1000:.1f} ms, matchers {new * 1000:.1f} ms")
+    body = "word " * 400
+    legacy = _best(lambda: [any(k in body for k in BLOCK_KEYWORDS) for _ in range(10000)])
+    new = _best(lambda: [has_block_keyword(body) for _ in range(10000)])
+    print(f"body keyword check x10000: legacy {legacy * 1000:.1f} ms, matchers {new * 1000:.1f} ms")
+
+    html = make_large_listing(images_per_card=8)
+    print(f"parse_html on {len(html) // 1024} KB page with {html.count('<img')} <img> tags: {_best(parse_html, html, rounds=3) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or [1000, 5000, 20000])
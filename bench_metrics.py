@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Instrumentation overhead benchmark: the cost of one span / histogram observation /
+counter increment, set against the work it measures on the hot path (parsing the
+saved fixture pages). Fails if a span costs more than PG_METRICS_OVERHEAD_BUDGET
+(default 1%) of parsing any listing page, or more than 20 µs outright. Block pages
+are shown too: they are tiny, but a blocked scrape also waited on the network.
+Usage: python bench_metrics.py [ITERATIONS]
+"""
+import os
+import statistics
+import sys
+import time
+
+from local_stubs import corpus, make_large_listing
+from listing_parser import parse_html
+from metrics import Metrics
+
+BUDGET = float(os.getenv("PG_METRICS_OVERHEAD_BUDGET", "0.01"))
+MAX_SPAN_US = 20
+
+
+def _per_call_us(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def _parse_ms(html, rounds=20):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        parse_html(html)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def run(iterations):
+    m = Metrics()
+
+    def span():
+        with m.span("parse", strategy="cloudscraper") as fields:
+            fields["bytes"] = 1
+
+    baseline = _per_call_us(lambda: None, iterations)
+    costs = {
+        "span (timer + histogram)": _per_call_us(span, iterations) - baseline,
+        "observe": _per_call_us(lambda: m.observe("stage_seconds", 0.01, stage="parse"), iterations) - baseline,
+        "inc": _per_call_us(lambda: m.inc("cache_lookups", cache="article", result="hit"), iterations) - baseline,
+    }
+    render_start = time.perf_counter()
+    m.render()
+    render_ms = (time.perf_counter() - render_start) * 1000
+
+    print(f"{'operation':<28}{'µs/call':>10}")
+    for name, us in costs.items():
+        print(f"{name:<28}{us:>10.2f}")
+    print(f"{'render /api/metrics':<28}{render_ms * 1000:>10.0f}")
+
+    pages = corpus()
+    pages["large_full (3 MB)"] = make_large_listing("listing_full.html")
+    span_us = costs["span (timer + histogram)"]
+    print(f"\n{'page':<36}{'parse ms':>10}{'overhead':>10}")
+    worst = 0.0
+    for name, html in pages.items():
+        parse_ms = _parse_ms(html)
+        overhead = span_us / (parse_ms * 1000)
+        if not name.startswith("blocked"):
+            worst = max(worst, overhead)
+        print(f"{name:<36}{parse_ms:>10.3f}{overhead:>10.3%}")
+
+    if span_us > MAX_SPAN_US or worst > BUDGET:
+        print(f"❌ FAIL: a span costs {span_us:.2f} µs, {worst:.3%} of a listing parse (budget {BUDGET:.1%}, {MAX_SPAN_US} µs)")
+        return False
+    print(f"✅ PASS: a span costs {span_us:.2f} µs, at most {worst:.3%} of a listing parse (budget {BUDGET:.1%})")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000) else 1)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Parse-time benchmark: BeautifulSoup tree parser (parse_soup) vs the streaming
+fast path (parse_html) over the saved fixture corpus plus inflated multi-MB pages.
+Pages that need the CSS fallback are tree-parsed by both paths; for those the
+fast path only adds its JSON-LD look-ahead, which is reported separately.
+Fails if the two paths disagree on any page.
+Usage: python bench_parse.py [ROUNDS]
+"""
+import gc
+import statistics
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+from local_stubs import corpus, make_large_listing
+from listing_parser import FAST_PATH_MIN_BYTES, json_ld_core, parse_html, parse_soup
+
+
+def _time(fns, html, rounds):
+    """Median seconds per function, alternating them and collecting garbage before each
+    sample so one path does not pay for the other's multi-MB trees."""
+    samples = [[] for _ in fns]
+    for _ in range(rounds):
+        for fn, fn_samples in zip(fns, samples):
+            gc.collect()
+            start = time.perf_counter()
+            fn(html)
+            fn_samples.append(time.perf_counter() - start)
+    return [statistics.median(fn_samples) for fn_samples in samples]
+
+
+def tree_parse(html):
+    return parse_soup(BeautifulSoup(html, 'html.parser'))
+
+
+def run(rounds):
+    pages = corpus()
+    pages["large_full (3 MB)"] = make_large_listing("listing_full.html")
+    pages["large_css_only (3 MB)"] = make_large_listing("listing_css_only.html")
+
+    mismatches = []
+    look_aheads = []
+    print(f"{'page':<36}{'bytes':>10}{'tree ms':>10}{'fast ms':>10}{'speedup':>9}")
+    for name, html in pages.items():
+        if tree_parse(html) != parse_html(html):
+            mismatches.append(name)
+        tree, fast = _time([tree_parse, parse_html], html, rounds)
+        print(f"{name:<36}{len(html):>10}{tree * 1000:>10.1f}{fast * 1000:>10.1f}{tree / fast:>8.1f}x")
+        if len(html) >= FAST_PATH_MIN_BYTES and json_ld_core(html) is None:
+            look_aheads.append((name, _time([json_ld_core], html, rounds)[0]))
+
+    for name, seconds in look_aheads:
+        print(f"{name}: needs the CSS fallback, the fast path adds {seconds * 1000:.1f} ms of JSON-LD look-ahead")
+
+    if mismatches:
+        print(f"❌ FAIL: fast path output differs on {', '.join(mismatches)}")
+        return False
+    print("✅ PASS: identical output on all pages")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run(int(sys.argv[1]) if len(sys.argv) > 1 else 5) else 1)
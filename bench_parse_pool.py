@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Parse pool benchmark: parse throughput of the fixture corpus plus inflated multi-MB
+pages, in-process on the event loop vs ParsePool with 1, 2, 4 ... workers up to the
+CPU count, and how long the event loop stalls meanwhile.
+Fails if a worker's result differs from parse_html, if one worker costs more than
+25% over in-process parsing (transfer overhead), or if the largest pool reaches less
+than PG_PARSE_SCALING_MIN (default 0.6) of linear scaling over one worker.
+Usage: python bench_parse_pool.py [ROUNDS]
+"""
+import asyncio
+import os
+import sys
+import time
+
+from local_stubs import corpus, make_large_listing
+from listing_parser import parse_html
+from parse_pool import ParsePool
+
+SCALING_MIN = float(os.getenv("PG_PARSE_SCALING_MIN", "0.6"))
+MAX_OVERHEAD = 0.25
+
+
+def _workload(rounds):
+    pages = corpus()
+    pages["large_full (3 MB)"] = make_large_listing("listing_full.html")
+    pages["large_css_only (3 MB)"] = make_large_listing("listing_css_only.html")
+    pages = {name: html.encode("utf-8") for name, html in pages.items()}
+    return pages, list(pages.values()) * rounds
+
+
+async def _measure(parse_one, bodies):
+    """(seconds for all bodies, longest event loop stall) with every parse in flight at once."""
+    stalls = [0.0]
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stalls[0] = max(stalls[0], time.perf_counter() - start - 0.005)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(parse_one(body) for body in bodies))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick
+    return elapsed, stalls[0]
+
+
+def _worker_counts():
+    cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cpus:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpus:
+        counts.append(cpus)
+    return counts
+
+
+def run(rounds):
+    pages, bodies = _workload(rounds)
+    total_mb = sum(len(body) for body in bodies) / 1e6
+    cpus = os.cpu_count() or 1
+    print(f"{len(bodies)} pages, {total_mb:.1f} MB per run, {cpus} CPU(s)\n")
+
+    async def in_process(body):
+        return parse_html(body.decode("utf-8"))  # on the event loop, as without a pool
+
+    seconds, stall = asyncio.run(_measure(in_process, bodies))
+    baseline = total_mb / seconds
+    print(f"{'parser':<22}{'MB/s':>8}{'pages/s':>9}{'speedup':>9}{'scaling':>9}{'loop stall ms':>15}")
+    print(f"{'in-process':<22}{baseline:>8.2f}{len(bodies) / seconds:>9.1f}{1:>8.2f}x{'':>9}{stall * 1000:>15.1f}")
+
+    mismatches = []
+    throughput = {}
+    for workers in _worker_counts():
+        pool = ParsePool(workers)
+        try:
+            pool.warm()
+            if workers == 1:
+                for name, body in pages.items():
+                    if asyncio.run(pool.parse(body, "utf-8")) != parse_html(body.decode("utf-8")):
+                        mismatches.append(name)
+            seconds, stall = asyncio.run(_measure(lambda body: pool.parse(body, "utf-8"), bodies))
+        finally:
+            pool.shutdown()
+        throughput[workers] = total_mb / seconds
+        scaling = throughput[workers] / (workers * throughput[1])
+        print(f"{f'pool, {workers} worker(s)':<22}{throughput[workers]:>8.2f}{len(bodies) / seconds:>9.1f}"
+              f"{throughput[workers] / baseline:>8.2f}x{scaling:>8.0%} {stall * 1000:>15.1f}")
+
+    overhead = baseline / throughput[1] - 1
+    largest = max(throughput)
+    scaling = throughput[largest] / (largest * throughput[1])
+    if mismatches:
+        print(f"❌ FAIL: pool output differs on {', '.join(mismatches)}")
+        return False
+    if overhead > MAX_OVERHEAD:
+        print(f"❌ FAIL: one worker is {overhead:.0%} slower than parsing in-process (budget {MAX_OVERHEAD:.0%})")
+        return False
+    if largest > 1 and scaling < SCALING_MIN:
+        print(f"❌ FAIL: {largest} workers reach {scaling:.0%} of linear scaling (minimum {SCALING_MIN:.0%})")
+        return False
+    if largest == 1:
+        print(f"✅ PASS: identical output, one worker within {MAX_OVERHEAD:.0%} of in-process "
+              f"({overhead:+.0%}); only 1 CPU here, so scaling was not measured")
+        return True
+    print(f"✅ PASS: identical output, {largest} workers parse {throughput[largest] / baseline:.1f}x "
+          f"as fast as in-process ({scaling:.0%} of linear)")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run(int(sys.argv[1]) if len(sys.argv) > 1 else 3) else 1)
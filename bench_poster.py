@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Poster throughput benchmark with the large-payload case from test_poster_local.py
+(~3 MB body with an inline base64 image), against the app served by uvicorn on a
+local port: unique posters (render) and repeated posters (PNG cache), plus - with
+Chromium installed - a browser launched per poster for comparison.
+Usage: python bench_poster.py [REQUESTS] [CONCURRENCY] [--fake]
+--fake renders with a stub browser pool, measuring only the HTTP/body/cache path.
+"""
+import asyncio
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from local_stubs import AppServer, FakeBrowserPool, make_poster_payload
+import poster as poster_module
+from poster import PosterRenderer, poster_document
+
+
+def _post(url, body):
+    start = time.perf_counter()
+    response = requests.post(url, data=body, headers={"Content-Type": "application/json"}, timeout=120)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def _load(url, bodies, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(lambda body: _post(url, body), bodies))
+    return time.perf_counter() - start, latencies
+
+
+def _report(name, elapsed, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{name:<28}{len(latencies) / elapsed:>10.2f}{statistics.median(latencies) * 1000:>12.0f}{p95 * 1000:>12.0f}")
+
+
+async def _launch_per_poster(payloads, concurrency):
+    """The approach the pool replaces: a fresh Chromium for every poster."""
+    from playwright.async_api import async_playwright
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(payload):
+        async with semaphore:
+            start = time.perf_counter()
+            browser = await p.chromium.launch(headless=True, args=['--no-sandbox'])
+            try:
+                page = await browser.new_page(viewport={"width": poster_module.POSTER_WIDTH, "height": 1000}, device_scale_factor=2)
+                await page.set_content(poster_document(payload["html"], payload["title"]), wait_until="load")
+                await page.locator(".poster").screenshot(type="png")
+            finally:
+                await browser.close()
+            latencies.append(time.perf_counter() - start)
+
+    async with async_playwright() as p:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(payload) for payload in payloads))
+        return time.perf_counter() - start, latencies
+
+
+def run(count, concurrency, fake):
+    import json
+
+    pool = FakeBrowserPool(size=poster_module.poster_pool.size, latency=0.2) if fake else poster_module.poster_pool
+    poster_module._shared_renderer = PosterRenderer(pool, cache_size=count + 1)
+    payloads = [make_poster_payload(tag=str(i)) for i in range(count)]
+    bodies = [json.dumps(payload).encode("utf-8") for payload in payloads]
+    print(f"{count} requests of {len(bodies[0]) / 1e6:.1f} MB, {concurrency} concurrent, "
+          f"{'stub' if fake else 'Chromium'} renderer, pool of {pool.size}")
+    print(f"{'case':<28}{'req/s':>10}{'p50 ms':>12}{'p95 ms':>12}")
+
+    with AppServer() as server:
+        url = server.url("/api/generate-poster")
+        _post(url, json.dumps(make_poster_payload(extra_bytes=0, tag="warmup")).encode("utf-8"))
+        _report("pooled, unique posters", *_load(url, bodies, concurrency))
+        _report("pooled, repeated (cache)", *_load(url, bodies, concurrency))
+
+    if not fake:
+        _report("browser per poster", *asyncio.run(_launch_per_poster(payloads, concurrency)))
+    return True
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    count = int(args[0]) if args else 20
+    concurrency = int(args[1]) if len(args) > 1 else 4
+    try:
+        ok = run(count, concurrency, "--fake" in sys.argv)
+    except Exception as e:
+        print(f"❌ FAIL: {e} (no Chromium? run `playwright install chromium` or pass --fake)")
+        ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark and regression suite, no network or API key needed:
+
+- parse: parse_html (fast path) and the BeautifulSoup tree parser (parse_soup) over
+  the saved corpus (listings, JSON-LD-only and blocked pages) plus an inflated 3 MB page
+- scrape: scrape() latency distribution per strategy against a stub PropertyGuru with
+  latency jitter and a share of Cloudflare blocks, and for the fallback chain
+- e2e: /api/generate requests per second through uvicorn, with the stub site and the
+  fake Gemini model
+
+Results are written as JSON and compared with a baseline run; a metric more than
+PG_BENCH_TOLERANCE (default 25%) worse than the baseline fails the run.
+Usage: python bench_suite.py [--quick] [--only parse,scrape,e2e] [--out PATH]
+                             [--baseline PATH] [--save-baseline]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from local_stubs import (ROOT_DIR, AppServer, FakeGeminiModel, StubServer, corpus, load_fixture, make_large_listing,
+                         no_image_prefetch, shared_services)
+
+RESULTS_DIR = os.path.join(ROOT_DIR, "bench_results")
+TOLERANCE = float(os.getenv("PG_BENCH_TOLERANCE", "0.25"))
+SITE_LATENCY = 0.05
+SITE_JITTER = 0.05
+BLOCK_RATE = 0.2
+GEMINI_LATENCY = 0.2
+
+
+def _quiet():
+    """Swallow the scraper's per-request print()s while measuring."""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _percentiles(samples) -> dict:
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 1)
+
+    return {"p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99), "max_ms": round(ordered[-1] * 1000, 1)}
+
+
+def bench_parse(rounds: int) -> dict:
+    from bs4 import BeautifulSoup
+    from listing_parser import parse_html, parse_soup
+
+    def median_seconds(fn, html):
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            fn(html)
+            samples.append(time.perf_counter() - start)
+        return statistics.median(samples)
+
+    pages = corpus()
+    pages["large_full (3 MB)"] = make_large_listing("listing_full.html")
+    result = {"pages": {}}
+    total_bytes = fast_total = tree_total = 0.0
+    print(f"{'page':<36}{'KB':>8}{'fast ms':>10}{'tree ms':>10}")
+    for name, html in pages.items():
+        fast = median_seconds(parse_html, html)
+        tree = median_seconds(lambda h: parse_soup(BeautifulSoup(h, "html.parser")), html)
+        size = len(html.encode("utf-8"))
+        total_bytes += size
+        fast_total += fast
+        tree_total += tree
+        result["pages"][name] = {"bytes": size, "fast_ms": round(fast * 1000, 3), "tree_ms": round(tree * 1000, 3)}
+        print(f"{name:<36}{size / 1024:>8.0f}{fast * 1000:>10.2f}{tree * 1000:>10.2f}")
+    result["fast_mb_per_s"] = round(total_bytes / fast_total / 1e6, 2)
+    result["tree_mb_per_s"] = round(total_bytes / tree_total / 1e6, 2)
+    result["fast_pages_per_s"] = round(len(pages) / fast_total, 1)
+    print(f"fast path {result['fast_mb_per_s']} MB/s, tree parser {result['tree_mb_per_s']} MB/s")
+    return result
+
+
+def _scraper(order):
+    from scraper import PropertyGuruScraper
+
+    # Nothing adaptive: each run sees the same strategy behaviour
+    return PropertyGuruScraper(hedge_budget=None, strategy_order=order, adaptive_order=False, cache=None,
+                               rate_limiter=None, breaker=None)
+
+
+def bench_scrape(count: int, concurrency: int) -> dict:
+    from scraper import module_available, scrape_status
+
+    scenarios = {"cloudscraper": ["cloudscraper"]}
+    if module_available("curl_cffi"):
+        scenarios["curl_cffi:chrome120"] = ["curl_cffi:chrome120"]
+        scenarios["chain (cloudscraper -> curl_cffi)"] = ["cloudscraper", "curl_cffi:chrome120"]
+    result = {}
+    print(f"{'strategy':<36}{'ok %':>7}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}")
+    for name, order in scenarios.items():
+        listing = (200, load_fixture("listing_full.html"), "text/html")
+        with StubServer({}, latency=SITE_LATENCY, jitter=SITE_JITTER, block_rate=BLOCK_RATE,
+                        default_route=listing) as server:
+            scraper = _scraper(order)
+
+            async def run():
+                semaphore = asyncio.Semaphore(concurrency)
+
+                async def one(i):
+                    async with semaphore:
+                        start = time.perf_counter()
+                        data = await scraper.scrape(server.url(f"/listing/for-sale-bench-{500000000 + i}"))
+                        return time.perf_counter() - start, scrape_status(data)
+
+                return await asyncio.gather(*(one(i) for i in range(count)))
+
+            with _quiet():
+                outcomes = asyncio.run(run())
+        latencies = [seconds for seconds, _ in outcomes]
+        ok = sum(status == "ok" for _, status in outcomes)
+        result[name] = dict(_percentiles(latencies), success_rate=round(ok / count, 3), requests=count)
+        r = result[name]
+        print(f"{name:<36}{ok / count * 100:>7.0f}{r['p50_ms']:>9}{r['p90_ms']:>9}{r['p99_ms']:>9}")
+    return result
+
+
+def bench_e2e(count: int, concurrency: int) -> dict:
+    import requests
+
+    from ai_service import AIService
+
+    ai = AIService("bench-key", model=FakeGeminiModel(latency=GEMINI_LATENCY), cache=None)
+    listing = (200, load_fixture("listing_full.html"), "text/html")
+    with shared_services(_scraper(["cloudscraper"]), ai), no_image_prefetch():
+        with StubServer({}, latency=SITE_LATENCY, jitter=SITE_JITTER, default_route=listing) as site, AppServer() as app:
+            endpoint = app.url("/api/generate")
+
+            def one(i):
+                start = time.perf_counter()
+                response = requests.post(endpoint, json={"url": site.url(f"/listing/for-sale-bench-{600000000 + i}")},
+                                         timeout=60)
+                return time.perf_counter() - start, response.status_code
+
+            with _quiet():
+                one(-1)  # warm-up
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    outcomes = list(pool.map(one, range(count)))
+                elapsed = time.perf_counter() - start
+
+    ok = sum(status == 200 for _, status in outcomes)
+    result = dict(_percentiles([seconds for seconds, _ in outcomes]), rps=round(count / elapsed, 2),
+                  success_rate=round(ok / count, 3), requests=count, concurrency=concurrency)
+    print(f"/api/generate: {result['rps']} req/s at {concurrency} concurrent, "
+          f"p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, {ok}/{count} ok")
+    return result
+
+
+def summary(results: dict) -> dict:
+    """Flat {metric: value} of the numbers a regression is judged on."""
+    flat = {}
+    if "parse" in results:
+        for key in ("fast_mb_per_s", "tree_mb_per_s", "fast_pages_per_s"):
+            flat[f"parse.{key}"] = results["parse"][key]
+    for name, r in results.get("scrape", {}).items():
+        flat[f"scrape.{name}.p50_ms"] = r["p50_ms"]
+        flat[f"scrape.{name}.p90_ms"] = r["p90_ms"]
+        flat[f"scrape.{name}.success_rate"] = r["success_rate"]
+    if "e2e" in results:
+        for key in ("rps", "p50_ms", "p90_ms", "success_rate"):
+            flat[f"e2e.{key}"] = results["e2e"][key]
+    return flat
+
+
+def higher_is_better(metric: str) -> bool:
+    return not metric.endswith("_ms")
+
+
+def compare(current: dict, baseline: dict) -> list:
+    """Print each metric against the baseline; returns the regressions."""
+    regressions = []
+    print(f"\n{'metric':<52}{'baseline':>12}{'now':>12}{'change':>10}")
+    for metric, value in current.items():
+        before = baseline.get(metric)
+        if not before:
+            print(f"{metric:<52}{'-':>12}{value:>12}{'new':>10}")
+            continue
+        change = (value - before) / before
+        worse = -change if higher_is_better(metric) else change
+        flag = "  ❌" if worse > TOLERANCE else ""
+        print(f"{metric:<52}{before:>12}{value:>12}{change:>+10.1%}{flag}")
+        if worse > TOLERANCE:
+            regressions.append(metric)
+    return regressions
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline scrape/parse/generate benchmarks")
+    parser.add_argument("--quick", action="store_true", help="fewer rounds and requests")
+    parser.add_argument("--only", default="parse,scrape,e2e")
+    parser.add_argument("--out", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--baseline", default=os.path.join(RESULTS_DIR, "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="make this run the new baseline")
+    args = parser.parse_args(argv)
+
+    only = {part.strip() for part in args.only.split(",")}
+    rounds, requests_count, concurrency = (5, 20, 4) if args.quick else (20, 60, 8)
+    results = {"meta": {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "quick": args.quick,
+        "site": {"latency": SITE_LATENCY, "jitter": SITE_JITTER, "block_rate": BLOCK_RATE},
+        "gemini_latency": GEMINI_LATENCY,
+    }}
+    if "parse" in only:
+        print("== parse ==")
+        results["parse"] = bench_parse(rounds)
+    if "scrape" in only:
+        print("\n== scrape ==")
+        results["scrape"] = bench_scrape(requests_count, concurrency)
+    if "e2e" in only:
+        print("\n== e2e ==")
+        results["e2e"] = bench_e2e(requests_count, concurrency)
+    results["summary"] = summary(results)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\nResults written to {args.out}")
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"✅ PASS: saved as the baseline ({args.baseline})")
+        return True
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results["summary"], baseline.get("summary", {}))
+    if regressions:
+        print(f"❌ FAIL: {len(regressions)} metric(s) over {TOLERANCE:.0%} worse than the baseline "
+              f"({baseline['meta'].get('git')}): {', '.join(regressions)}")
+        return False
+    print(f"✅ PASS: within {TOLERANCE:.0%} of the baseline ({baseline['meta'].get('git')})")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
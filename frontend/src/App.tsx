@@ -1,5 +1,4 @@
 import { useState } from 'react'
-import axios from 'axios'
 import Editor from './components/Editor'
 import { Link, Sparkles, Loader2, AlertCircle } from 'lucide-react'
 
@@ -24,11 +23,48 @@ function App() {
         setError(null)
 
         try {
-            const response = await axios.post(`/api/generate`, { url, mode })
-            setArticle(response.data)
+            // Server-sent events: "chunk" events fill the editor as Gemini writes,
+            // "complete" carries the final title/content_html
+            const response = await fetch(`${API_BASE_URL}/api/generate-stream`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ url, mode }),
+            })
+            if (!response.ok || !response.body) {
+                const body = await response.json().catch(() => null)
+                throw new Error(body?.detail || '生成失败，请稍后重试。')
+            }
+
+            const reader = response.body.getReader()
+            const decoder = new TextDecoder()
+            let buffer = ''
+            let title = ''
+            let html = ''
+            while (true) {
+                const { done, value } = await reader.read()
+                if (done) break
+                buffer += decoder.decode(value, { stream: true })
+                let boundary
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const block = buffer.slice(0, boundary)
+                    buffer = buffer.slice(boundary + 2)
+                    const event = block.match(/^event: (.*)$/m)?.[1]
+                    const data = block.match(/^data: (.*)$/m)?.[1]
+                    if (!event || !data) continue
+                    const payload = JSON.parse(data)
+                    if (event === 'listing') {
+                        title = payload.title
+                    } else if (event === 'chunk') {
+                        html += payload.html
+                        setArticle({ title, content_html: html })
+                    } else if (event === 'complete') {
+                        setArticle(payload)
+                    }
+                }
+            }
         } catch (err: any) {
             console.error(err)
-            setError(err.response?.data?.detail || '生成失败，请稍后重试。')
+            setError(err.message || '生成失败，请稍后重试。')
         } finally {
             setGenerating(false)
         }
@@ -0,0 +1,515 @@
+"""
+Local stand-ins for the external services the backend talks to.
+Used by the local test and benchmark scripts so they run without network access.
+"""
+import asyncio
+import hashlib
+import os
+import random
+import re
+import socket
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(ROOT_DIR, "fixtures")
+
+# Make the backend modules importable the same way they import each other
+API_DIR = os.path.join(ROOT_DIR, "api")
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+
+@contextmanager
+def no_image_prefetch():
+    """Don't pre-fetch scraped listing photos (they live on the real CDN) inside the block."""
+    import images
+    saved = images.PREFETCH
+    images.PREFETCH = False
+    try:
+        yield
+    finally:
+        images.PREFETCH = saved
+
+
+@contextmanager
+def shared_services(scraper=None, ai=None):
+    """Serve the app's requests with this scraper and AI service inside the block."""
+    import ai_service
+    import scraper as scraper_module
+    saved = scraper_module._shared_scraper, ai_service._shared_service
+    if scraper is not None:
+        scraper_module._shared_scraper = scraper
+    if ai is not None:
+        ai_service._shared_service = ai
+    try:
+        yield
+    finally:
+        scraper_module._shared_scraper, ai_service._shared_service = saved
+
+
+def load_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def corpus() -> dict:
+    """Saved listing/block pages by file name."""
+    return {
+        name: load_fixture(name)
+        for name in sorted(os.listdir(FIXTURES_DIR))
+        if name.endswith(".html")
+    }
+
+
+def make_large_listing(base: str = "listing_full.html", target_bytes: int = 3_000_000, images_per_card: int = 1) -> str:
+    """
+    Inflate a fixture to the size of a real PropertyGuru page: a large __NEXT_DATA__ blob
+    plus similar-listing cards with images and text (deterministic).
+    """
+    html = load_fixture(base)
+    blob_items = []
+    size = 0
+    i = 0
+    while size < target_bytes // 2:
+        item = f'{{"id": {600000000 + i}, "name": "Similar listing {i}", "price": {1000000 + i * 10}, "tags": ["condo", "freehold", "near mrt"]}}'
+        blob_items.append(item)
+        size += len(item) + 2
+        i += 1
+    next_data = f'<script id="__NEXT_DATA__" type="application/json">{{"props": {{"listings": [{", ".join(blob_items)}]}}}}</script>'
+
+    cards = []
+    size = 0
+    i = 0
+    while size < target_bytes // 2:
+        imgs = "".join(
+            f'<img src="https://sg1-cdn.pgimgs.com/listing/{700000000 + i}/UPHO.{i * 10 + k}.R550X550/Similar-{i}.jpg" alt="Photo {k}">'
+            for k in range(images_per_card)
+        )
+        card = (
+            f'<div class="listing-card" data-listing-id="{700000000 + i}"><a href="/listing/for-sale-similar-{700000000 + i}">'
+            f'{imgs}<h3 class="card-title">Similar listing {i}</h3>'
+            f'<p class="card-text">3 bed &middot; 2 bath &middot; 1,200 sqft &middot; S$ {1000000 + i * 10:,}</p></a>'
+            f'<img src="https://sg1-cdn.pgimgs.com/agent/avatar/{i}.V120.jpg" alt="Agent"></div>\n'
+        )
+        cards.append(card)
+        size += len(card)
+        i += 1
+    html = html.replace("</head>", next_data + "\n</head>", 1)
+    return html.replace("</body>", "".join(cards) + "</body>", 1)
+
+
+class FakeClock:
+    """Manual clock for time-based logic: call it for the time, advance() or sleep() to move it."""
+
+    def __init__(self, start: float = 1000.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+    async def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class StubServer:
+    """
+    Threaded HTTP server on 127.0.0.1 serving canned responses.
+
+    routes maps a path (query string ignored) to (status, body, content_type[, latency]);
+    other paths get `default_route`, or a 404. Responses are delayed by the route's
+    latency, or `latency` seconds by default, plus up to `jitter` seconds at random,
+    to imitate a slow origin. With `block_rate`, that share of requests gets
+    `block_route` instead (by default Cloudflare's challenge page with a 403).
+    Randomness is seeded, so a run is repeatable. With `etags`, 200s carry an ETag
+    of the body and a matching If-None-Match gets an empty 304.
+    """
+
+    def __init__(self, routes: dict, latency: float = 0.0, jitter: float = 0.0, block_rate: float = 0.0,
+                 block_route=None, default_route=None, seed: int = 0, etags: bool = False):
+        self.routes = routes
+        self.latency = latency
+        self.jitter = jitter
+        self.block_rate = block_rate
+        self.block_route = block_route or (403, load_fixture("blocked_cloudflare_challenge.html"), "text/html")
+        self.default_route = default_route or (404, "Not Found", "text/plain")
+        self.etags = etags
+        self.hits = 0
+        self.blocked = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                route = stub.routes.get(path, stub.default_route)
+                with stub._lock:
+                    stub.hits += 1
+                    extra = stub._random.uniform(0, stub.jitter) if stub.jitter else 0.0
+                    if stub.block_rate and stub._random.random() < stub.block_rate:
+                        stub.blocked += 1
+                        route = stub.block_route
+                status, body, content_type = route[:3]
+                latency = (route[3] if len(route) > 3 else stub.latency) + extra
+                if latency:
+                    time.sleep(latency)
+                if isinstance(body, str):
+                    body = body.encode("utf-8")
+                etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"' if stub.etags and status == 200 else None
+                if etag is not None and self.headers.get("If-None-Match") == etag:
+                    status, body = 304, b""
+                with stub._lock:
+                    stub.not_modified += status == 304
+                    stub.bytes_sent += len(body)
+                self.send_response(status)
+                if etag is not None:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class AppServer:
+    """The FastAPI app served by uvicorn on 127.0.0.1 in a background thread."""
+
+    def __enter__(self):
+        import uvicorn
+        from index import app
+
+        self._socket = socket.socket()
+        self._socket.bind(("127.0.0.1", 0))
+        self.base_url = f"http://127.0.0.1:{self._socket.getsockname()[1]}"
+        self._server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [self._socket]}, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join()
+        self._socket.close()
+
+
+class FakeUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text, usage=None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class FakeGeminiModel:
+    """
+    Stand-in for genai.GenerativeModel with a fixed answer and latency.
+    Tracks how many calls overlap so tests can check they are not serialized.
+    """
+
+    def __init__(self, text: str = "```html\n<h2>Fake article</h2><p>Generated locally.</p>\n```", latency: float = 0.5, chunks=None,
+                 json_text: str = None):
+        self.text = text
+        # Answer to structured-output calls (response_mime_type application/json)
+        self.json_text = json_text
+        self.latency = latency
+        # How a streamed answer is split; defaults to 16-character pieces
+        self.chunks = chunks if chunks is not None else [text[i:i + 16] for i in range(0, len(text), 16)]
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.prompts = []
+
+    def _answer(self, prompt, generation_config=None):
+        text = self.text
+        if self.json_text is not None and (generation_config or {}).get("response_mime_type") == "application/json":
+            text = self.json_text
+        # Token counts the way the real API reports them, roughly 4 characters a token
+        return FakeResponse(text, FakeUsage(len(prompt) // 4, len(text) // 4))
+
+    async def generate_content_async(self, prompt, stream=False, generation_config=None, **kwargs):
+        self.calls += 1
+        self.prompts.append(prompt)
+        if stream:
+            return self._stream(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return self._answer(prompt, generation_config)
+
+    async def _stream(self, prompt):
+        """The answer as streamed chunks, `latency` spread evenly across them; usage comes with the last."""
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            for i, chunk in enumerate(self.chunks):
+                await asyncio.sleep(self.latency / len(self.chunks))
+                last = i == len(self.chunks) - 1
+                yield FakeResponse(chunk, FakeUsage(len(prompt) // 4, len(self.text) // 4) if last else None)
+        finally:
+            self.in_flight -= 1
+
+
+class FakeBlockingGeminiModel(FakeGeminiModel):
+    """Same, but only offers the blocking generate_content() call."""
+
+    generate_content_async = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, generation_config=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.prompts.append(prompt)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        return self._answer(prompt, generation_config)
+
+
+# Same shape as the large-payload case in test_poster_local.py
+PIXEL_PNG_B64 = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKwMTQAAAABJRU5ErkJggg=="
+
+
+def make_poster_payload(extra_bytes: int = 3 * 1024 * 1024, tag: str = "") -> dict:
+    """A /api/generate-poster body: a short article, an inline image and `extra_bytes` of hidden data."""
+    html = f"""
+<h1>Test Poster {tag}</h1>
+<p>This is a test of the poster generation system with LARGE data.</p>
+<img src="data:image/png;base64,{PIXEL_PNG_B64}" width="100" height="100" />
+<!-- Hidden large data to simulate payload size -->
+<div style="display:none">{"A" * extra_bytes}</div>
+"""
+    return {"html": html, "title": f"Debug Poster Large Payload {tag}".strip()}
+
+
+class FakeRoute:
+    """Stand-in for an intercepted Playwright request; records how it was answered."""
+
+    def __init__(self, url):
+        self.request = type("Request", (), {"url": url})()
+        self.outcome = None
+        self.body = None
+
+    async def fulfill(self, path=None, body=None, content_type=None, **kwargs):
+        self.outcome = "fulfilled"
+        if path is not None:
+            with open(path, "rb") as f:
+                body = f.read()
+        self.body = body
+
+    async def continue_(self, **kwargs):
+        self.outcome = "continued"
+
+    async def abort(self, *args):
+        self.outcome = "aborted"
+
+
+class FakePage:
+    """Stand-in for a Playwright page that "renders" by hashing the content it was given."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.content = None
+        self.routes = []
+
+    async def route(self, matcher, handler):
+        self.routes.append((matcher, handler))
+
+    async def unroute(self, matcher, handler):
+        self.routes.remove((matcher, handler))
+
+    async def set_content(self, html, **kwargs):
+        self.content = html
+        # "Load" the images and frames, through a matching route handler if there is one.
+        # Like Playwright, data: URLs never reach the route handlers
+        for src in re.findall(r'<(?:img|iframe)[^>]+src="([^"]+)"', html):
+            if src.startswith("data:"):
+                continue
+            for matcher, handler in reversed(self.routes):  # the newest route wins
+                if matcher == "**/*" or (callable(matcher) and matcher(src)):
+                    route = FakeRoute(src)
+                    await handler(route)
+                    self.pool.image_requests.append((src, route.outcome))
+                    break
+
+    def locator(self, selector):
+        return self
+
+    async def screenshot(self, **kwargs):
+        await asyncio.sleep(self.pool.latency)
+        self.pool.renders += 1
+        return b"\x89PNG\r\n\x1a\n" + hashlib.sha256(self.content.encode("utf-8")).digest()
+
+
+class FakeBrowserPage:
+    """Stand-in for a Playwright page in a FakeBrowserContext; crash() fires its "crash" handlers."""
+
+    def __init__(self, context):
+        self.context = context
+        self.url = "about:blank"
+        self.closed = False
+        self.fail_goto = False
+        self._handlers = {}
+
+    def on(self, event, handler):
+        self._handlers.setdefault(event, []).append(handler)
+
+    def crash(self):
+        for handler in self._handlers.get("crash", []):
+            handler(self)
+
+    def is_closed(self) -> bool:
+        return self.closed or self.context.closed
+
+    async def goto(self, url, **kwargs):
+        if self.fail_goto or self.is_closed():
+            raise RuntimeError("Target page, context or browser has been closed")
+        self.url = url
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowserContext:
+    def __init__(self, persistent: bool):
+        self.closed = False
+        self.pages = [FakeBrowserPage(self)] if persistent else []
+        self._handlers = []
+
+    def on(self, event, handler):
+        if event == "close":
+            self._handlers.append(handler)
+
+    async def new_page(self):
+        page = FakeBrowserPage(self)
+        self.pages.append(page)
+        return page
+
+    async def close(self):
+        await asyncio.sleep(0)  # like the real one, closing yields to the event loop
+        self.closed = True
+        for handler in self._handlers:
+            handler(self)
+
+
+class FakePlaywright:
+    """
+    Stand-in for a started async_playwright(), to set as BrowserPool._playwright.
+    Records every context launched; set `fail_launch` to make the next launches raise.
+    """
+
+    def __init__(self):
+        self.chromium = self
+        self.contexts = []
+        self.user_data_dirs = []
+        self.fail_launch = False
+
+    def _context(self, persistent):
+        if self.fail_launch:
+            raise RuntimeError("Browser closed unexpectedly")
+        context = FakeBrowserContext(persistent)
+        self.contexts.append(context)
+        return context
+
+    async def launch_persistent_context(self, user_data_dir, **kwargs):
+        self.user_data_dirs.append(user_data_dir)
+        return self._context(persistent=True)
+
+    async def launch(self, **kwargs):
+        playwright = self
+
+        class Browser:
+            async def new_context(self, **kwargs):
+                return playwright._context(persistent=False)
+
+            async def close(self):
+                pass
+
+        if self.fail_launch:
+            raise RuntimeError("Browser closed unexpectedly")
+        return Browser()
+
+    async def stop(self):
+        pass
+
+
+class FakeBrowserPool:
+    """BrowserPool stand-in with `size` pages and a fixed render latency."""
+
+    def __init__(self, size: int = 2, latency: float = 0.1):
+        self.size = size
+        self.latency = latency
+        self.renders = 0
+        self.image_requests = []  # (url, "fulfilled" / "continued" / "aborted")
+        self.in_use = 0
+        self.max_in_use = 0
+        self._semaphore = None
+
+    @asynccontextmanager
+    async def page(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.size)
+        async with self._semaphore:
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            try:
+                yield FakePage(self)
+            finally:
+                self.in_use -= 1
+
+    def stats(self) -> dict:
+        return {"size": self.size, "in_use": self.in_use, "renders": self.renders}
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Concurrency test for AIService.generate_wechat_article with a local fake model:
+concurrent generations overlap instead of serializing on the event loop,
+the in-flight cap holds, and slow calls time out without a timed-out blocking call
+giving up its slot while its thread still runs.
+"""
+import asyncio
+import sys
+import time
+
+from local_stubs import FakeBlockingGeminiModel, FakeGeminiModel
+from ai_service import AIService
+
+LISTING = {
+    "title": "Viva Vista 3 Bedroom Condo for Sale",
+    "price": "SGD 1880000",
+    "address": "3 South Buona Vista Road",
+    "description": "Bright and airy 3 bedroom unit with unblocked views.",
+    "images": [],
+}
+CONCURRENT = 8  # default GEMINI_MAX_CONCURRENCY, also the executor size
+LATENCY = 0.5
+
+
+async def _timed(service, n):
+    start = time.perf_counter()
+    results = await asyncio.gather(*(service.generate_wechat_article(LISTING) for _ in range(n)))
+    return time.perf_counter() - start, results
+
+
+def test_generations_do_not_serialize():
+    for model in (FakeGeminiModel(latency=LATENCY), FakeBlockingGeminiModel(latency=LATENCY)):
+        service = AIService("test-key", model=model, max_concurrency=CONCURRENT, cache=None)
+        elapsed, results = asyncio.run(_timed(service, CONCURRENT))
+        print(f"{type(model).__name__}: {CONCURRENT} generations in {elapsed:.2f}s")
+        assert elapsed < LATENCY * 2, f"{type(model).__name__} serialized: {elapsed:.2f}s"
+        assert model.max_in_flight == CONCURRENT
+        assert results[0]["content_html"] == "<h2>Fake article</h2><p>Generated locally.</p>"
+
+
+def test_in_flight_cap():
+    model = FakeGeminiModel(latency=0.2)
+    service = AIService("test-key", model=model, max_concurrency=2, cache=None)
+    elapsed, _ = asyncio.run(_timed(service, 6))
+    assert model.max_in_flight == 2
+    assert elapsed >= 0.2 * 3 - 0.05
+
+
+def test_timeout():
+    service = AIService("test-key", model=FakeGeminiModel(latency=5), timeout=0.2, cache=None)
+    elapsed, results = asyncio.run(_timed(service, 1))
+    assert elapsed < 1
+    assert "AI Generation failed" in results[0]["content_html"]
+    assert "timed out" in results[0]["content_html"]
+
+
+def test_timed_out_blocking_call_keeps_its_slot():
+    model = FakeBlockingGeminiModel(latency=0.6)
+    service = AIService("test-key", model=model, max_concurrency=1, timeout=0.1, cache=None)
+
+    async def run():
+        first = await service.generate_wechat_article(LISTING)  # times out, its thread runs on
+        model.latency = 0.01
+        second = await service.generate_wechat_article(LISTING)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert "timed out" in first["content_html"]
+    assert second["content_html"] == "<h2>Fake article</h2><p>Generated locally.</p>", "waited for the slot"
+    assert model.max_in_flight == 1, "the timed-out call was still running when the next one started"
+
+
+if __name__ == "__main__":
+    try:
+        test_generations_do_not_serialize()
+        test_in_flight_cap()
+        test_timeout()
+        test_timed_out_blocking_call_keeps_its_slot()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: concurrent generations")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Multi-mode generation test with a fake Gemini model: all modes come back from one
+request, run concurrently or as one combined structured call, and the reported
+savings are measured against generating the modes one by one (for a combined call,
+estimated from measured single-mode calls, or reported as unknown without any).
+"""
+import asyncio
+import json
+import sys
+
+from local_stubs import FakeGeminiModel, StubServer, load_fixture, shared_services
+from ai_service import AIService
+from article_cache import ArticleCache
+from rate_limit import HostRateLimiter
+from scraper import PropertyGuruScraper
+
+LISTING = {
+    "title": "Viva Vista 3 Bedroom Condo for Sale",
+    "price": "SGD 1880000",
+    "address": "3 South Buona Vista Road",
+    "description": "Bright and airy 3 bedroom unit with unblocked views. " * 40,
+    "images": [],
+}
+COMBINED = json.dumps({"note": "<h2>专业笔记</h2><p>Viva Vista</p>", "xhs": "```html\n<p>小红书 Viva Vista ✨</p>\n```"}, ensure_ascii=False)
+LATENCY = 0.3
+
+
+def _generate(service, strategy=None, data=LISTING):
+    return asyncio.run(service.generate_wechat_articles(data, ["note", "xhs"], strategy=strategy))
+
+
+def test_concurrent_modes():
+    model = FakeGeminiModel(latency=LATENCY)
+    result = _generate(AIService("test-key", model=model, cache=None), strategy="concurrent")
+
+    assert set(result["articles"]) == {"note", "xhs"}
+    assert model.calls == 2 and model.max_in_flight == 2
+    stats = result["stats"]
+    assert stats["strategy"] == "concurrent"
+    assert stats["wall_seconds"] < LATENCY * 1.5
+    assert stats["seconds_saved"] >= LATENCY * 0.5
+    assert stats["tokens_saved"] == 0
+
+
+def test_combined_call():
+    cache = ArticleCache()
+    model = FakeGeminiModel(latency=LATENCY, json_text=COMBINED)
+    result = _generate(AIService("test-key", model=model, cache=cache), strategy="combined")
+
+    assert model.calls == 1
+    assert result["articles"]["note"]["content_html"] == "<h2>专业笔记</h2><p>Viva Vista</p>"
+    assert result["articles"]["xhs"]["content_html"] == "<p>小红书 Viva Vista ✨</p>"
+    assert result["articles"]["xhs"]["title"] == LISTING["title"]
+    assert result["stats"]["tokens_saved"] > 0
+    # The listing data is sent once instead of once per mode
+    assert model.prompts[0].count("房产数据") == 1
+
+    # Nothing to estimate the per-mode calls from yet
+    assert result["stats"]["sequential_seconds"] is None and result["stats"]["seconds_saved"] is None
+
+    # Each mode is cached under its own single-mode key
+    single = asyncio.run(AIService("test-key", model=model, cache=cache).generate_wechat_article(LISTING, "xhs"))
+    assert single == result["articles"]["xhs"] and model.calls == 1
+
+
+def test_combined_savings_estimate():
+    model = FakeGeminiModel(latency=LATENCY, json_text=COMBINED)
+    service = AIService("test-key", model=model, cache=None)
+    asyncio.run(service.generate_wechat_article(LISTING, "note"))  # one single-mode call measured
+    stats = _generate(service, strategy="combined")["stats"]
+    assert stats["strategy"] == "combined"
+    # Two modes one by one: about twice the measured single call, against one call's wall time
+    assert LATENCY * 2 <= stats["sequential_seconds"] < LATENCY * 3
+    assert LATENCY * 0.5 <= stats["seconds_saved"] < LATENCY * 1.5, stats
+
+
+def test_auto_and_fallback():
+    # Long description: the shared listing data is worth combining
+    model = FakeGeminiModel(latency=0, json_text=COMBINED)
+    assert _generate(AIService("test-key", model=model, cache=None))["stats"]["strategy"] == "combined"
+    # Short listing: not worth it, per-mode calls are faster
+    short = dict(LISTING, description="Bright and airy.")
+    assert _generate(AIService("test-key", model=model, cache=None), data=short)["stats"]["strategy"] == "concurrent"
+
+    # A combined answer missing a mode falls back to a per-mode call for it
+    model = FakeGeminiModel(latency=0, json_text=json.dumps({"note": "<p>only note</p>"}))
+    result = _generate(AIService("test-key", model=model, cache=None), strategy="combined")
+    assert model.calls == 2
+    assert result["articles"]["note"]["content_html"] == "<p>only note</p>"
+    assert result["articles"]["xhs"]["content_html"] == "<h2>Fake article</h2><p>Generated locally.</p>"
+
+
+def test_generate_endpoint_modes():
+    from fastapi.testclient import TestClient
+    from index import app
+
+    scraper = PropertyGuruScraper(
+        cache=None,
+        rate_limiter=HostRateLimiter(rate=100, burst=100),
+        strategy_order=["cloudscraper"],
+        adaptive_order=False,
+    )
+    ai = AIService("test-key", model=FakeGeminiModel(latency=0.1), cache=None)
+    routes = {"/listing/for-sale-viva-vista-500010094": (200, load_fixture("listing_full.html"), "text/html", 0.2)}
+    with shared_services(scraper, ai):
+        with StubServer(routes) as server, TestClient(app) as client:
+            url = server.url("/listing/for-sale-viva-vista-500010094")
+            response = client.post("/api/generate", json={"url": url, "modes": ["note", "xhs"]})
+            bad = client.post("/api/generate", json={"url": url, "modes": ["note", "tweet"]})
+            hits = server.hits
+
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body["articles"]) == {"note", "xhs"}
+    assert body["images"] and all(path.startswith("/api/image?url=") for path in body["proxied_images"])
+    assert len(body["proxied_images"]) == len(body["images"])
+    assert body["stats"]["scrapes_saved"] == 1
+    assert body["stats"]["seconds_saved"] >= 0.2
+    assert hits == 1
+    assert bad.status_code == 400
+
+
+if __name__ == "__main__":
+    try:
+        test_concurrent_modes()
+        test_combined_call()
+        test_combined_savings_estimate()
+        test_auto_and_fallback()
+        test_generate_endpoint_modes()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: multi-mode generation")
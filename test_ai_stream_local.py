@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Streaming generation test with a fake Gemini stream: code fences are cleaned however
+the chunks split, HTML arrives before the whole answer, and the final "complete"
+event matches the non-streamed result. An unknown mode is a 400.
+"""
+import asyncio
+import json
+import sys
+import time
+
+from local_stubs import FakeGeminiModel, StubServer, load_fixture, shared_services
+from ai_service import AIService, FenceStripper, clean_article_html
+from rate_limit import HostRateLimiter
+from scraper import PropertyGuruScraper
+
+LISTING = {
+    "title": "Viva Vista 3 Bedroom Condo for Sale",
+    "price": "SGD 1880000",
+    "address": "3 South Buona Vista Road",
+    "description": "Bright and airy 3 bedroom unit with unblocked views.",
+    "images": [],
+}
+ANSWER = "```html\n<h2>Viva Vista</h2>\n<p>Bright and airy.</p>\n<p>Near the MRT.</p>\n```\nHope this helps!"
+EXPECTED = "<h2>Viva Vista</h2>\n<p>Bright and airy.</p>\n<p>Near the MRT.</p>"
+
+
+def _stripped(chunks):
+    cleaner = FenceStripper()
+    return "".join(cleaner.feed(chunk) for chunk in chunks) + cleaner.finish()
+
+
+def test_fence_split_across_chunks():
+    assert clean_article_html(ANSWER) == EXPECTED
+    # Every way of splitting the answer in two or three pieces, fences included
+    for i in range(len(ANSWER) + 1):
+        assert _stripped([ANSWER[:i], ANSWER[i:]]) == EXPECTED, i
+        for j in range(i, len(ANSWER) + 1, 7):
+            assert _stripped([ANSWER[:i], ANSWER[i:j], ANSWER[j:]]) == EXPECTED, (i, j)
+    # Backticks that turn out not to be a fence are kept
+    assert _stripped(["<p>a `", "`b`", "` c</p>"]) == "<p>a ``b`` c</p>"
+    assert _stripped(["``", "`"]) == clean_article_html("```")
+    assert _stripped([" \n", "<p>x</p>", "  \n"]) == "<p>x</p>"
+
+
+async def _events(service):
+    start = time.perf_counter()
+    events = []
+    async for event, payload in service.generate_wechat_article_stream(LISTING):
+        events.append((time.perf_counter() - start, event, payload))
+    return events
+
+
+def test_stream_events():
+    chunks = ["``", "`ht", "ml\n<h2>Viva Vista</h2>\n<p>Bright", " and airy.</p>\n", "<p>Near the MRT.</p>\n`", "``\nHope this helps!"]
+    model = FakeGeminiModel(text=ANSWER, latency=1.0, chunks=chunks)
+    events = asyncio.run(_events(AIService("test-key", model=model, cache=None)))
+
+    html_chunks = [payload["html"] for _, event, payload in events if event == "chunk"]
+    assert "".join(html_chunks) == EXPECTED
+    assert not any("`" in chunk for chunk in html_chunks)
+    first_chunk = next(t for t, event, _ in events if event == "chunk")
+    assert first_chunk < 0.6, f"first chunk took {first_chunk:.2f}s"
+
+    _, event, complete = events[-1]
+    assert event == "complete"
+    plain = asyncio.run(AIService("test-key", model=FakeGeminiModel(text=ANSWER, latency=0), cache=None).generate_wechat_article(LISTING))
+    assert complete == plain
+
+
+def test_stream_timeout_and_missing_key():
+    events = asyncio.run(_events(AIService("test-key", model=FakeGeminiModel(latency=5), timeout=0.2, cache=None)))
+    assert events[-1][1] == "complete"
+    assert "timed out" in events[-1][2]["content_html"]
+
+    events = asyncio.run(_events(AIService(None, model=FakeGeminiModel(), cache=None)))
+    assert [event for _, event, _ in events] == ["complete"]
+    assert events[0][2]["title"] == "API Key Missing"
+
+
+def test_generate_stream_endpoint():
+    from fastapi.testclient import TestClient
+    from index import app
+
+    scraper = PropertyGuruScraper(
+        cache=None,
+        rate_limiter=HostRateLimiter(rate=100, burst=100),
+        strategy_order=["cloudscraper"],
+        adaptive_order=False,
+    )
+    ai = AIService("test-key", model=FakeGeminiModel(text=ANSWER, latency=0.2), cache=None)
+    routes = {"/listing/for-sale-viva-vista-500010094": (200, load_fixture("listing_full.html"), "text/html")}
+    with shared_services(scraper, ai):
+        with StubServer(routes) as server, TestClient(app) as client:
+            url = server.url("/listing/for-sale-viva-vista-500010094")
+            with client.stream("POST", "/api/generate-stream", json={"url": url}) as response:
+                assert response.status_code == 200
+                assert response.headers["content-type"].startswith("text/event-stream")
+                body = "".join(response.iter_text())
+            plain = client.post("/api/generate", json={"url": url}).json()
+            bad_mode = client.post("/api/generate-stream", json={"url": url, "mode": "tweet"})
+            hits = server.hits
+
+    assert bad_mode.status_code == 400 and hits == 2, "an unknown mode is rejected before scraping"
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    assert events[0][0] == "listing"
+    # /api/generate adds the listing images and timings to the same article
+    assert events[-1] == ("complete", {"title": plain["title"], "content_html": plain["content_html"]})
+    assert "".join(p["html"] for e, p in events if e == "chunk") == plain["content_html"] == EXPECTED
+
+
+if __name__ == "__main__":
+    try:
+        test_fence_split_across_chunks()
+        test_stream_events()
+        test_stream_timeout_and_missing_key()
+        test_generate_stream_endpoint()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: streaming generation")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Generated-article cache test with a fake Gemini model: identical prompts are served
+from the cache (memory, then SQLite after a restart), anything that changes the prompt
+or model misses, force regenerates, and failures are never cached.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+from local_stubs import FakeGeminiModel
+from ai_service import AIService
+from article_cache import ArticleCache
+
+LISTING = {
+    "title": "Viva Vista 3 Bedroom Condo for Sale",
+    "price": "SGD 1880000",
+    "address": "3 South Buona Vista Road",
+    "description": "Bright and airy 3 bedroom unit with unblocked views.",
+    "images": ["https://sg1-cdn.pgimgs.com/listing/500010094/UPHO.1.V800/photo.jpg"],
+}
+
+
+def _generate(service, data=LISTING, mode="note", force=False):
+    return asyncio.run(service.generate_wechat_article(data, mode, force=force))
+
+
+def test_cache_hits_and_misses():
+    cache = ArticleCache()
+    model = FakeGeminiModel(latency=0)
+    service = AIService("test-key", model=model, cache=cache)
+
+    first = _generate(service)
+    assert _generate(service) == first
+    assert model.calls == 1
+
+    # Fields outside the prompt do not matter; prompt fields, mode and model do
+    _generate(service, data=dict(LISTING, images=[]))
+    assert model.calls == 1
+    _generate(service, data=dict(LISTING, price="SGD 1780000"))
+    _generate(service, mode="xhs")
+    _generate(AIService("test-key", model=model, cache=cache, model_name="gemini-2.5-pro"))
+    assert model.calls == 4
+
+    _generate(service, force=True)
+    assert model.calls == 5
+    assert cache.stats()["hits"] == 2
+
+
+def test_failures_are_not_cached():
+    cache = ArticleCache()
+    result = _generate(AIService("test-key", model=FakeGeminiModel(latency=5), timeout=0.1, cache=cache))
+    assert "AI Generation failed" in result["content_html"]
+    result = _generate(AIService(None, model=FakeGeminiModel(latency=0), cache=cache))
+    assert result["title"] == "API Key Missing"
+    assert cache.stats()["stores"] == 0
+
+    model = FakeGeminiModel(latency=0)
+    _generate(AIService("test-key", model=model, cache=cache))
+    assert model.calls == 1
+
+
+def test_stream_uses_cache():
+    cache = ArticleCache()
+    model = FakeGeminiModel(latency=0)
+    service = AIService("test-key", model=model, cache=cache)
+
+    async def events():
+        return [event async for event in service.generate_wechat_article_stream(LISTING)]
+
+    streamed = asyncio.run(events())
+    again = asyncio.run(events())
+    assert model.calls == 1
+    assert again[-1] == streamed[-1] == ("complete", _generate(service))
+    assert again[0] == ("chunk", {"html": streamed[-1][1]["content_html"]})
+
+
+def test_disk_tier_survives_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "articles.db")
+        model = FakeGeminiModel(latency=0)
+        first = _generate(AIService("test-key", model=model, cache=ArticleCache(db_path=db_path)))
+
+        restarted = ArticleCache(db_path=db_path)
+        assert _generate(AIService("test-key", model=model, cache=restarted)) == first
+        assert model.calls == 1
+        assert restarted.stats()["disk_hits"] == 1
+        restarted.disk.close()
+
+
+if __name__ == "__main__":
+    try:
+        test_cache_hits_and_misses()
+        test_failures_are_not_cached()
+        test_stream_uses_cache()
+        test_disk_tier_survives_restart()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: article cache")
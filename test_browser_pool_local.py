@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+BrowserPool test on a fake Playwright: pages are recycled to about:blank and reused,
+a crashed page is replaced, the context is relaunched after max_uses without a
+waiting caller getting a page of the closing context, a failed relaunch reaches
+callers waiting for a page instead of hanging them, and a second process sharing
+the profile gets a copy of it, removed on close.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+from local_stubs import FakePlaywright
+from browser_pool import BrowserPool, fcntl
+
+
+def _pool(size=1, max_uses=50, user_data_dir=None):
+    pool = BrowserPool(size=size, max_uses=max_uses, user_data_dir=user_data_dir, stealth=False)
+    pool._playwright = FakePlaywright()
+    return pool
+
+
+def test_recycle_and_crash():
+    pool = _pool()
+    playwright = pool._playwright
+
+    async def run():
+        async with pool.page() as page:
+            await page.goto("https://example.com/listing")
+        first = page
+        async with pool.page() as page:
+            assert page is first and page.url == "about:blank", "recycled, not replaced"
+            page.crash()
+        async with pool.page() as page:
+            assert page is not first and first.closed, "the crashed page was closed and replaced"
+        await pool.close()
+
+    asyncio.run(run())
+    assert pool.restarts == 0 and len(playwright.contexts) == 1 and playwright.contexts[0].closed
+
+
+def test_relaunch_after_max_uses():
+    pool = _pool(max_uses=2)
+
+    async def run():
+        for _ in range(3):
+            async with pool.page():
+                pass
+
+    asyncio.run(run())
+    contexts = pool._playwright.contexts
+    assert pool.restarts == 1 and len(contexts) == 2 and contexts[0].closed and not contexts[1].closed
+
+
+def test_waiter_during_relaunch_gets_a_fresh_page():
+    pool = _pool(max_uses=1)
+    playwright = pool._playwright
+
+    async def run():
+        holder_inside = asyncio.Event()
+
+        async def holder():
+            async with pool.page():
+                holder_inside.set()
+                await asyncio.sleep(0.05)  # the waiter queues up meanwhile; max_uses is reached here
+
+        async def waiter():
+            await holder_inside.wait()
+            async with pool.page() as page:
+                await page.goto("https://example.com/listing")
+                return page
+
+        return await asyncio.wait_for(asyncio.gather(holder(), waiter(), return_exceptions=True), 2)
+
+    holder_result, page = asyncio.run(run())
+    assert holder_result is None and not isinstance(page, Exception), page
+    assert page.context is playwright.contexts[1] and playwright.contexts[0].closed
+    assert pool.restarts == 2, "max_uses=1: relaunched after each scrape"
+
+
+def test_failed_relaunch_reaches_waiters():
+    pool = _pool()
+    playwright = pool._playwright
+
+    async def run():
+        holder_inside = asyncio.Event()
+
+        async def holder():
+            async with pool.page() as page:
+                holder_inside.set()
+                await asyncio.sleep(0.05)
+                page.fail_goto = True  # recycling fails, so the pool relaunches...
+                playwright.fail_launch = True  # ...and that fails too
+
+        async def waiter():
+            await holder_inside.wait()
+            async with pool.page():
+                pass
+
+        results = await asyncio.wait_for(asyncio.gather(holder(), waiter(), return_exceptions=True), 2)
+        playwright.fail_launch = False
+        async with pool.page() as page:  # the next caller launches again
+            assert page.url == "about:blank"
+        return results
+
+    holder_result, waiter_result = asyncio.run(run())
+    assert holder_result is None, "the scrape that finished is not failed by the relaunch"
+    assert isinstance(waiter_result, RuntimeError) and "launch failed" in str(waiter_result), waiter_result
+    assert len(playwright.contexts) == 2
+
+
+def test_shared_profile_is_copied():
+    if fcntl is None:
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        profile = os.path.join(tmp, "profile")
+        os.makedirs(os.path.join(profile, "Default"))
+        for name in ("Default/Cookies", "SingletonLock"):
+            with open(os.path.join(profile, name), "w") as f:
+                f.write("x")
+        with open(profile + ".lock", "w") as other_worker:
+            fcntl.flock(other_worker, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            pool = _pool(user_data_dir=profile)
+            path = pool._claim_user_data_dir()
+        assert path == f"{profile}-{os.getpid()}"
+        assert os.path.exists(os.path.join(path, "Default", "Cookies")), "cookies come along"
+        assert not os.path.exists(os.path.join(path, "SingletonLock"))
+        asyncio.run(pool.close())
+        assert not os.path.exists(path), "the copy is removed on close"
+        assert os.path.exists(os.path.join(profile, "Default", "Cookies"))
+
+
+if __name__ == "__main__":
+    try:
+        test_recycle_and_crash()
+        test_relaunch_after_max_uses()
+        test_waiter_during_relaunch_gets_a_fresh_page()
+        test_failed_relaunch_reaches_waiters()
+        test_shared_profile_is_copied()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: browser pool")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Rate limiter and circuit breaker test on a fake clock: the per-host rate halves on
+blocks and recovers on successes, a strategy that keeps getting blocked is skipped
+for a cool-down and then probed once, and traffic goes straight to the strategy
+that works. The scraper part also checks that 403s count as blocks.
+"""
+import asyncio
+import sys
+
+from local_stubs import FakeClock, StubServer, load_fixture
+from listing_parser import blocked_listing
+from rate_limit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, HostRateLimiter
+from scraper import PropertyGuruScraper, StrategyStats
+
+URL = "https://www.propertyguru.com.sg/listing/for-sale-viva-vista-500010094"
+LISTING = {"title": "Viva Vista", "price": "SGD 1880000", "address": "", "description": "", "images": []}
+
+
+def test_rate_limiter_adapts():
+    clock = FakeClock()
+    limiter = HostRateLimiter(rate=2, burst=2, clock=clock, sleep=clock.sleep, min_rate=0.25)
+
+    async def take(n):
+        start = clock()
+        for _ in range(n):
+            await limiter.acquire(URL)
+        return clock() - start
+
+    assert asyncio.run(take(2)) == 0  # the burst
+    assert asyncio.run(take(2)) == 1.0  # then 2 per second
+    for _ in range(5):
+        limiter.slow_down(URL)
+    assert limiter.bucket("www.propertyguru.com.sg").rate == 0.25
+    assert asyncio.run(take(1)) == 4.0
+    for _ in range(20):
+        limiter.speed_up(URL)
+    assert limiter.snapshot()["hosts"]["www.propertyguru.com.sg"]["rate"] == 2
+
+
+def test_breaker_trips_cools_down_and_probes():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=3, cooldown=60, max_cooldown=200, clock=clock)
+
+    def state():
+        return breaker.snapshot()["hosts"]["www.propertyguru.com.sg"]["cloudscraper"]
+
+    for _ in range(2):
+        breaker.record_block(URL, "cloudscraper")
+    assert breaker.allow(URL, "cloudscraper")
+    breaker.record_block(URL, "cloudscraper")
+    assert state()["state"] == OPEN and state()["retry_in"] == 60
+    assert not breaker.allow(URL, "cloudscraper")
+    assert breaker.allow(URL, "playwright"), "other strategies are unaffected"
+    assert breaker.allow("https://other.example/x", "cloudscraper"), "other hosts are unaffected"
+
+    clock.advance(60)
+    assert breaker.allow(URL, "cloudscraper"), "one probe after the cool-down"
+    assert state()["state"] == HALF_OPEN
+    assert not breaker.allow(URL, "cloudscraper"), "only one probe at a time"
+    breaker.record_block(URL, "cloudscraper")
+    assert state()["state"] == OPEN and state()["retry_in"] == 120, "a blocked probe doubles the cool-down"
+
+    clock.advance(120)
+    assert breaker.allow(URL, "cloudscraper")
+    breaker.release(URL, "cloudscraper")  # probe cancelled: the slot is free again
+    assert breaker.allow(URL, "cloudscraper")
+    breaker.record_success(URL, "cloudscraper")
+    assert state()["state"] == CLOSED and state()["consecutive_blocks"] == 0
+    assert breaker.snapshot()["trips"] == 2
+
+
+class FakeStrategyScraper(PropertyGuruScraper):
+    """Strategy "flaky" is always blocked, "steady" always works."""
+
+    def __init__(self, clock):
+        super().__init__(hedge_budget=None, strategy_order=["flaky", "steady"], adaptive_order=False, cache=None,
+                         rate_limiter=HostRateLimiter(rate=100, burst=100, clock=clock, sleep=clock.sleep),
+                         breaker=CircuitBreaker(threshold=3, cooldown=60, clock=clock))
+        self.stats = StrategyStats()
+        self.calls = []
+
+    async def _attempt(self, name, url, on_core=None):
+        self.calls.append(name)
+        return blocked_listing() if name == "flaky" else dict(LISTING)
+
+
+def test_scraper_skips_tripped_strategy():
+    clock = FakeClock()
+    scraper = FakeStrategyScraper(clock)
+
+    async def scrape_n(n):
+        return [await scraper.scrape(URL) for _ in range(n)]
+
+    results = asyncio.run(scrape_n(3))
+    assert all(r["title"] == "Viva Vista" for r in results)
+    assert scraper.calls == ["flaky", "steady"] * 3
+
+    scraper.calls.clear()
+    meta = asyncio.run(scrape_n(2))[-1]["scrape_meta"]
+    assert scraper.calls == ["steady", "steady"], "the tripped strategy is not tried"
+    assert meta["attempted"] == ["steady"] and meta["skipped"] == ["flaky"]
+    assert scraper.rate_limiter.bucket("www.propertyguru.com.sg").rate < 100, "blocks slowed the host down"
+
+    clock.advance(61)
+    scraper.calls.clear()
+    asyncio.run(scrape_n(2))
+    assert scraper.calls == ["flaky", "steady", "steady"], "one probe after the cool-down"
+
+
+def test_blocked_status_codes_trip_the_breaker():
+    routes = {"/listing/blocked": (403, load_fixture("listing_full.html"), "text/html")}
+    clock = FakeClock()
+    scraper = PropertyGuruScraper(hedge_budget=None, strategy_order=["cloudscraper"], adaptive_order=False, cache=None,
+                                  rate_limiter=None, breaker=CircuitBreaker(threshold=2, cooldown=60, clock=clock))
+    with StubServer(routes) as server:
+        url = server.url("/listing/blocked")
+
+        async def scrape_n(n):
+            return [await scraper.scrape(url) for _ in range(n)]
+
+        results = asyncio.run(scrape_n(3))
+        hits = server.hits
+
+    assert hits == 2, "the third scrape should fail fast without a request"
+    assert all(r["title"] == "Error: Scraper blocked" for r in results)
+    assert results[-1]["scrape_meta"]["circuit_open"] and results[-1]["scrape_meta"]["retry_in"] == 60
+
+
+if __name__ == "__main__":
+    try:
+        test_rate_limiter_adapts()
+        test_breaker_trips_cools_down_and_probes()
+        test_scraper_skips_tripped_strategy()
+        test_blocked_status_codes_trip_the_breaker()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: rate limiter and circuit breaker")
@@ -81,11 +81,13 @@ def run_e2e_tests(base_url):
 
     time.sleep(1)
 
-    # Test 4: Generate endpoint (placeholder)
+    # Test 4: Generate endpoint is wired (an empty URL is rejected before any scraping)
     results.append(test_endpoint(
         f"{base_url}/api/generate",
         "Generate Endpoint",
-        expected_status=200
+        expected_status=400,
+        method="POST",
+        json_data={"url": ""}
     ))
 
     # Print summary
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Image cache/proxy test against a local stub image server: a listing's photos are
+pre-fetched concurrently, the disk cache stays under its byte budget (LRU), the proxy
+endpoint answers with ETag/304 and Range/206, other hosts are refused, WebP variants
+are downscaled (skipped without Pillow), posters load photos from the cache and
+every other request a poster page makes is aborted.
+"""
+import asyncio
+import base64
+import io
+import sys
+import tempfile
+import time
+
+from local_stubs import PIXEL_PNG_B64, FakeBrowserPool, StubServer
+import images as images_module
+from images import DiskImageCache, ImageService, image_key, proxy_url, webp_available
+from poster import PosterRenderer
+
+PHOTO_LATENCY = 0.2
+
+
+def _photo(width=1600, height=1200) -> bytes:
+    """A JPEG if Pillow is around, else a 1x1 PNG."""
+    if not webp_available():
+        return base64.b64decode(PIXEL_PNG_B64)
+    from PIL import Image
+
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 120, 40)).save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def _image_server(count=6):
+    photo = _photo()
+    content_type = "image/jpeg" if webp_available() else "image/png"
+    routes = {f"/photo{i}.jpg": (200, photo, content_type, PHOTO_LATENCY) for i in range(count)}
+    routes["/page.html"] = (200, "<html></html>", "text/html")
+    routes["/missing.jpg"] = (404, "Not Found", "text/plain")
+    return StubServer(routes), photo
+
+
+def _service(max_bytes=64 * 1024 * 1024):
+    return ImageService(DiskImageCache(tempfile.mkdtemp(prefix="pg_images_"), max_bytes), allowed_hosts=("127.0.0.1",))
+
+
+def test_prefetch_is_concurrent_and_cached():
+    server, photo = _image_server(count=6)
+    service = _service()
+    with server:
+        urls = [server.url(f"/photo{i}.jpg") for i in range(6)]
+
+        async def run():
+            start = time.perf_counter()
+            report = await service.prefetch(urls + urls[:2])  # duplicates are fetched once
+            elapsed = time.perf_counter() - start
+            again = await service.prefetch(urls)
+            return report, elapsed, again
+
+        report, elapsed, again = asyncio.run(run())
+        hits = server.hits
+
+    assert report["images"] == 6 and not report["failed"], report
+    assert elapsed < PHOTO_LATENCY * 6 / 2, f"prefetch took {elapsed:.2f}s, not concurrent"
+    assert not again["failed"] and hits == 6, "second prefetch should come from disk"
+    stats = service.stats()
+    assert stats["misses"] == 6 and stats["hits"] == 6
+    assert stats["bytes"] == 6 * len(photo)
+
+
+def test_lru_eviction_by_bytes():
+    root = tempfile.mkdtemp(prefix="pg_images_")
+    cache = DiskImageCache(root, max_bytes=2500)
+    for name in ("a", "b", "c"):
+        cache.put(name, b"x" * 1000, "image/jpeg")
+    assert cache.get("a") is None, "oldest entry should be evicted over budget"
+    cache.get("b")  # b is now more recent than c
+    cache.put("d", b"x" * 1000, "image/jpeg")
+    assert cache.get("c") is None and cache.get("b") is not None and cache.get("d") is not None
+    assert cache.total_bytes <= 2500 and cache.evictions == 2
+
+    reopened = DiskImageCache(root, max_bytes=2500)
+    assert len(reopened) == 2 and reopened.total_bytes == 2000
+
+
+def test_proxy_endpoint():
+    from fastapi.testclient import TestClient
+    from index import app
+
+    server, photo = _image_server(count=1)
+    images_module._shared_service = _service()
+    try:
+        with server, TestClient(app) as client:
+            url = server.url("/photo0.jpg")
+            first = client.get(proxy_url(url))
+            etag = first.headers["etag"]
+            not_modified = client.get(proxy_url(url), headers={"If-None-Match": etag})
+            partial = client.get(proxy_url(url), headers={"Range": "bytes=0-99"})
+            other_host = client.get(proxy_url("http://example.com/photo.jpg"))
+            not_image = client.get(proxy_url(server.url("/page.html")))
+            missing = client.get(proxy_url(server.url("/missing.jpg")))
+            bad_format = client.get(proxy_url(url) + "&format=gif")
+            webp = client.get(proxy_url(url, "webp"))
+            hits = server.hits
+    finally:
+        images_module._shared_service = None
+
+    assert first.status_code == 200 and first.content == photo
+    assert "immutable" in first.headers["cache-control"]
+    assert etag == f'"{image_key(url)}"'
+    assert not_modified.status_code == 304
+    assert partial.status_code == 206 and partial.content == photo[:100]
+    assert other_host.status_code == 403
+    assert not_image.status_code == 502 and missing.status_code == 502
+    assert bad_format.status_code == 400
+    assert webp.status_code == 200
+    assert hits == 3, "the photo should be fetched from the origin once"
+    if webp_available():
+        from PIL import Image
+
+        assert webp.headers["content-type"] == "image/webp"
+        assert len(webp.content) < len(photo)
+        assert Image.open(io.BytesIO(webp.content)).width == images_module.WEBP_MAX_WIDTH
+    else:
+        print("Pillow not installed: format=webp served the original")
+        assert webp.content == photo
+
+
+def test_poster_loads_photos_from_cache():
+    server, photo = _image_server(count=2)
+    service = _service()
+    pool = FakeBrowserPool(latency=0)
+    renderer = PosterRenderer(pool, images=service)
+    with server:
+        html = "".join(f'<p><img src="{server.url(f"/photo{i}.jpg")}"></p>' for i in range(2))
+        html += '<img src="https://example.com/other.jpg">'
+
+        async def run():
+            await service.prefetch([server.url(f"/photo{i}.jpg") for i in range(2)])
+            await renderer.render("k", html, "t")
+
+        asyncio.run(run())
+        hits = server.hits
+
+    assert [outcome for _, outcome in pool.image_requests] == ["fulfilled", "fulfilled", "aborted"]
+    assert renderer.stats()["cached_images"] == 2
+    assert hits == 2, "the render should not refetch prefetched photos"
+
+
+def test_poster_blocks_other_requests():
+    pool = FakeBrowserPool(latency=0)
+    renderer = PosterRenderer(pool, images=_service())
+    html = ('<img src="data:image/png;base64,iVBORw0KGgo=">'
+            '<iframe src="http://localhost:8000/api/scrape-status"></iframe>'
+            '<img src="http://169.254.169.254/latest/meta-data/">')
+    asyncio.run(renderer.render("k", html, "t"))
+    assert pool.image_requests == [
+        ("http://localhost:8000/api/scrape-status", "aborted"),
+        ("http://169.254.169.254/latest/meta-data/", "aborted"),
+    ]
+    assert renderer.stats()["blocked_requests"] == 2
+
+
+if __name__ == "__main__":
+    try:
+        test_prefetch_is_concurrent_and_cached()
+        test_lru_eviction_by_bytes()
+        test_proxy_endpoint()
+        test_poster_loads_photos_from_cache()
+        test_poster_blocks_other_requests()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: image cache and proxy")
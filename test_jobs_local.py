@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Background job test: queued jobs run by priority on a small worker pool, failed
+attempts are retried with backoff (but not permanent failures), a generation the
+model failed is retried, SQLite-backed jobs survive a restart, and /api/generate with "background" hands back a job that can be
+polled or followed as server-sent events to the same result.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from local_stubs import FakeGeminiModel, StubServer, load_fixture, no_image_prefetch, shared_services
+import jobs as jobs_module
+from ai_service import AIService
+from jobs import DONE, FAILED, QUEUED, JobFailed, JobManager, MemoryJobQueue, SQLiteJobQueue, new_job
+from pipeline import run_generate_job
+from rate_limit import HostRateLimiter
+from scraper import PropertyGuruScraper
+
+
+def test_priority_and_retries():
+    order = []
+    attempts = {}
+
+    async def handler(payload):
+        name = payload["name"]
+        attempts[name] = attempts.get(name, 0) + 1
+        order.append(name)
+        await asyncio.sleep(0.01)
+        if name == "flaky" and attempts[name] < 3:
+            raise RuntimeError("blocked")
+        if name == "broken":
+            raise JobFailed("not a listing")
+        if name == "hopeless":
+            raise RuntimeError("still blocked")
+        return {"name": name}
+
+    async def run():
+        manager = JobManager(MemoryJobQueue(), handler, workers=1, max_attempts=3, retry_delay=0.05)
+        # Submitted together, so the single worker picks them by priority
+        jobs = [manager.submit({"name": name}, priority=priority) for name, priority in
+                [("low", 0), ("flaky", 5), ("broken", 1), ("high", 10), ("hopeless", 0)]]
+        results = {job["payload"]["name"]: await manager.wait(job["id"], timeout=5) for job in jobs}
+        return manager, results
+
+    manager, results = asyncio.run(run())
+    assert order[:3] == ["high", "flaky", "broken"], order
+    assert results["flaky"]["status"] == DONE and results["flaky"]["attempts"] == 3
+    assert results["broken"]["status"] == FAILED and results["broken"]["attempts"] == 1
+    assert results["hopeless"]["status"] == FAILED and results["hopeless"]["attempts"] == 3
+    assert results["high"]["result"] == {"name": "high"}
+    stats = manager.stats()
+    assert stats["completed"] == 3 and stats["failed"] == 2 and stats["retries"] == 4
+    assert stats["depth"] == 0 and stats["wait_seconds"]["count"] == 5
+
+
+def test_workers_run_concurrently():
+    async def handler(payload):
+        await asyncio.sleep(0.2)
+        return {}
+
+    async def run():
+        manager = JobManager(MemoryJobQueue(), handler, workers=4)
+        start = time.perf_counter()
+        jobs = [manager.submit({}) for _ in range(8)]
+        for job in jobs:
+            await manager.wait(job["id"], timeout=5)
+        return time.perf_counter() - start, manager.stats()
+
+    elapsed, stats = asyncio.run(run())
+    assert stats["completed"] == 8
+    assert elapsed < 0.2 * 8 / 2, f"8 jobs on 4 workers took {elapsed:.2f}s"
+    assert stats["wait_seconds"]["max"] >= 0.15, "the second wave should have waited in the queue"
+
+
+def test_sqlite_queue_survives_restart():
+    path = os.path.join(tempfile.mkdtemp(prefix="pg_jobs_"), "jobs.db")
+    queue = SQLiteJobQueue(path)
+    orphan = new_job({"name": "orphan"}, priority=1, now=time.time() - 3600)
+    waiting = new_job({"name": "waiting"})
+    queue.put(orphan)
+    queue.put(waiting)
+    # A worker took the orphan an hour ago and its process died
+    assert queue.claim(now=time.time() - 3600)["id"] == orphan["id"]
+    queue.close()
+
+    async def run():
+        done = []
+
+        async def handler(payload):
+            done.append(payload["name"])
+            return {}
+
+        manager = JobManager(SQLiteJobQueue(path), handler, workers=1, stale_after=600)
+        assert manager.get(orphan["id"])["status"] == QUEUED  # requeued as the workers start
+        await manager.wait(waiting["id"], timeout=5)
+        await manager.wait(orphan["id"], timeout=5)
+        return manager, done
+
+    manager, done = asyncio.run(run())
+    assert done == ["orphan", "waiting"], done
+    assert manager.counters["recovered"] == 1
+    assert manager.queue.counts()[DONE] == 2
+
+
+class FailingGeminiModel(FakeGeminiModel):
+    """Raises on the first `failures` calls, like a Gemini outage."""
+
+    def __init__(self, failures, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+
+    async def generate_content_async(self, prompt, **kwargs):
+        if self.calls < self.failures:
+            self.calls += 1
+            raise RuntimeError("503 The model is overloaded")
+        return await super().generate_content_async(prompt, **kwargs)
+
+
+def test_failed_generation_is_retried():
+    scraper = PropertyGuruScraper(
+        cache=None,
+        rate_limiter=HostRateLimiter(rate=100, burst=100),
+        strategy_order=["cloudscraper"],
+        adaptive_order=False,
+    )
+    routes = {"/listing/for-sale-viva-vista-500010094": (200, load_fixture("listing_full.html"), "text/html")}
+
+    async def run(payload):
+        manager = JobManager(MemoryJobQueue(), run_generate_job, workers=1, max_attempts=2, retry_delay=0.05)
+        job = manager.submit(payload)
+        return await manager.wait(job["id"], timeout=10)
+
+    with no_image_prefetch(), StubServer(routes) as server:
+        url = server.url("/listing/for-sale-viva-vista-500010094")
+        with shared_services(scraper, AIService("test-key", model=FailingGeminiModel(1, latency=0.01), cache=None)):
+            recovered = asyncio.run(run({"url": url}))
+        with shared_services(scraper, AIService("test-key", model=FailingGeminiModel(100, latency=0.01), cache=None)):
+            down = asyncio.run(run({"url": url, "modes": ["note", "xhs"]}))
+
+    assert recovered["status"] == DONE and recovered["attempts"] == 2, recovered
+    assert recovered["result"]["content_html"] == "<h2>Fake article</h2><p>Generated locally.</p>"
+    assert down["status"] == FAILED and down["attempts"] == 2, down
+    assert "Generation failed" in down["error"], down["error"]
+
+
+def test_background_generate_endpoint():
+    from fastapi.testclient import TestClient
+    from index import app
+
+    scraper = PropertyGuruScraper(
+        cache=None,
+        rate_limiter=HostRateLimiter(rate=100, burst=100),
+        strategy_order=["cloudscraper"],
+        adaptive_order=False,
+    )
+    ai = AIService("test-key", model=FakeGeminiModel(latency=0.2), cache=None)
+    jobs_module._shared_manager = JobManager(MemoryJobQueue(), run_generate_job, workers=2)
+    routes = {"/listing/for-sale-viva-vista-500010094": (200, load_fixture("listing_full.html"), "text/html", 0.2)}
+    try:
+        with shared_services(scraper, ai), no_image_prefetch(), StubServer(routes) as server, TestClient(app) as client:
+            url = server.url("/listing/for-sale-viva-vista-500010094")
+            start = time.perf_counter()
+            queued = client.post("/api/generate", json={"url": url, "background": True})
+            accepted_in = time.perf_counter() - start
+            job_id = queued.json()["job_id"]
+            polled = client.get(f"/api/jobs/{job_id}", params={"wait": 10}).json()
+
+            second = client.post("/api/generate", json={"url": url, "modes": ["note", "xhs"], "background": True}).json()
+            with client.stream("GET", second["events_url"]) as stream:
+                events = [line[len("event: "):] for line in stream.iter_lines() if line.startswith("event: ")]
+            finished = client.get(second["status_url"]).json()
+
+            missing = client.get("/api/jobs/nope")
+            invalid = client.post("/api/generate", json={"url": url, "modes": ["tweet"], "background": True})
+            stats = client.get("/api/jobs").json()
+    finally:
+        jobs_module._shared_manager = None
+
+    assert queued.status_code == 202
+    assert accepted_in < 0.2, f"queueing took {accepted_in:.2f}s"
+    assert polled["status"] == DONE
+    assert polled["result"]["title"] and polled["result"]["content_html"]
+    assert events[0] == "status" and events[-1] == "complete", events
+    assert set(finished["result"]["articles"]) == {"note", "xhs"}
+    assert missing.status_code == 404
+    assert invalid.status_code == 400
+    assert stats["completed"] == 2 and stats["depth"] == 0
+
+
+if __name__ == "__main__":
+    try:
+        test_priority_and_retries()
+        test_workers_run_concurrently()
+        test_sqlite_queue_survives_restart()
+        test_failed_generation_is_retried()
+        test_background_generate_endpoint()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: background jobs")
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Listing cache test: listing URLs normalise to one key per host and listing ID
+(slug or bare ID, tracking params dropped), while other pages keep their path.
+On a fake clock, entries are fresh, then served stale while one background refresh
+runs, then expire; concurrent misses share one fetch, even when a caller gives up;
+the SQLite file carries entries across instances, and blocked or failed scrapes
+are never stored.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+from local_stubs import FakeClock
+from cache import LRUCache, SQLiteCache
+from listing_cache import ListingCache, normalize_listing_url
+from scraper import listing_cache as shared_cache
+
+SG = "https://www.propertyguru.com.sg/listing/for-sale-viva-vista-500010094"
+
+
+def test_normalize_listing_url():
+    key = normalize_listing_url(SG)
+    for same in (
+        SG + "/",
+        SG + "?utm_source=wechat&fbclid=abc",
+        "http://propertyguru.com.sg/listing/for-sale-viva-vista-500010094",
+        "https://www.propertyguru.com.sg/listing/500010094",
+        "https://www.propertyguru.com.sg/listing/for-rent-renamed-slug-500010094",
+        "  https://WWW.PropertyGuru.com.sg/listing/500010094/  ",
+    ):
+        assert normalize_listing_url(same) == key, same
+    assert key == "propertyguru.com.sg/listing/500010094"
+
+    my = "https://www.propertyguru.com.my/property-listing/for-sale-residensi-500010094"
+    assert normalize_listing_url(my) == "propertyguru.com.my/listing/500010094", "the host is part of the key"
+    # Not a listing path: the trailing number is not an ID
+    assert normalize_listing_url("https://example.com/blog/post-500010094") == "example.com/blog/post-500010094"
+    assert normalize_listing_url("https://example.com/news/x-500010094") != \
+        normalize_listing_url("https://example.com/blog/post-500010094")
+    assert normalize_listing_url("https://example.com/search?b=2&a=1&utm_medium=x") == "example.com/search?a=1&b=2"
+
+
+class CountingFetch:
+    """fetch() for get_or_fetch: returns a listing per call, after `latency` seconds."""
+
+    def __init__(self, latency=0.0, data=None):
+        self.latency = latency
+        self.data = data
+        self.calls = 0
+
+    async def __call__(self, url):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return dict(self.data or {"title": f"Viva Vista #{self.calls}", "price": "SGD 1880000"},
+                    scrape_meta={"strategy": "cloudscraper"})
+
+
+def test_lru_cache():
+    clock = FakeClock()
+    cache = LRUCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == (1, clock())
+    cache.set("c", 3)  # evicts b, the least recently used
+    assert cache.get("b") is None and cache.get("a")[0] == 1 and len(cache) == 2
+    clock.advance(11)
+    assert cache.get("a") is None, "past its ttl"
+
+
+def test_fresh_stale_expired():
+    clock = FakeClock()
+    cache = ListingCache(fresh_ttl=10, stale_ttl=100, clock=clock)
+    fetch = CountingFetch()
+
+    async def run():
+        first = await cache.get_or_fetch(SG, fetch)
+        clock.advance(5)
+        fresh = await cache.get_or_fetch(SG + "?utm_source=wechat", fetch)
+        clock.advance(10)
+        stale = await cache.get_or_fetch(SG, fetch)
+        again = await cache.get_or_fetch(SG, fetch)  # the refresh is still in flight: not started twice
+        await asyncio.gather(*cache._background)
+        refreshed = await cache.get_or_fetch(SG, fetch)
+        clock.advance(101)
+        expired = await cache.get_or_fetch(SG, fetch)
+        return first, fresh, stale, again, refreshed, expired
+
+    first, fresh, stale, again, refreshed, expired = asyncio.run(run())
+    assert first["scrape_meta"]["strategy"] == "cloudscraper"
+    assert fresh["title"] == "Viva Vista #1" and fresh["scrape_meta"] == {"strategy": "cache", "stale": False,
+                                                                         "age_seconds": 5.0}
+    assert stale["title"] == again["title"] == "Viva Vista #1" and stale["scrape_meta"]["stale"]
+    assert refreshed["title"] == "Viva Vista #2" and not refreshed["scrape_meta"]["stale"]
+    assert expired["title"] == "Viva Vista #3" and expired["scrape_meta"]["strategy"] == "cloudscraper"
+    assert fetch.calls == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["stale_hits"], stats["misses"], stats["refreshes"]) == (2, 2, 2, 1), stats
+
+
+def test_single_flight_with_cancelled_waiter():
+    cache = ListingCache()
+    fetch = CountingFetch(latency=0.1)
+
+    async def run():
+        callers = [asyncio.create_task(cache.get_or_fetch(SG, fetch)) for _ in range(5)]
+        await asyncio.sleep(0.02)
+        callers[0].cancel()  # this client disconnected
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        return results
+
+    results = asyncio.run(run())
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert all(r["title"] == "Viva Vista #1" for r in results[1:])
+    assert fetch.calls == 1 and cache.stats()["coalesced"] == 4
+    assert cache.stats()["entries"] == 1, "the shared fetch finished and was stored"
+
+
+def test_sqlite_survives_restart():
+    clock = FakeClock()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "listings.db")
+        first = ListingCache(db_path=path, clock=clock)
+        asyncio.run(first.get_or_fetch(SG, CountingFetch()))
+        first.disk.close()
+
+        clock.advance(30)
+        second = ListingCache(db_path=path, clock=clock)
+        fetch = CountingFetch()
+        data = asyncio.run(second.get_or_fetch("https://www.propertyguru.com.sg/listing/500010094", fetch))
+        assert fetch.calls == 0 and data["title"] == "Viva Vista #1"
+        assert data["scrape_meta"]["age_seconds"] == 30.0, "stored_at comes back from the file"
+        assert second.stats()["entries"] == 1, "and is copied into memory"
+
+        disk = SQLiteCache(path, table="listings", ttl=60, clock=clock)
+        clock.advance(31)
+        assert disk.get(normalize_listing_url(SG)) is None, "past the stale ttl"
+        second.disk.close()
+        disk.close()
+
+
+def test_failures_are_not_cached():
+    cache = ListingCache(cacheable=shared_cache.cacheable)
+    results = (
+        {"title": "[BLOCKED] Bot Protection Detected", "price": "", "address": "", "description": "", "images": []},
+        {"title": "Error: Scraper blocked", "price": "", "address": "", "description": "", "images": []},
+        {"title": "No Title", "price": "", "address": "", "description": "", "images": []},
+    )
+    for i, result in enumerate(results):
+        url = f"https://www.propertyguru.com.sg/listing/{500010090 + i}"
+        fetch = CountingFetch(data=result)
+        asyncio.run(cache.get_or_fetch(url, fetch))
+        asyncio.run(cache.get_or_fetch(url, fetch))
+        assert fetch.calls == 2, result["title"]
+    assert cache.stats()["stores"] == 0 and cache.stats()["entries"] == 0
+
+
+if __name__ == "__main__":
+    try:
+        test_normalize_listing_url()
+        test_lru_cache()
+        test_fresh_stale_expired()
+        test_single_flight_with_cancelled_waiter()
+        test_sqlite_survives_restart()
+        test_failures_are_not_cached()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: listing cache")
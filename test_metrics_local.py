@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Metrics test: a generate request through a stub listing server and the fake Gemini
+model leaves per-strategy attempt, parse, LLM and cache series in /api/metrics (in
+Prometheus text format), and spans are printed as JSON lines when enabled.
+"""
+import contextlib
+import io
+import json
+import sys
+
+from local_stubs import FakeGeminiModel, StubServer, load_fixture, no_image_prefetch, shared_services
+import ai_service as ai_module
+from ai_service import AIService
+from article_cache import ArticleCache
+from metrics import Metrics, metrics
+from rate_limit import HostRateLimiter
+from scraper import PropertyGuruScraper
+
+
+def _samples(text: str) -> dict:
+    """{'name{labels}': value} of a Prometheus text page."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            series, value = line.rsplit(" ", 1)
+            samples[series] = float(value)
+    return samples
+
+
+def test_histograms_and_format():
+    m = Metrics(prefix="t")
+    for seconds in (0.003, 0.02, 0.02, 0.7):
+        m.observe("stage_seconds", seconds, stage='say "hi"')
+    m.inc("tokens", 120, kind="prompt")
+    m.inc("tokens", 30, kind="prompt")
+    m.register_collector("pool", lambda: {"size": 2, "label": "ignored"})
+    samples = _samples(m.render())
+
+    assert samples['t_stage_seconds_bucket{stage="say \\"hi\\"",le="0.005"}'] == 1
+    assert samples['t_stage_seconds_bucket{stage="say \\"hi\\"",le="0.025"}'] == 3
+    assert samples['t_stage_seconds_bucket{stage="say \\"hi\\"",le="+Inf"}'] == 4
+    assert samples['t_stage_seconds_count{stage="say \\"hi\\""}'] == 4
+    assert samples['t_tokens_total{kind="prompt"}'] == 150
+    assert samples['t_pool{stat="size"}'] == 2 and not any("label" in s for s in samples)
+    assert m.histogram("stage_seconds", stage='say "hi"').quantile(0.5) == 0.025
+
+
+def test_json_span_logs():
+    m = Metrics(json_logs=True)
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        with m.span("parse", strategy="cloudscraper") as span:
+            span["bytes"] = 1234
+        try:
+            with m.span("llm"):
+                raise ValueError("boom")
+        except ValueError:
+            pass
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert lines[0]["event"] == "parse" and lines[0]["bytes"] == 1234 and lines[0]["outcome"] == "ok"
+    assert lines[0]["strategy"] == "cloudscraper" and lines[0]["seconds"] >= 0
+    assert lines[1]["event"] == "llm" and lines[1]["outcome"] == "error"
+    assert m.histogram("llm_seconds", outcome="error").count == 1
+
+
+def test_metrics_endpoint_after_generate():
+    from fastapi.testclient import TestClient
+    from index import app
+
+    metrics.reset()
+    scraper = PropertyGuruScraper(
+        cache=None,
+        rate_limiter=HostRateLimiter(rate=100, burst=100),
+        strategy_order=["cloudscraper"],
+        adaptive_order=False,
+    )
+    ai = AIService("test-key", model=FakeGeminiModel(latency=0.05), cache=ArticleCache())
+    routes = {"/listing/for-sale-viva-vista-500010094": (200, load_fixture("listing_full.html"), "text/html")}
+    with shared_services(scraper, ai):
+        with no_image_prefetch(), StubServer(routes) as server, TestClient(app) as client:
+            url = server.url("/listing/for-sale-viva-vista-500010094")
+            for _ in range(2):  # the second article comes from the article cache
+                assert client.post("/api/generate", json={"url": url}).status_code == 200
+            response = client.get("/api/metrics")
+
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/plain")
+    samples = _samples(response.text)
+    model = ai_module.MODEL_NAME
+    assert samples['pg_scrape_attempt_seconds_count{outcome="ok",strategy="cloudscraper"}'] == 2
+    assert samples['pg_scrape_seconds_count{outcome="ok",strategy="cloudscraper"}'] == 2
+    assert samples['pg_parse_seconds_count{outcome="ok"}'] == 2
+    assert samples[f'pg_llm_seconds_count{{call="generate",model="{model}",outcome="ok"}}'] == 1
+    assert samples[f'pg_llm_tokens_total{{kind="prompt",model="{model}"}}'] > 0
+    assert samples[f'pg_llm_tokens_total{{kind="output",model="{model}"}}'] > 0
+    assert samples['pg_cache_lookups_total{cache="article",result="hit"}'] >= 1
+    assert 'pg_session_pool{stat="created"}' in samples
+
+
+if __name__ == "__main__":
+    try:
+        test_histograms_and_format()
+        test_json_span_logs()
+        test_metrics_endpoint_after_generate()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: metrics")
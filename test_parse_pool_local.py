@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Parse pool test: worker processes give the same result as parse_html for every
+fixture page (as bytes or text), a scrape through the pool matches an in-process
+one (including the early core fields), a pool whose worker died is replaced while
+that page is parsed in a thread, and the app starts the workers when it starts.
+"""
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from local_stubs import StubServer, corpus, load_fixture, make_large_listing
+from listing_parser import parse_html
+from parse_pool import ParsePool, parse_pool_from_env
+from rate_limit import HostRateLimiter
+from scraper import PropertyGuruScraper
+
+
+def test_pool_matches_in_process():
+    pages = corpus()
+    pages["large"] = make_large_listing("listing_full.html")
+    pool = ParsePool(2)
+    try:
+        pool.warm()
+
+        async def parse_all():
+            return await asyncio.gather(*(pool.parse(html.encode("utf-8"), "utf-8") for html in pages.values()))
+
+        results = asyncio.run(parse_all())
+        from_text = asyncio.run(pool.parse(pages["large"]))  # browser content arrives as str
+    finally:
+        pool.shutdown()
+    for (name, html), data in zip(pages.items(), results):
+        assert data == parse_html(html), name
+    assert from_text == results[-1]
+    assert pool.stats()["parses"] == len(pages) + 1
+
+
+def test_scrape_through_pool():
+    routes = {"/listing/for-sale-viva-vista-500010094": (200, load_fixture("listing_full.html"), "text/html; charset=utf-8")}
+    pool = ParsePool(1)
+
+    def scraper(parse_pool):
+        return PropertyGuruScraper(hedge_budget=None, strategy_order=["cloudscraper"], adaptive_order=False,
+                                   cache=None, rate_limiter=HostRateLimiter(rate=100, burst=100), breaker=None,
+                                   parse_pool=parse_pool)
+
+    try:
+        with StubServer(routes) as server:
+            url = server.url("/listing/for-sale-viva-vista-500010094")
+            cores = []
+
+            async def scrape_both():
+                pooled = await scraper(pool).scrape(url, on_core=cores.append)
+                await asyncio.sleep(0)
+                local = await scraper(None).scrape(url)
+                return pooled, local
+
+            pooled, local = asyncio.run(scrape_both())
+    finally:
+        pool.shutdown()
+    pooled.pop("scrape_meta")
+    local.pop("scrape_meta")
+    assert pooled == local and pooled["title"] == "Viva Vista 3 Bedroom Condo for Sale"
+    assert len(cores) == 1 and cores[0]["price"] == pooled["price"]
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.submitted = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(fn, *args, **kwargs)
+
+
+def test_broken_pool_is_replaced():
+    html = load_fixture("listing_full.html")
+    fallback = CountingExecutor()
+    pool = ParsePool(1, fallback_executor=fallback)
+    try:
+        pool.warm()
+        pool._pool().submit(os._exit, 1)  # kill the only worker
+
+        async def parse_twice():
+            return [await pool.parse(html.encode("utf-8")) for _ in range(2)]
+
+        results = asyncio.run(parse_twice())
+    finally:
+        pool.shutdown()
+    assert all(data == parse_html(html) for data in results)
+    stats = pool.stats()
+    assert stats["restarts"] == 1 and stats["fallbacks"] == 1 and stats["parses"] == 2
+    assert fallback.submitted == 1, "the fallback parse runs off the event loop"
+    fallback.shutdown()
+
+
+def test_pool_from_env():
+    for value, workers in (("0", None), ("", None), ("3", 3), ("auto", os.cpu_count())):
+        os.environ["PG_PARSE_WORKERS"] = value
+        pool = parse_pool_from_env()
+        assert (pool.workers if pool else None) == workers, value
+    os.environ.pop("PG_PARSE_WORKERS")
+
+
+def test_app_warms_pool():
+    from fastapi.testclient import TestClient
+    import index
+
+    pool = ParsePool(1)
+    warmed = []
+    warm = pool.warm
+    pool.warm = lambda: warmed.append(warm())
+    index.shared_parse_pool = pool
+    try:
+        with TestClient(index.app) as client:
+            assert client.get("/api/metrics").status_code == 200, "requests are served while the workers start"
+    finally:
+        index.shared_parse_pool = None
+        pool.shutdown()
+    assert len(warmed) == 1, "the lifespan hook started the workers"
+
+
+if __name__ == "__main__":
+    try:
+        test_pool_matches_in_process()
+        test_scrape_through_pool()
+        test_broken_pool_is_replaced()
+        test_pool_from_env()
+        test_app_warms_pool()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: parse pool")
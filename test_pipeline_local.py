@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Scrape-to-generate pipeline test: Gemini starts on the core listing fields while the
+scrape is still collecting images, the early article is only kept when the final
+listing renders the same prompt, and failed scrapes never return an article.
+"""
+import asyncio
+import sys
+
+from local_stubs import FakeGeminiModel, StubServer, load_fixture, make_large_listing, no_image_prefetch, shared_services
+from ai_service import AIService
+from images import proxy_url
+from listing_parser import json_ld_core, new_listing, parse_html
+from pipeline import ScrapeFailed, generate_from_url
+from rate_limit import HostRateLimiter
+from scraper import PropertyGuruScraper
+
+CORE = dict(
+    new_listing(),
+    title="Viva Vista 3 Bedroom Condo for Sale",
+    price="SGD 1880000",
+    address="3 South Buona Vista Road",
+    description="Bright and airy 3 bedroom unit with unblocked views.",
+)
+IMAGES = ["https://sg1-cdn.pgimgs.com/listing/500010094/UPHO.1.V800/photo.jpg"]
+
+
+class StagedScraper:
+    """Reports the core fields after `core_at` seconds and finishes after `total` seconds."""
+
+    def __init__(self, core_at=0.2, total=1.0, core=CORE, final=None):
+        self.core_at = core_at
+        self.total = total
+        self.core = core
+        self.final = final or dict(core, images=IMAGES)
+
+    async def scrape(self, url, on_core=None):
+        await asyncio.sleep(self.core_at)
+        if on_core is not None:
+            on_core(dict(self.core))
+        await asyncio.sleep(self.total - self.core_at)
+        return dict(self.final)
+
+
+def _run(scraper, model):
+    ai = AIService("test-key", model=model, cache=None)
+    with no_image_prefetch():
+        return asyncio.run(generate_from_url("https://www.propertyguru.com.sg/listing/for-sale-viva-vista-500010094",
+                                             scraper=scraper, ai=ai))
+
+
+def test_generation_overlaps_scrape():
+    model = FakeGeminiModel(latency=1.0)
+    result = _run(StagedScraper(core_at=0.2, total=1.0), model)
+    timings = result["timings"]
+    print(f"pipeline timings: {timings}")
+
+    assert model.calls == 1
+    assert result["content_html"] == "<h2>Fake article</h2><p>Generated locally.</p>"
+    assert result["images"] == IMAGES
+    assert timings["early_generation"]
+    assert timings["overlap_seconds"] >= 0.7
+    # ~core_at + generation instead of scrape + generation
+    assert timings["total_seconds"] < 1.5
+    assert timings["seconds_saved"] >= 0.6
+
+
+def test_changed_core_is_regenerated():
+    model = FakeGeminiModel(latency=0.3)
+    final = dict(CORE, price="SGD 1780000", images=IMAGES)
+    result = _run(StagedScraper(final=final), model)
+    assert model.calls == 2
+    assert not result["timings"]["early_generation"]
+    assert "1780000" in model.prompts[-1]
+
+
+def test_blocked_scrape_cancels_generation():
+    model = FakeGeminiModel(latency=1.0)
+    blocked = dict(new_listing(), title="[BLOCKED] Bot Protection Detected")
+    try:
+        _run(StagedScraper(final=blocked), model)
+    except ScrapeFailed as e:
+        assert e.status == "blocked"
+    else:
+        assert False, "blocked scrape returned an article"
+    assert model.in_flight == 0
+
+
+def test_http_scrape_reports_core_early():
+    routes = {"/listing/for-sale-viva-vista-500010094": (200, make_large_listing(), "text/html", 0.2)}
+    scraper = PropertyGuruScraper(
+        cache=None,
+        rate_limiter=HostRateLimiter(rate=100, burst=100),
+        strategy_order=["cloudscraper"],
+        adaptive_order=False,
+    )
+    model = FakeGeminiModel(latency=0.5)
+    ai = AIService("test-key", model=model, cache=None)
+    with no_image_prefetch(), StubServer(routes) as server:
+        url = server.url("/listing/for-sale-viva-vista-500010094")
+        result = asyncio.run(generate_from_url(url, scraper=scraper, ai=ai))
+    timings = result["timings"]
+    print(f"HTTP pipeline timings: {timings}")
+    assert timings["early_generation"]
+    assert timings["core_ready_seconds"] < timings["scrape_seconds"]
+    assert model.calls == 1
+    assert result["images"]
+
+
+def test_json_ld_core_matches_full_parse():
+    # What the Playwright strategy reports early, without a second full parse
+    html = load_fixture("listing_full.html")
+    core = json_ld_core(html)
+    full = parse_html(html)
+    assert {k: core[k] for k in ("title", "price", "address", "description")} == \
+        {k: full[k] for k in ("title", "price", "address", "description")}
+    assert json_ld_core(load_fixture("listing_css_only.html")) is None, "incomplete JSON-LD: wait for the full parse"
+    assert json_ld_core(load_fixture("blocked_cloudflare_challenge.html")) is None
+
+
+def test_generate_endpoint_uses_pipeline():
+    from fastapi.testclient import TestClient
+    import scraper as scraper_module
+    from index import app
+
+    ai = AIService("test-key", model=FakeGeminiModel(latency=0.3), cache=None)
+    with shared_services(StagedScraper(core_at=0.1, total=0.3), ai):
+        with no_image_prefetch(), TestClient(app) as client:
+            body = client.post("/api/generate", json={"url": "https://www.propertyguru.com.sg/listing/x-500010094"}).json()
+            scraper_module._shared_scraper = StagedScraper(final=dict(new_listing(), title="[BLOCKED] Bot Protection Detected"))
+            blocked = client.post("/api/generate", json={"url": "https://www.propertyguru.com.sg/listing/x-500010094"})
+
+    assert body["title"] == CORE["title"]
+    assert body["images"] == IMAGES
+    assert body["proxied_images"] == [proxy_url(url) for url in IMAGES]
+    assert body["timings"]["early_generation"]
+    assert blocked.status_code == 502
+
+
+if __name__ == "__main__":
+    try:
+        test_generation_overlaps_scrape()
+        test_changed_core_is_regenerated()
+        test_blocked_scrape_cancels_generation()
+        test_http_scrape_reports_core_early()
+        test_json_ld_core_matches_full_parse()
+        test_generate_endpoint_uses_pipeline()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: scrape-to-generate pipeline")
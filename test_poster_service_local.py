@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Poster endpoint test with a fake browser pool: large payloads render, repeats are
+served from the PNG cache without re-rendering, concurrent identical requests share
+one render, and oversized bodies are refused with 413.
+"""
+import asyncio
+import json
+import sys
+
+from local_stubs import FakeBrowserPool, make_poster_payload
+import poster as poster_module
+from poster import PosterRenderer, body_hasher
+
+
+def _client(pool):
+    from fastapi.testclient import TestClient
+    from index import app
+
+    poster_module._shared_renderer = PosterRenderer(pool)
+    return TestClient(app)
+
+
+def test_render_and_cache():
+    pool = FakeBrowserPool(latency=0.05)
+    payload = make_poster_payload()
+    try:
+        with _client(pool) as client:
+            first = client.post("/api/generate-poster", json=payload)
+            again = client.post("/api/generate-poster", json=payload)
+            other = client.post("/api/generate-poster", json=make_poster_payload(tag="2"))
+            not_modified = client.post("/api/generate-poster", json=payload, headers={"If-None-Match": first.headers["etag"]})
+    finally:
+        poster_module._shared_renderer = None
+
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "image/png"
+    assert first.content.startswith(b"\x89PNG")
+    assert first.headers["x-poster-cache"] == "miss"
+    assert again.headers["x-poster-cache"] == "hit" and again.content == first.content
+    assert other.content != first.content
+    assert not_modified.status_code == 304
+    assert pool.renders == 2
+
+
+def test_concurrent_identical_requests_share_a_render():
+    pool = FakeBrowserPool(latency=0.2)
+    renderer = PosterRenderer(pool)
+    payload = make_poster_payload(extra_bytes=1000)
+    hasher = body_hasher()
+    hasher.update(json.dumps(payload).encode("utf-8"))
+    key = hasher.hexdigest()
+
+    async def run():
+        return await asyncio.gather(*(renderer.render(key, payload["html"], payload["title"]) for _ in range(5)))
+
+    pngs = asyncio.run(run())
+    assert len(set(pngs)) == 1
+    assert pool.renders == 1
+    assert renderer.stats()["coalesced"] == 4
+
+
+def test_size_limit_and_bad_bodies():
+    pool = FakeBrowserPool(latency=0)
+    limit = poster_module.MAX_BODY_BYTES
+    try:
+        with _client(pool) as client:
+            too_big = client.post("/api/generate-poster", json=make_poster_payload(extra_bytes=limit))
+
+            # No Content-Length: the limit is enforced while streaming
+            def chunks():
+                for _ in range(limit // (1024 * 1024) + 2):
+                    yield b"A" * (1024 * 1024)
+            streamed = client.post("/api/generate-poster", content=chunks())
+
+            not_json = client.post("/api/generate-poster", content=b"<h1>hi</h1>")
+            no_html = client.post("/api/generate-poster", json={"title": "x"})
+    finally:
+        poster_module._shared_renderer = None
+
+    assert too_big.status_code == 413
+    assert streamed.status_code == 413
+    assert not_json.status_code == 400
+    assert no_html.status_code == 400
+    assert pool.renders == 0
+
+
+if __name__ == "__main__":
+    try:
+        test_render_and_cache()
+        test_concurrent_identical_requests_share_a_render()
+        test_size_limit_and_bad_bodies()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: poster service")
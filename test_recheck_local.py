@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Re-check test: listings are checked twice through stub sites. The second pass gets
+a 304 for a page with an unchanged ETag, downloads but does not regenerate a page
+whose markup changed around the same fields, and regenerates only the listing
+whose price changed, recording it in the price history. The same URL observed
+concurrently is NEW once, and a re-check that falls back to a full scrape spends
+a rate-limit token per request. A failed write is rolled back, so the store keeps working,
+and the re-check does its SQLite work off the event loop.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+
+from local_stubs import FakeClock, FakeGeminiModel, StubServer, load_fixture
+from ai_service import AIService
+from listing_store import CHANGED, NEW, NOT_MODIFIED, UNCHANGED, ListingStore, content_hash
+from pipeline import recheck_listings
+from rate_limit import HostRateLimiter
+from scraper import PropertyGuruScraper
+
+LISTING = load_fixture("listing_full.html")
+
+
+def _scraper():
+    return PropertyGuruScraper(hedge_budget=None, strategy_order=["cloudscraper"], adaptive_order=False, cache=None,
+                               rate_limiter=HostRateLimiter(rate=100, burst=100), breaker=None)
+
+
+def test_content_hash_ignores_whitespace():
+    data = {"title": "Viva Vista", "price": "SGD 1880000", "address": "3 South Buona Vista Road", "description": "a\nb"}
+    assert content_hash(data) == content_hash(dict(data, description="  a   b ", images=["x.jpg"]))
+    assert content_hash(data) != content_hash(dict(data, price="SGD 1850000"))
+
+
+def test_store_history_and_articles():
+    clock = FakeClock()
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ListingStore(os.path.join(tmp, "store.db"), clock=clock)
+        url = "https://www.propertyguru.com.sg/listing/for-sale-viva-vista-500010094"
+        data = {"title": "Viva Vista", "price": "SGD 1880000", "address": "", "description": ""}
+        assert store.observe(url, data, etag='"a"')[0] == NEW
+        store.save_article(url + "?utm_source=wechat", "note", {"title": "t", "content_html": "<p>x</p>"})
+        clock.advance(86400)
+        assert store.observe(url, data, etag='"b"') == (UNCHANGED, [])
+        assert store.get(url)["articles"]["note"]["content_html"] == "<p>x</p>", "kept while the fields are the same"
+        clock.advance(86400)
+        store.not_modified(url)
+        clock.advance(86400)
+        assert store.observe(url, dict(data, price="SGD 1850000")) == (CHANGED, ["price"])
+        record = store.get(url)
+        assert record["articles"] == {} and record["changed_at"] == clock()
+        history = store.price_history(url)
+        assert [h["status"] for h in history] == [NEW, UNCHANGED, NOT_MODIFIED, CHANGED]
+        assert [h["price"] for h in history][-2:] == ["SGD 1880000", "SGD 1850000"]
+        assert store.price_history(url, limit=1) == history[-1:]
+        store.close()
+
+
+class ThreadCheckingStore(ListingStore):
+    """Records the threads the store is called on."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = set()
+
+    def get(self, url):
+        self.threads.add(threading.current_thread())
+        return super().get(url)
+
+    def observe(self, *args, **kwargs):
+        self.threads.add(threading.current_thread())
+        return super().observe(*args, **kwargs)
+
+    def not_modified(self, *args, **kwargs):
+        self.threads.add(threading.current_thread())
+        return super().not_modified(*args, **kwargs)
+
+    def save_article(self, *args, **kwargs):
+        self.threads.add(threading.current_thread())
+        return super().save_article(*args, **kwargs)
+
+
+def test_recheck_skips_unchanged_listings():
+    model = FakeGeminiModel(latency=0.01)
+    ai = AIService("test-key", model=model, cache=None)
+    paths = {
+        "etag": "/listing/for-sale-viva-vista-500010094",
+        "markup": "/listing/for-sale-viva-vista-500010095",
+        "price": "/listing/for-sale-viva-vista-500010096",
+    }
+    tagged = {paths["etag"]: (200, LISTING, "text/html")}
+    untagged = {path: (200, LISTING, "text/html") for key, path in paths.items() if key != "etag"}
+
+    with tempfile.TemporaryDirectory() as tmp, StubServer(tagged, etags=True) as tagged_site, StubServer(untagged) as site:
+        store = ThreadCheckingStore(os.path.join(tmp, "store.db"))
+        urls = [tagged_site.url(paths["etag"]), site.url(paths["markup"]), site.url(paths["price"])]
+
+        def run():
+            return asyncio.run(recheck_listings(urls, "note", store=store, scraper=_scraper(), ai=ai))
+
+        first = run()
+        assert [r["status"] for r in first["listings"]] == [NEW] * 3
+        assert first["report"]["llm_calls"] == 3 and model.calls == 3
+
+        # Same fields in different markup, and a price drop
+        untagged[paths["markup"]] = (200, LISTING.replace("</body>", "<!-- 1234 views --></body>"), "text/html")
+        untagged[paths["price"]] = (200, LISTING.replace("1880000", "1850000").replace("1,880,000", "1,850,000"),
+                                    "text/html")
+        second = run()
+
+    statuses = {key: r["status"] for key, r in zip(paths, second["listings"])}
+    assert statuses == {"etag": NOT_MODIFIED, "markup": UNCHANGED, "price": CHANGED}, statuses
+    assert tagged_site.not_modified == 1
+    assert second["listings"][0]["bytes"] == 0 and second["listings"][1]["bytes"] > 0
+    assert second["listings"][2]["changed"] == ["price"] and second["listings"][2]["article"]["content_html"]
+    assert "article" not in second["listings"][0] and "article" not in second["listings"][1]
+
+    report = second["report"]
+    assert model.calls == 4, "only the changed listing was regenerated"
+    assert report["llm_calls"] == 1 and report["llm_calls_avoided"] == 2
+    assert report["bytes_fetched"] == 2 * len(LISTING.encode("utf-8")) + len("<!-- 1234 views -->")
+    assert report["bytes_saved"] == len(LISTING.encode("utf-8")) - len("<!-- 1234 views -->")
+    assert [h["price"] for h in store.price_history(urls[2])] == ["SGD 1880000", "SGD 1850000"]
+    assert store.threads and threading.main_thread() not in store.threads, "SQLite calls ran on the event loop"
+
+
+def test_failed_write_is_rolled_back():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ListingStore(os.path.join(tmp, "store.db"))
+        url = "https://www.propertyguru.com.sg/listing/for-sale-viva-vista-500010094"
+        data = {"title": "Viva Vista", "price": "SGD 1880000", "address": "", "description": ""}
+        try:
+            store.observe(url, dict(data, description={"not", "json"}))
+            assert False, "unserialisable fields should raise"
+        except TypeError:
+            pass
+        assert store.get(url) is None and store.price_history(url) == [], "nothing half-written"
+        # The connection is not stuck inside the failed transaction
+        assert store.observe(url, data) == (NEW, ["title", "price", "address", "description"])
+        store.save_article(url, "note", {"title": "t", "content_html": "<p>x</p>"})
+        store.not_modified(url)
+        assert [h["status"] for h in store.price_history(url)] == [NEW, NOT_MODIFIED]
+        store.close()
+
+
+def test_concurrent_observe_of_one_url():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ListingStore(os.path.join(tmp, "store.db"))
+        url = "https://www.propertyguru.com.sg/listing/for-sale-viva-vista-500010094"
+        data = {"title": "Viva Vista", "price": "SGD 1880000", "address": "", "description": ""}
+        barrier = threading.Barrier(8)
+        statuses = []
+
+        def observe():
+            barrier.wait()
+            statuses.append(store.observe(url, data)[0])
+
+        threads = [threading.Thread(target=observe) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        history = store.price_history(url)
+        store.close()
+    assert sorted(statuses) == sorted([NEW] + [UNCHANGED] * 7), statuses
+    assert [h["status"] for h in history].count(NEW) == 1
+
+
+class CountingRateLimiter(HostRateLimiter):
+    def __init__(self):
+        super().__init__(rate=100, burst=100)
+        self.acquired = 0
+
+    async def acquire(self, url):
+        self.acquired += 1
+        await super().acquire(url)
+
+
+def test_every_request_spends_a_token():
+    limiter = CountingRateLimiter()
+    scraper = PropertyGuruScraper(hedge_budget=None, strategy_order=["cloudscraper"], adaptive_order=False, cache=None,
+                                  rate_limiter=limiter, breaker=None)
+    with StubServer({"/listing/x-500010094": (403, "<html>Forbidden</html>", "text/html")}) as site:
+        fetched = asyncio.run(scraper.recheck(site.url("/listing/x-500010094")))
+        hits = site.hits
+    assert fetched["bytes"] is None, "fell back to a full scrape"
+    assert hits == 2 and limiter.acquired == 2, "the conditional GET and the fallback scrape"
+
+
+if __name__ == "__main__":
+    try:
+        test_content_hash_ignores_whitespace()
+        test_store_history_and_articles()
+        test_recheck_skips_unchanged_listings()
+        test_concurrent_observe_of_one_url()
+        test_failed_write_is_rolled_back()
+        test_every_request_spends_a_token()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: incremental re-check")
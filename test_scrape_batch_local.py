@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Batch scraping test against a local stub server: results stream back as each
+listing finishes, and blocked/failed listings are reported without stopping the rest.
+"""
+import asyncio
+import json
+import sys
+import time
+
+from local_stubs import StubServer, load_fixture, shared_services
+from rate_limit import HostRateLimiter
+from scraper import PropertyGuruScraper
+
+LISTING = load_fixture("listing_full.html")
+BLOCKED = load_fixture("blocked_cloudflare_challenge.html")
+
+ROUTES = {
+    "/listing/for-sale-slow-500000001": (200, LISTING, "text/html", 1.0),
+    "/listing/for-sale-fast-500000002": (200, LISTING, "text/html", 0.1),
+    "/listing/for-sale-blocked-500000003": (200, BLOCKED, "text/html", 0.1),
+    "/listing/for-sale-broken-500000004": (500, "Internal Server Error", "text/plain", 0.1),
+}
+
+
+def _scraper():
+    # HTTP strategies only, no cache, generous rate limit: the test is about batching
+    return PropertyGuruScraper(
+        cache=None,
+        rate_limiter=HostRateLimiter(rate=100, burst=100),
+        strategy_order=["cloudscraper", "curl_cffi:chrome120"],
+        adaptive_order=False,
+    )
+
+
+async def _collect(scraper, urls):
+    start = time.perf_counter()
+    arrivals = []
+    async for result in scraper.scrape_many(urls, concurrency=4):
+        arrivals.append((time.perf_counter() - start, result))
+    return arrivals
+
+
+def test_batch_streams_results_per_url():
+    with StubServer(ROUTES) as server:
+        urls = [server.url(path) for path in ROUTES]
+        arrivals = asyncio.run(_collect(_scraper(), urls))
+
+    by_url = {result["url"]: (t, result) for t, result in arrivals}
+    assert len(by_url) == len(urls)
+    statuses = {url.rsplit("/", 1)[1]: r["status"] for url, (_, r) in by_url.items()}
+    assert statuses == {
+        "for-sale-slow-500000001": "ok",
+        "for-sale-fast-500000002": "ok",
+        "for-sale-blocked-500000003": "blocked",
+        # Every strategy failed, reported like the existing "Error: Scraper blocked" result
+        "for-sale-broken-500000004": "blocked",
+    }, statuses
+    # The fast listing is delivered before the slow one finishes
+    assert arrivals[-1][1]["url"].endswith("for-sale-slow-500000001")
+    assert arrivals[0][0] < 0.9, f"first result took {arrivals[0][0]:.2f}s"
+
+
+def test_batch_endpoint_streams_ndjson():
+    from fastapi.testclient import TestClient
+    from index import app
+
+    with shared_services(_scraper()):
+        with StubServer(ROUTES) as server, TestClient(app) as client:
+            urls = [server.url(path) for path in ROUTES]
+            with client.stream("POST", "/api/scrape-batch", json={"urls": urls}) as response:
+                assert response.status_code == 200
+                assert response.headers["content-type"].startswith("application/x-ndjson")
+                lines = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert sorted(r["index"] for r in lines) == [0, 1, 2, 3]
+    assert sum(r["status"] == "ok" for r in lines) == 2
+
+
+if __name__ == "__main__":
+    try:
+        test_batch_streams_results_per_url()
+        test_batch_endpoint_streams_ndjson()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: batch scraping")
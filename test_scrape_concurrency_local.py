@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Concurrency test for PropertyGuruScraper.scrape against a local stub server.
+The stub delays every response, so if the fetches blocked the event loop,
+N concurrent scrapes would take N times as long as one. Pages are parsed in the
+fetch pool, not on the event loop, even without a parse pool.
+"""
+import asyncio
+import sys
+import threading
+import time
+
+from local_stubs import StubServer, load_fixture
+import scraper as scraper_module
+from scraper import STRATEGY_CONCURRENCY, PropertyGuruScraper, run_blocking, scrape_status
+
+LATENCY = 1.0
+CONCURRENT_SCRAPES = 8
+
+
+async def _timed_scrapes(scraper, url, n):
+    start = time.perf_counter()
+    results = await asyncio.gather(*(scraper.scrape(url) for _ in range(n)))
+    return time.perf_counter() - start, results
+
+
+def test_concurrent_scrapes_overlap():
+    routes = {"/listing/for-sale-viva-vista-500010094": (200, load_fixture("listing_full.html"), "text/html")}
+    with StubServer(routes, latency=LATENCY) as server:
+        url = server.url("/listing/for-sale-viva-vista-500010094")
+        scraper = PropertyGuruScraper(cache=None, rate_limiter=None)
+
+        single, _ = asyncio.run(_timed_scrapes(scraper, url, 1))
+        many, results = asyncio.run(_timed_scrapes(scraper, url, CONCURRENT_SCRAPES))
+
+    print(f"1 scrape: {single:.2f}s, {CONCURRENT_SCRAPES} concurrent scrapes: {many:.2f}s")
+    assert all(r["title"] == "Viva Vista 3 Bedroom Condo for Sale" for r in results)
+    # Serialized fetches would take ~CONCURRENT_SCRAPES * LATENCY
+    assert many < single * 2, f"Concurrent scrapes serialized ({many:.2f}s vs {single:.2f}s)"
+
+
+def test_cancelled_fetch_keeps_its_slot():
+    # Like a hedged strategy that lost: the caller is cancelled, the thread is not
+    async def run():
+        losers = [asyncio.create_task(run_blocking("slow-test", time.sleep, 0.3)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        for task in losers:
+            task.cancel()
+        start = time.perf_counter()
+        await run_blocking("slow-test", time.sleep, 0)
+        return time.perf_counter() - start
+
+    STRATEGY_CONCURRENCY["slow-test"] = 2
+    try:
+        waited = asyncio.run(run())
+    finally:
+        del STRATEGY_CONCURRENCY["slow-test"]
+    assert waited >= 0.2, f"a slot freed while its request was still running (waited {waited:.2f}s)"
+
+
+def test_no_strategies():
+    scraper = PropertyGuruScraper(strategy_order=[], cache=None, rate_limiter=None, breaker=None)
+    data = asyncio.run(scraper.scrape("https://www.propertyguru.com.sg/listing/for-sale-viva-vista-500010094"))
+    assert data["title"] == "Error: Scraper strategies exhausted" and scrape_status(data) == "failed"
+
+
+def test_parsing_stays_off_the_event_loop():
+    threads = []
+    parse_html = scraper_module.parse_html
+
+    def recording_parse(html, on_core=None):
+        threads.append(threading.current_thread())
+        return parse_html(html, on_core)
+
+    routes = {"/listing/for-sale-viva-vista-500010094": (200, load_fixture("listing_full.html"), "text/html")}
+    scraper = PropertyGuruScraper(strategy_order=["cloudscraper"], adaptive_order=False, cache=None,
+                                  rate_limiter=None, breaker=None, parse_pool=None)
+    scraper_module.parse_html = recording_parse
+    try:
+        with StubServer(routes) as server:
+            data = asyncio.run(scraper.scrape(server.url("/listing/for-sale-viva-vista-500010094")))
+        # The browser path hands over the page text
+        asyncio.run(scraper._parse_with_core(load_fixture("listing_full.html")))
+    finally:
+        scraper_module.parse_html = parse_html
+    assert data["title"] == "Viva Vista 3 Bedroom Condo for Sale"
+    assert len(threads) == 2 and threading.main_thread() not in threads, threads
+
+
+if __name__ == "__main__":
+    try:
+        test_concurrent_scrapes_overlap()
+        test_cancelled_fetch_keeps_its_slot()
+        test_no_strategies()
+        test_parsing_stays_off_the_event_loop()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: concurrent scrapes overlap")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Hedged scrape test with stubbed strategies: a strategy running past the hedge
+budget starts the next one alongside it, a failed one hands over at once, the
+first usable result wins and the losers are cancelled (their fetch slots freed
+once their threads end), every attempt takes a rate-limit token, the adaptive
+order follows the success rate and the winner is reported in scrape_meta.
+"""
+import asyncio
+import sys
+import time
+
+import local_stubs  # noqa: F401 (puts api/ on the path)
+from listing_parser import blocked_listing
+from rate_limit import HostRateLimiter
+from scraper import STRATEGY_CONCURRENCY, PropertyGuruScraper, StrategyStats, _strategy_semaphore, run_blocking
+
+URL = "https://www.propertyguru.com.sg/listing/for-sale-viva-vista-500010094"
+LISTING = {"title": "Viva Vista", "price": "SGD 1880000", "address": "", "description": "", "images": []}
+BLOCKED = blocked_listing()
+
+
+class StubbedScraper(PropertyGuruScraper):
+    """Each strategy name maps to (seconds, result); the wait is a blocking fetch in the pool."""
+
+    def __init__(self, plan, **kwargs):
+        kwargs.setdefault("adaptive_order", False)
+        super().__init__(strategy_order=list(plan), cache=None, rate_limiter=None, breaker=None, **kwargs)
+        self.plan = plan
+        self.stats = StrategyStats()
+        self.started = []
+        self.cancelled = []
+
+    async def _attempt(self, name, url, on_core=None):
+        seconds, result = self.plan[name]
+        self.started.append(name)
+        try:
+            await run_blocking(name, time.sleep, seconds)
+        except asyncio.CancelledError:
+            self.cancelled.append(name)
+            raise
+        return dict(result) if result else None
+
+
+def test_slow_strategy_is_hedged():
+    scraper = StubbedScraper({"stub-slow": (1.0, LISTING), "stub-fast": (0.05, dict(LISTING, title="Fast"))},
+                             hedge_budget=0.1)
+
+    async def run():
+        start = time.perf_counter()
+        data = await scraper.scrape(URL)
+        elapsed = time.perf_counter() - start
+        await asyncio.sleep(0)  # let the cancellation reach the loser
+        free_right_after = _strategy_semaphore("stub-slow")._value
+        await asyncio.sleep(1.1)  # the loser's thread ends
+        return data, elapsed, free_right_after, _strategy_semaphore("stub-slow")._value
+
+    data, elapsed, free_right_after, free_later = asyncio.run(run())
+    assert data["title"] == "Fast" and elapsed < 0.5, elapsed
+    meta = data["scrape_meta"]
+    assert meta["strategy"] == "stub-fast" and meta["attempted"] == ["stub-slow", "stub-fast"]
+    assert meta["skipped"] == [] and 0 < meta["strategy_seconds"] <= meta["total_seconds"] < 0.5
+    assert scraper.cancelled == ["stub-slow"]
+    slots = STRATEGY_CONCURRENCY.get("stub-slow", 4)
+    assert free_right_after == slots - 1, "the slot stays taken while the request still runs"
+    assert free_later == slots, "and is released when it ends"
+
+
+def test_first_usable_result_wins():
+    scraper = StubbedScraper({
+        "stub-blocked": (0.01, BLOCKED),
+        "stub-error": (0.01, None),
+        "stub-ok": (0.05, LISTING),
+        "stub-unused": (0.01, dict(LISTING, title="Unused")),
+    }, hedge_budget=None)
+    data = asyncio.run(scraper.scrape(URL))
+    assert data["title"] == "Viva Vista" and data["scrape_meta"]["strategy"] == "stub-ok"
+    assert scraper.started == ["stub-blocked", "stub-error", "stub-ok"], "each failure hands over to the next"
+    assert scraper.cancelled == []
+    stats = scraper.stats.snapshot()
+    assert stats["stub-blocked"]["successes"] == 0 and stats["stub-ok"]["successes"] == 1
+    assert "stub-unused" not in stats
+
+
+def test_every_attempt_takes_a_token():
+    limiter = HostRateLimiter(rate=1, burst=3)
+    scraper = StubbedScraper({"stub-blocked": (0.01, BLOCKED), "stub-error": (0.01, None), "stub-ok": (0.01, LISTING)},
+                             hedge_budget=None)
+    scraper.rate_limiter = limiter
+    data = asyncio.run(scraper.scrape(URL))
+    assert data["scrape_meta"]["strategy"] == "stub-ok"
+    tokens = limiter.snapshot()["hosts"]["www.propertyguru.com.sg"]["tokens"]
+    assert tokens < 0.5, f"three requests, three tokens ({tokens} left)"
+
+
+def test_adaptive_order_follows_success_rate():
+    scraper = StubbedScraper({"stub-flaky": (0.01, BLOCKED), "stub-steady": (0.01, LISTING)},
+                             hedge_budget=None, adaptive_order=True)
+
+    async def run():
+        return [(await scraper.scrape(URL))["scrape_meta"]["attempted"] for _ in range(3)]
+
+    attempted = asyncio.run(run())
+    assert attempted[0] == ["stub-flaky", "stub-steady"], "ties keep the configured order"
+    assert attempted[1:] == [["stub-steady"], ["stub-steady"]], attempted
+    assert scraper.stats.order(["stub-flaky", "stub-steady"]) == ["stub-steady", "stub-flaky"]
+
+
+def test_all_strategies_fail():
+    scraper = StubbedScraper({"stub-blocked": (0.01, BLOCKED), "stub-error": (0.01, None)}, hedge_budget=0.005)
+    data = asyncio.run(scraper.scrape(URL))
+    assert data["title"] == "Error: Scraper blocked" and "scrape_meta" not in data
+    assert sorted(scraper.started) == ["stub-blocked", "stub-error"]
+
+
+if __name__ == "__main__":
+    try:
+        test_slow_strategy_is_hedged()
+        test_first_usable_result_wins()
+        test_every_attempt_takes_a_token()
+        test_adaptive_order_follows_success_rate()
+        test_all_strategies_fail()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: hedged scrapes")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Session pool test on a fake clock: a returned session is reused for the same
+strategy and profile (and only for it), sessions are retired after their ttl or
+when idle too long, at most max_idle_per_key are kept, and a session whose request
+raised is closed instead of reused.
+"""
+import sys
+
+from local_stubs import FakeClock
+from session_pool import SessionPool
+
+
+class FakeSession:
+    def __init__(self, profile):
+        self.profile = profile
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _pool(clock, **kwargs):
+    pool = SessionPool(clock=clock, **kwargs)
+    pool.register("cloudscraper", FakeSession)
+    pool.register("curl_cffi", FakeSession)
+    return pool
+
+
+def test_reuse_by_key():
+    pool = _pool(FakeClock())
+    with pool.session("cloudscraper", "windows") as first:
+        pass
+    with pool.session("cloudscraper", "windows") as again:
+        assert again is first
+    with pool.session("cloudscraper", "android") as other_profile:
+        assert other_profile is not first
+    with pool.session("curl_cffi", "windows") as other_strategy:
+        assert other_strategy is not first
+    stats = pool.stats()
+    assert stats["created"] == 3 and stats["reused"] == 1
+    assert stats["idle"] == {"cloudscraper:windows": 1, "cloudscraper:android": 1, "curl_cffi:windows": 1}
+    assert not first.closed
+
+
+def test_ttl_and_idle_timeout():
+    clock = FakeClock()
+    pool = _pool(clock, ttl=100, idle_timeout=30)
+    with pool.session("cloudscraper") as old:
+        pass
+    for _ in range(4):  # in use every 25s: never idle too long...
+        clock.advance(25)
+        with pool.session("cloudscraper") as session:
+            assert session is old
+    clock.advance(25)  # ...but 125s old now
+    with pool.session("cloudscraper") as fresh:
+        assert fresh is not old and old.closed
+    clock.advance(31)
+    with pool.session("cloudscraper") as newest:
+        assert newest is not fresh and fresh.closed
+    stats = pool.stats()
+    assert stats["expired"] == 1 and stats["evicted_idle"] == 1 and stats["created"] == 3
+
+    # A session that outlives its ttl while checked out is not put back
+    with pool.session("cloudscraper") as long_request:
+        clock.advance(101)
+    assert long_request.closed and pool.stats()["expired"] == 2
+
+
+def test_max_idle_per_key():
+    pool = _pool(FakeClock(), max_idle_per_key=2)
+    entries = [pool.acquire("cloudscraper", "windows") for _ in range(3)]
+    for entry in entries:
+        pool.release("cloudscraper", "windows", entry)
+    assert pool.stats()["idle"] == {"cloudscraper:windows": 2}
+    assert [entry[0].closed for entry in entries] == [False, False, True], "the one over the cap is closed"
+
+
+def test_failed_request_discards_session():
+    pool = _pool(FakeClock())
+    try:
+        with pool.session("cloudscraper") as broken:
+            raise ConnectionError("connection reset")
+    except ConnectionError:
+        pass
+    assert broken.closed and pool.stats()["discarded"] == 1 and pool.stats()["idle"] == {}
+    with pool.session("cloudscraper") as session:
+        assert session is not broken
+
+
+if __name__ == "__main__":
+    try:
+        test_reuse_by_key()
+        test_ttl_and_idle_timeout()
+        test_max_idle_per_key()
+        test_failed_request_discards_session()
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+        sys.exit(1)
+    print("✅ PASS: session pool")